@@ -100,6 +100,7 @@ class Config:
     # Cache settings
     CACHE_TTL = int(os.getenv("CACHE_TTL"))
     CACHE_MAX_SIZE = int(os.getenv("CACHE_MAX_SIZE"))
+    CACHE_NEGATIVE_TTL = int(os.getenv("CACHE_NEGATIVE_TTL", "30"))
     CACHE_TYPE = "redis"
     CACHE_REDIS_URL = REDIS_URL
     CACHE_DEFAULT_TIMEOUT = CACHE_TTL
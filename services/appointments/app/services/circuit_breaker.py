@@ -157,3 +157,7 @@ class CircuitBreaker:
         self.state = CircuitState.HALF_OPEN
         self.half_open_calls = 0
         logger_service.info(f"Circuit breaker '{self.name}' half-open - testing if service recovered")
+
+
+class CircuitBreakerError(Exception):
+    """Exception raised when circuit is open"""
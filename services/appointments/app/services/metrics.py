@@ -81,6 +81,11 @@ CACHE_MISS = meter.create_counter(
     description="Total number of cache misses for medecins service",
 )
 
+CACHE_EVICTIONS = meter.create_counter(
+    name="medecins_service_cache_evictions_total",
+    description="Number of cache entries evicted (by size or expiry) for medecins service",
+)
+
 # Service dependency metrics
 SERVICE_DEPENDENCY_UP = meter.create_up_down_counter(
     name="medecins_service_dependency_up",
@@ -192,6 +197,14 @@ def track_cache_metrics(hit: bool, cache_name: str):
         logger_service.warning(f"Error tracking cache metrics: {e!s}")
 
 
+def track_cache_eviction(cache_name: str, reason: str):
+    """Track cache evictions by reason (size or expired)"""
+    try:
+        CACHE_EVICTIONS.add(1, {"cache_name": cache_name, "reason": reason})
+    except Exception as e:
+        logger_service.warning(f"Error tracking cache eviction: {e!s}")
+
+
 def track_dependency_status(service: str, is_available: bool):
     """Track service dependency availability"""
     try:
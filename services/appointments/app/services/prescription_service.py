@@ -1,4 +1,3 @@
-import json
 from datetime import datetime
 from typing import Any
 
@@ -6,7 +5,7 @@ import aiohttp
 
 from config import Config
 from services.cache_service import CacheService
-from services.circuit_breaker import CircuitBreaker
+from services.circuit_breaker import CircuitBreaker, CircuitBreakerError
 from services.logger_service import logger_service
 from services.rabbitmq_client import RabbitMQClient
 
@@ -17,7 +16,7 @@ class PrescriptionService:
     def __init__(self):
         self.config = Config
         self.rabbitmq_client = RabbitMQClient(self.config)
-        self.cache_service = CacheService()
+        self.cache_service = CacheService.from_config("prescriptions", self.config)
         self.circuit_breaker = CircuitBreaker(
             name="prescription_service",
             failure_threshold=self.config.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
@@ -47,129 +46,94 @@ class PrescriptionService:
         """
         Get prescriptions for a specific doctor
         """
-        try:
-            # Define cache key
-            cache_key = f"doctor_prescriptions:{doctor_id}:{status}:{page}:{limit}"
+        empty_result = {"items": [], "total": 0, "page": page, "pages": 0}
+
+        # Prepare query parameters
+        params = {
+            "doctor_id": doctor_id,
+            "limit": limit,
+            "skip": (page - 1) * limit,
+        }
 
-            # Check cache first
-            cached_data = self.cache_service.get(cache_key)
-            if cached_data:
-                logger_service.debug(f"Using cached prescriptions for {doctor_id}")
-                return json.loads(cached_data)
+        if status:
+            params["status"] = status
 
+        async def fetch_prescriptions() -> dict[str, Any]:
             # Use circuit breaker pattern for API calls
             if not self.circuit_breaker.is_closed():
-                logger_service.warning("Circuit breaker open, returning empty prescriptions list")
-                return {"items": [], "total": 0, "page": page, "pages": 0}
-
-            # Prepare query parameters
-            params = {
-                "doctor_id": doctor_id,
-                "limit": limit,
-                "skip": (page - 1) * limit,
-            }
-
-            if status:
-                params["status"] = status
+                raise CircuitBreakerError("prescription_service")
 
-            # Call the prescriptions service API
             async with aiohttp.ClientSession() as session:
                 url = f"{self.api_base_url}/api/ordonnances"
 
                 logger_service.debug(f"Fetching prescriptions from {url} with params {params}")
 
                 async with session.get(url, params=params, timeout=self.config.REQUEST_TIMEOUT) as response:
-                    if response.status == 200:
-                        # Record successful call
-                        self.circuit_breaker.record_success()
-
-                        # Parse and cache response
-                        prescriptions = await response.json()
-                        self.cache_service.set(
-                            cache_key,
-                            json.dumps(prescriptions),
-                            ttl=self.config.CACHE_TTL,
-                        )
-
-                        return prescriptions
-                    else:
-                        # Record failure
-                        self.circuit_breaker.record_failure()
-
-                        # Log the error
+                    if response.status != 200:
                         error_text = await response.text()
                         logger_service.error(f"Error getting prescriptions: HTTP {response.status}, {error_text}")
+                        response.raise_for_status()
 
-                        # Return empty result as fallback
-                        return {"items": [], "total": 0, "page": page, "pages": 0}
+                    # Record successful call
+                    self.circuit_breaker.record_success()
+                    return await response.json()
+
+        try:
+            return await self.cache_service.get_or_load(
+                f"doctor_prescriptions:{doctor_id}:{status}:{page}:{limit}",
+                fetch_prescriptions,
+                tags=[f"doctor_prescriptions:{doctor_id}"],
+            )
+
+        except CircuitBreakerError:
+            logger_service.warning("Circuit breaker open, returning empty prescriptions list")
+            return empty_result
 
         except aiohttp.ClientError as e:
             # Record failure
             self.circuit_breaker.record_failure()
 
             logger_service.error(f"HTTP error when getting prescriptions: {e!s}")
-            return {"items": [], "total": 0, "page": page, "pages": 0}
+            return empty_result
 
         except Exception as e:
             logger_service.error(f"Unexpected error when getting prescriptions: {e!s}")
-            return {"items": [], "total": 0, "page": page, "pages": 0}
+            return empty_result
 
     async def get_prescription_details(self, prescription_id: str, doctor_id: str) -> dict[str, Any] | None:
         """
         Get details for a specific prescription
         """
-        try:
-            # Define cache key
-            cache_key = f"prescription:{prescription_id}"
-
-            # Check cache first
-            cached_data = self.cache_service.get(cache_key)
-            if cached_data:
-                logger_service.debug(f"Using cached prescription data for {prescription_id}")
-                return json.loads(cached_data)
 
+        async def fetch_prescription() -> dict[str, Any] | None:
             # Use circuit breaker pattern for API calls
             if not self.circuit_breaker.is_closed():
-                logger_service.warning("Circuit breaker open, returning None for prescription details")
-                return None
+                raise CircuitBreakerError("prescription_service")
 
-            # Call the prescriptions service API
             async with aiohttp.ClientSession() as session:
                 url = f"{self.api_base_url}/api/ordonnances/{prescription_id}"
 
                 logger_service.debug(f"Fetching prescription details from {url}")
 
                 async with session.get(url, timeout=self.config.REQUEST_TIMEOUT) as response:
-                    if response.status == 200:
-                        # Record successful call
-                        self.circuit_breaker.record_success()
-
-                        # Parse and cache response
-                        prescription = await response.json()
-
-                        # Verify that the prescription belongs to the doctor
-                        if prescription.get("doctor_id") != doctor_id:
-                            logger_service.warning(f"Doctor {doctor_id} attempted to access prescription {prescription_id} belonging to doctor {prescription.get('doctor_id')}")
-                            return None
-
-                        self.cache_service.set(
-                            cache_key,
-                            json.dumps(prescription),
-                            ttl=self.config.CACHE_TTL,
-                        )
-
-                        return prescription
-                    elif response.status == 404:
+                    if response.status == 404:
+                        # Cached negatively so repeated lookups don't hit the service
                         return None
-                    else:
-                        # Record failure
-                        self.circuit_breaker.record_failure()
-
-                        # Log the error
+                    if response.status != 200:
                         error_text = await response.text()
                         logger_service.error(f"Error getting prescription details: HTTP {response.status}, {error_text}")
+                        response.raise_for_status()
 
-                        return None
+                    # Record successful call
+                    self.circuit_breaker.record_success()
+                    return await response.json()
+
+        try:
+            prescription = await self.cache_service.get_or_load(f"prescription:{prescription_id}", fetch_prescription)
+
+        except CircuitBreakerError:
+            logger_service.warning("Circuit breaker open, returning None for prescription details")
+            return None
 
         except aiohttp.ClientError as e:
             # Record failure
@@ -182,6 +146,16 @@ class PrescriptionService:
             logger_service.error(f"Unexpected error when getting prescription details: {e!s}")
             return None
 
+        if prescription is None:
+            return None
+
+        # Verify that the prescription belongs to the doctor (also for cached entries)
+        if prescription.get("doctor_id") != doctor_id:
+            logger_service.warning(f"Doctor {doctor_id} attempted to access prescription {prescription_id} belonging to doctor {prescription.get('doctor_id')}")
+            return None
+
+        return prescription
+
     async def renew_prescription(self, prescription_id: str, doctor_id: str) -> dict[str, Any] | None:
         """
         Renew an existing prescription
@@ -232,11 +206,10 @@ class PrescriptionService:
             }
 
             # Cache the new prescription
-            cache_key = f"prescription:{renewal_id}"
-            self.cache_service.set(cache_key, json.dumps(renewed_prescription), ttl=self.config.CACHE_TTL)
+            await self.cache_service.set(f"prescription:{renewal_id}", renewed_prescription)
 
             # Invalidate the doctor prescriptions cache
-            self.cache_service.delete_pattern(f"doctor_prescriptions:{doctor_id}:*")
+            await self.cache_service.invalidate_tags(f"doctor_prescriptions:{doctor_id}")
 
             return renewed_prescription
 
@@ -281,8 +254,8 @@ class PrescriptionService:
             logger_service.info(f"Sent cancellation request for prescription {prescription_id}")
 
             # Invalidate caches
-            self.cache_service.delete(f"prescription:{prescription_id}")
-            self.cache_service.delete_pattern(f"doctor_prescriptions:{doctor_id}:*")
+            await self.cache_service.delete(f"prescription:{prescription_id}")
+            await self.cache_service.invalidate_tags(f"doctor_prescriptions:{doctor_id}")
 
             return True
 
@@ -6,8 +6,12 @@ This script generates clinical questions from X-ray case data of Eurorad dataset
 It structures questions across different analytical categories and saves them as JSON.
 """
 
+import argparse
+import asyncio
+import hashlib
 import json
 import os
+import random
 import re
 from pprint import pprint
 from typing import *
@@ -15,7 +19,7 @@ from typing import *
 import openai
 from tqdm import tqdm
 
-from benchmark.llm import get_llm_response
+from benchmark.llm import FakeAsyncLLMClient, aget_llm_response, get_llm_response
 from benchmark.utils import load_eurorad_dataset
 
 # Constants
@@ -73,6 +77,17 @@ CATEGORY_COMBINATIONS = [
     ],  # Diagnostic Characterization
 ]
 
+# Transient API errors after which a generation request is retried
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+# Log of finished (case, category combination) pairs in the output directory
+PROGRESS_FILE = "generation_progress.jsonl"
+
 DEFAULT_SECTIONS = [
     "history",
     "image_finding",
@@ -99,6 +114,7 @@ class Question:
         sections (List[str]): Case sections to include in question
         raw_content (Optional[str]): Raw LLM response to the question prompt
         content (Optional[Dict[str, str]]): Extracted content from the raw LLM response
+        output_file (Optional[str]): Path of the saved question file
     """
 
     def __init__(
@@ -127,6 +143,7 @@ class Question:
         self.case_content = self.select_case_sections()
         self.raw_content: Optional[str] = None
         self.content: Optional[Dict[str, str]] = None
+        self.output_file: Optional[str] = None
 
     def create_question_prompt(self) -> str:
         """Creates a formatted prompt for generating a clinical question.
@@ -246,6 +263,39 @@ class Question:
 
         return self.raw_content
 
+    async def acreate_question(
+        self,
+        client: openai.AsyncOpenAI,
+        temperature: float = 0.7,
+        top_p: float = 0.95,
+        max_tokens: int = 500,
+        model: str = "gpt-4o",
+    ) -> str:
+        """Create a clinical question using LLM without blocking the event loop.
+
+        Args:
+            client (openai.AsyncOpenAI): Async OpenAI client, or a FakeAsyncLLMClient
+            temperature (float): Controls randomness in responses. Defaults to 0.7.
+            top_p (float): Controls diversity via nucleus sampling. Defaults to 0.95.
+            max_tokens (int): Max tokens in model response. Defaults to 500.
+            model (str): OpenAI model to use. Defaults to "gpt-4o".
+
+        Returns:
+            str: LLM response containing formatted question components
+        """
+        self.raw_content = await aget_llm_response(
+            client=client,
+            prompt=self.create_question_prompt(),
+            system_prompt=self.system_prompt,
+            temperature=temperature,
+            top_p=top_p,
+            max_tokens=max_tokens,
+            model=model,
+        )
+        self.content = self.extract_content()
+
+        return self.raw_content
+
     def extract_content(self) -> Dict[str, str]:
         """Extract sections from raw LLM response using regex patterns.
 
@@ -287,66 +337,225 @@ class Question:
         case_dir = os.path.join(output_path, str(self.case_id))
         os.makedirs(case_dir, exist_ok=True)
 
-        # Save the question metadata to a JSON file
-        output_file = os.path.join(case_dir, f"{self.case_id}_{self.__hash__()}.json")
-        with open(output_file, "w") as f:
+        # Name the file after the category combination, so each (case, categories)
+        # pair has exactly one file, and write it atomically so an interrupted run
+        # never leaves a partial question behind
+        categories_key = hashlib.sha1(
+            "|".join(self.categories).encode(), usedforsecurity=False
+        ).hexdigest()[:12]
+        output_file = os.path.join(case_dir, f"{self.case_id}_{categories_key}.json")
+        tmp_file = f"{output_file}.tmp"
+        with open(tmp_file, "w") as f:
             json.dump(question_metadata, f, indent=2)
+        os.replace(tmp_file, output_file)
+        self.output_file = output_file
 
         return question_metadata
 
 
-def generate_questions(
+def load_generated_pairs(output_dir: str) -> Set[Tuple[str, Tuple[str, ...]]]:
+    """Find the (case, category combination) pairs that already have a question.
+
+    Pairs are read from the progress log, and from the metadata of question files
+    that are not in it, such as those written by earlier versions of this script.
+
+    Args:
+        output_dir: Directory containing the generated questions
+
+    Returns:
+        Set of (case_id, categories) pairs
+    """
+    generated = set()
+    logged_files = set()
+    progress_path = os.path.join(output_dir, PROGRESS_FILE)
+    if os.path.exists(progress_path):
+        with open(progress_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                generated.add((str(entry["case_id"]), tuple(entry["categories"])))
+                logged_files.add(entry["file"])
+
+    if os.path.isdir(output_dir):
+        for case_dir in os.scandir(output_dir):
+            if not case_dir.is_dir():
+                continue
+            for entry in os.scandir(case_dir.path):
+                if not entry.name.endswith(".json") or entry.path in logged_files:
+                    continue
+                try:
+                    with open(entry.path) as f:
+                        metadata = json.load(f)["metadata"]
+                except (json.JSONDecodeError, KeyError):
+                    continue
+                generated.add((str(metadata["case_id"]), tuple(metadata["categories"])))
+    return generated
+
+
+async def _generate_question(
+    question: Question,
+    client: openai.AsyncOpenAI,
+    max_retries: int,
+    **llm_kwargs: Any,
+) -> None:
+    """Ask the LLM for a question, retrying transient errors and malformed responses with backoff."""
+    for attempt in range(max_retries + 1):
+        try:
+            await question.acreate_question(client=client, **llm_kwargs)
+            if question.content["question"] and question.content["answer"]:
+                return
+            error = ValueError("response is missing the question or answer")
+        except RETRYABLE_ERRORS as e:
+            error = e
+        if attempt == max_retries:
+            raise error
+        await asyncio.sleep(min(60.0, 2**attempt + random.random()))
+
+
+async def generate_questions_async(
     dataset: Dict[str, Any],
-    client: openai.OpenAI,
+    client: openai.AsyncOpenAI,
     output_dir: str,
     skip_first: int = 100,
     temperature: float = 0.7,
     top_p: float = 0.95,
     max_tokens: int = 1200,
     model: str = "gpt-4o",
-) -> None:
-    """Generate questions for each case and category combination.
+    concurrency: int = 8,
+    max_retries: int = 5,
+) -> Dict[str, int]:
+    """Generate questions for each case and category combination with a pool of workers.
+
+    Pairs that already have a question in `output_dir` are skipped, so an interrupted
+    run resumes where it stopped. Each finished pair is appended to the progress log.
 
     Args:
         dataset: Dictionary of case data
-        client: OpenAI client instance
+        client: Async OpenAI client, or a FakeAsyncLLMClient for offline runs
         output_dir: Directory to save generated questions
         skip_first: Number of initial cases to skip
         temperature: LLM temperature parameter
         top_p: LLM top_p parameter
         max_tokens: Maximum tokens for LLM response
         model: LLM model name
+        concurrency: Number of requests in flight
+        max_retries: Retries of a failed request before giving up on the pair
+
+    Returns:
+        Dict[str, int]: Number of questions generated, skipped as existing and failed
     """
     target_cases = sorted(list(dataset.keys()), key=int)[-len(dataset) : -skip_first]
-
-    for case_id in tqdm(target_cases, desc="Processing cases"):
-        case_data = dataset[case_id]
-
-        for category in tqdm(
-            CATEGORY_COMBINATIONS, desc=f"Categories for case {case_id}"
-        ):
+    generated = load_generated_pairs(output_dir)
+    pending = [
+        (case_id, categories)
+        for case_id in target_cases
+        for categories in CATEGORY_COMBINATIONS
+        if (str(dataset[case_id]["case_id"]), tuple(categories)) not in generated
+    ]
+    counts = {
+        "generated": 0,
+        "existing": len(target_cases) * len(CATEGORY_COMBINATIONS) - len(pending),
+        "failed": 0,
+    }
+
+    os.makedirs(output_dir, exist_ok=True)
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in pending:
+        queue.put_nowait(item)
+    progress_bar = tqdm(total=len(pending), desc="Generating questions")
+
+    async def worker(progress_file) -> None:
+        while not queue.empty():
+            case_id, categories = queue.get_nowait()
             question = Question(
                 type="multiple choice (A/B/C/D/E/F)",
                 difficulty="complex",
-                case_data=case_data,
-                categories=category,
+                case_data=dataset[case_id],
+                categories=categories,
                 sections=DEFAULT_SECTIONS,
                 system_prompt=SYSTEM_PROMPT,
             )
+            try:
+                await _generate_question(
+                    question,
+                    client,
+                    max_retries,
+                    temperature=temperature,
+                    top_p=top_p,
+                    max_tokens=max_tokens,
+                    model=model,
+                )
+            except Exception as e:
+                counts["failed"] += 1
+                tqdm.write(f"Failed case {case_id} {categories}: {e}")
+            else:
+                question.save(output_dir)
+                progress_file.write(
+                    json.dumps(
+                        {
+                            "case_id": str(question.case_id),
+                            "categories": categories,
+                            "file": question.output_file,
+                        }
+                    )
+                    + "\n"
+                )
+                progress_file.flush()
+                counts["generated"] += 1
+            progress_bar.update()
+
+    with open(os.path.join(output_dir, PROGRESS_FILE), "a") as progress_file:
+        await asyncio.gather(*(worker(progress_file) for _ in range(concurrency)))
+    progress_bar.close()
+    return counts
 
-            response = question.create_question(
-                client=client,
-                temperature=temperature,
-                top_p=top_p,
-                max_tokens=max_tokens,
-                model=model,
-            )
-            question.save(output_dir)
+
+def generate_questions(
+    dataset: Dict[str, Any],
+    client: openai.AsyncOpenAI,
+    output_dir: str,
+    skip_first: int = 100,
+    temperature: float = 0.7,
+    top_p: float = 0.95,
+    max_tokens: int = 1200,
+    model: str = "gpt-4o",
+    concurrency: int = 8,
+    max_retries: int = 5,
+) -> Dict[str, int]:
+    """Generate questions for each case and category combination.
+
+    Blocking wrapper of `generate_questions_async`, see there for the arguments.
+    """
+    return asyncio.run(
+        generate_questions_async(
+            dataset,
+            client,
+            output_dir,
+            skip_first=skip_first,
+            temperature=temperature,
+            top_p=top_p,
+            max_tokens=max_tokens,
+            model=model,
+            concurrency=concurrency,
+            max_retries=max_retries,
+        )
+    )
 
 
 def main():
     """Main execution function."""
-    client = openai.OpenAI()
+    parser = argparse.ArgumentParser(description="Generate ChestAgentBench questions")
+    parser.add_argument("--output-dir", default="benchmark/questions")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument(
+        "--fake-llm", action="store_true", help="Use an offline fake LLM, for testing"
+    )
+    args = parser.parse_args()
+
+    client = FakeAsyncLLMClient() if args.fake_llm else openai.AsyncOpenAI()
 
     # Load and verify dataset
     dataset = load_eurorad_dataset(
@@ -369,7 +578,17 @@ def main():
     pprint(case_data, sort_dicts=False)
 
     # Generate questions
-    generate_questions(dataset=dataset, client=client, output_dir="benchmark/questions")
+    counts = generate_questions(
+        dataset=dataset,
+        client=client,
+        output_dir=args.output_dir,
+        concurrency=args.concurrency,
+        max_retries=args.max_retries,
+    )
+    print(
+        f"Generated {counts['generated']} questions, "
+        f"{counts['existing']} already existed, {counts['failed']} failed"
+    )
 
 
 if __name__ == "__main__":
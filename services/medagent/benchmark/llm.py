@@ -1,3 +1,9 @@
+import asyncio
+import hashlib
+import random
+from types import SimpleNamespace
+
+import httpx
 import openai
 
 
@@ -39,3 +45,77 @@ def get_llm_response(
     )
 
     return response.choices[0].message.content
+
+
+async def aget_llm_response(
+    client: openai.AsyncOpenAI,
+    prompt: str,
+    system_prompt: str = "You are a helpful assistant.",
+    model: str = "gpt-4o-mini",
+    temperature: float = 0.7,
+    top_p: float = 0.95,
+    max_tokens: int = 500,
+) -> str:
+    """
+    Get response from OpenAI language model without blocking the event loop.
+
+    Args:
+        client (openai.AsyncOpenAI): Async OpenAI client, or a FakeAsyncLLMClient
+        prompt (str): The user prompt/question to send to the model
+        system_prompt (str, optional): System prompt to set model behavior.
+        model (str, optional): OpenAI model to use. Defaults to "gpt-4o-mini".
+        temperature (float, optional): Controls randomness in responses. Defaults to 0.7.
+        top_p (float, optional): Controls diversity via nucleus sampling. Defaults to 0.95.
+        max_tokens (int, optional): Max tokens in model response. Defaults to 500.
+
+    Returns:
+        str: The model's response text
+    """
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt},
+    ]
+
+    response = await client.chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        top_p=top_p,
+        max_tokens=max_tokens,
+    )
+
+    return response.choices[0].message.content
+
+
+class FakeAsyncLLMClient:
+    """
+    Offline stand-in for openai.AsyncOpenAI answering chat completions with a canned question.
+
+    The answer letter is derived from a hash of the prompt, so responses are
+    deterministic. Useful to test the generation pipeline without API calls.
+
+    Args:
+        latency (float, optional): Simulated response time in seconds. Defaults to 0.01.
+        failure_rate (float, optional): Fraction of requests raising a connection error. Defaults to 0.
+    """
+
+    def __init__(self, latency: float = 0.01, failure_rate: float = 0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, model: str, messages: list[dict], **kwargs) -> SimpleNamespace:
+        await asyncio.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            raise openai.APIConnectionError(request=httpx.Request("POST", "https://fake.invalid"))
+
+        prompt = messages[-1]["content"]
+        answer = "ABCDEF"[hashlib.sha256(prompt.encode()).digest()[0] % 6]
+        content = (
+            "THOUGHTS: Fake reasoning.\n"
+            "QUESTION: Which finding is shown in Figure 1? A) a B) b C) c D) d E) e F) f\n"
+            'FIGURES: ["Figure 1"]\n'
+            "EXPLANATION: Fake explanation.\n"
+            f"ANSWER: {answer}"
+        )
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
@@ -0,0 +1,92 @@
+import argparse
+import time
+
+import torch
+import torchxrayvision as xrv
+
+from medrax.tools.batching import DynamicBatcher, configure_cpu_threads
+
+
+def make_inputs(num_images: int, size: int = 224) -> list[torch.Tensor]:
+    """Create random inputs in the torchxrayvision intensity range [-1024, 1024].
+
+    Args:
+        num_images (int): Number of input tensors to create.
+        size (int): Height and width of each image.
+
+    Returns:
+        List[torch.Tensor]: Tensors of shape (1, size, size).
+    """
+    return [torch.rand(1, size, size) * 2048 - 1024 for _ in range(num_images)]
+
+
+def benchmark_unbatched(model: torch.nn.Module, inputs: list[torch.Tensor]) -> float:
+    """Classify each image with its own forward pass, as the tool used to.
+
+    Returns:
+        float: Throughput in images per second.
+    """
+    start = time.perf_counter()
+    with torch.inference_mode():
+        for tensor in inputs:
+            model(tensor.unsqueeze(0))
+    return len(inputs) / (time.perf_counter() - start)
+
+
+def benchmark_batched(
+    model: torch.nn.Module,
+    inputs: list[torch.Tensor],
+    batch_size: int,
+    max_wait_ms: float,
+) -> float:
+    """Submit every image at once, as concurrent sessions would, and wait for all results.
+
+    Returns:
+        float: Throughput in images per second.
+    """
+    batcher = DynamicBatcher(model, max_batch_size=batch_size, max_wait_ms=max_wait_ms)
+    try:
+        start = time.perf_counter()
+        futures = [batcher.submit(tensor) for tensor in inputs]
+        for future in futures:
+            future.result()
+        return len(inputs) / (time.perf_counter() - start)
+    finally:
+        batcher.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure CPU throughput of the chest X-ray classifier against batch size"
+    )
+    parser.add_argument("--model", default="densenet121-res224-all")
+    parser.add_argument("--num-images", type=int, default=64)
+    parser.add_argument(
+        "--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32]
+    )
+    parser.add_argument("--max-wait-ms", type=float, default=10.0)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--warmup", type=int, default=4)
+    args = parser.parse_args()
+
+    configure_cpu_threads(args.threads, num_interop_threads=1)
+    model = xrv.models.DenseNet(weights=args.model).eval()
+    inputs = make_inputs(args.num_images)
+
+    # Warm up allocator and kernels so the first configuration is not penalized
+    benchmark_unbatched(model, inputs[: args.warmup])
+
+    print(f"torch threads: {torch.get_num_threads()}, images: {args.num_images}")
+    baseline = benchmark_unbatched(model, inputs)
+    print(f"{'unbatched':>12}: {baseline:8.2f} img/s")
+
+    for batch_size in args.batch_sizes:
+        throughput = benchmark_batched(model, inputs, batch_size, args.max_wait_ms)
+        print(
+            f"{f'batch={batch_size}':>12}: {throughput:8.2f} img/s "
+            f"({throughput / baseline:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import statistics
+import tempfile
+import time
+from collections.abc import Callable
+
+import torch
+import torchxrayvision as xrv
+from transformers import VisionEncoderDecoderModel
+
+from medrax.tools.batching import configure_cpu_threads
+from medrax.tools.cpu_backends import CPU_BACKENDS, check_parity, optimize_for_cpu
+from medrax.tools.report_generation import _EncoderHiddenStates
+
+
+def time_model(
+    model: Callable[[torch.Tensor], torch.Tensor], x: torch.Tensor, runs: int
+) -> tuple[float, float]:
+    """Time forward passes on one input after a warm-up pass.
+
+    Returns:
+        Tuple[float, float]: Median latency in milliseconds and throughput in images per second.
+    """
+    timings = []
+    with torch.inference_mode():
+        model(x)
+        for _ in range(runs):
+            start = time.perf_counter()
+            model(x)
+            timings.append(time.perf_counter() - start)
+    latency = statistics.median(timings)
+    return latency * 1000, x.shape[0] / latency if x.dim() == 4 else 1 / latency
+
+
+def build_models(args) -> dict[str, tuple[torch.nn.Module, Callable[[int], torch.Tensor]]]:
+    """Models to benchmark with a function creating a random input of a given batch size."""
+    models = {}
+    if "classifier" in args.models:
+        models["classifier"] = (
+            xrv.models.DenseNet(weights="densenet121-res224-all").eval(),
+            lambda b: torch.rand(b, 1, 224, 224) * 2048 - 1024,
+        )
+    if "segmentation" in args.models:
+        # The tool runs PSPNet on one unbatched (1, 512, 512) image
+        models["segmentation"] = (
+            xrv.baseline_models.chestx_det.PSPNet().eval(),
+            lambda b: torch.rand(1, 512, 512) * 2048 - 1024,
+        )
+    if "report_encoder" in args.models:
+        model = VisionEncoderDecoderModel.from_pretrained(
+            "IAMJB/chexpert-mimic-cxr-findings-baseline", cache_dir=args.model_dir
+        )
+        size = model.config.encoder.image_size
+        models["report_encoder"] = (
+            _EncoderHiddenStates(model.encoder).eval(),
+            lambda b: torch.randn(b, 3, size, size),
+        )
+    return models
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare latency, throughput and output parity of CPU inference backends"
+    )
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        default=["classifier", "segmentation", "report_encoder"],
+        choices=["classifier", "segmentation", "report_encoder"],
+    )
+    parser.add_argument("--backends", nargs="+", default=list(CPU_BACKENDS), choices=CPU_BACKENDS)
+    parser.add_argument("--model-dir", default="./model-weights")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--parity-samples", type=int, default=8)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    configure_cpu_threads(args.threads, num_interop_threads=1)
+    print(f"torch threads: {torch.get_num_threads()}")
+
+    with tempfile.TemporaryDirectory() as onnx_dir:
+        for name, (model, make_input) in build_models(args).items():
+            parity_inputs = [make_input(1) for _ in range(args.parity_samples)]
+            for backend in args.backends:
+                optimized = optimize_for_cpu(
+                    model,
+                    backend,
+                    example_input=make_input(1),
+                    onnx_path=f"{onnx_dir}/{name}.onnx",
+                    dynamic_batch=name != "segmentation",
+                    parity_atol=None,
+                )
+                parity = check_parity(model, optimized, parity_inputs)
+                single_ms, _ = time_model(optimized, make_input(1), args.runs)
+                batch_ms, throughput = time_model(optimized, make_input(args.batch_size), args.runs)
+                print(
+                    f"{name:>15} {backend:>5}: {single_ms:8.1f} ms/img, "
+                    f"{throughput:7.1f} img/s at batch {args.batch_size} ({batch_ms:.1f} ms), "
+                    f"max |diff| {parity['max_abs_diff']:.2e}, mean |diff| {parity['mean_abs_diff']:.2e}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import argparse
+import asyncio
+import random
+import time
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+
+from medrax.llava.serve.batch_scheduler import ContinuousBatchScheduler, GenerationRequest
+
+
+def make_prompts(tokenizer, num_prompts: int, seed: int = 0) -> list[torch.Tensor]:
+    """Create prompts of varied lengths, so batches need padding.
+
+    Args:
+        tokenizer: Tokenizer of the model.
+        num_prompts (int): Number of prompts to create.
+        seed (int): Seed of the prompt lengths and words.
+
+    Returns:
+        List[torch.Tensor]: (L,) prompt token ids.
+    """
+    rng = random.Random(seed)
+    words = ["chest", "x-ray", "opacity", "left", "lung", "effusion", "normal", "heart"]
+    prompts = []
+    for _ in range(num_prompts):
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(3, 40)))
+        prompts.append(tokenizer(text, return_tensors="pt").input_ids[0])
+    return prompts
+
+
+def generate_reference(model, tokenizer, prompts: list[torch.Tensor], max_new_tokens: int) -> list[str]:
+    """Greedy completions of each prompt on its own with `model.generate`."""
+    outputs = []
+    with torch.inference_mode():
+        for input_ids in prompts:
+            output_ids = model.generate(
+                input_ids[None],
+                attention_mask=torch.ones_like(input_ids)[None],
+                do_sample=False,
+                max_new_tokens=max_new_tokens,
+                pad_token_id=tokenizer.eos_token_id,
+            )
+            outputs.append(
+                tokenizer.decode(output_ids[0, len(input_ids) :], skip_special_tokens=True)
+            )
+    return outputs
+
+
+async def run_scheduler(
+    scheduler: ContinuousBatchScheduler,
+    prompts: list[torch.Tensor],
+    max_new_tokens: int,
+    arrival_ms: float,
+) -> tuple[list[str], float]:
+    """Submit greedy requests at staggered times, as concurrent clients would, and collect their final texts.
+
+    Returns:
+        Tuple[List[str], float]: Completion of each prompt, and throughput in tokens per second.
+    """
+
+    async def client(i: int, input_ids: torch.Tensor) -> tuple[str, int]:
+        await asyncio.sleep(i * arrival_ms / 1000)
+        request = GenerationRequest(
+            input_ids=input_ids, temperature=0.0, max_new_tokens=max_new_tokens
+        )
+        text = ""
+        async for output in scheduler.stream(request):
+            if output["error_code"] != 0:
+                raise RuntimeError(output["text"])
+            text = output["text"]
+        return text, len(request.output_ids)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(client(i, p) for i, p in enumerate(prompts)))
+    elapsed = time.perf_counter() - start
+    return [text for text, _ in results], sum(n for _, n in results) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check continuous batching against sequential generation and measure throughput on CPU"
+    )
+    parser.add_argument("--model", default="hf-internal-testing/tiny-random-LlamaForCausalLM")
+    parser.add_argument("--num-prompts", type=int, default=32)
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--arrival-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    model = AutoModelForCausalLM.from_pretrained(args.model, torch_dtype=torch.float32).eval()
+    prompts = make_prompts(tokenizer, args.num_prompts)
+
+    reference = generate_reference(model, tokenizer, prompts, args.max_new_tokens)
+
+    baseline = None
+    for batch_size in args.batch_sizes:
+        scheduler = ContinuousBatchScheduler(model, tokenizer, max_batch_size=batch_size)
+        try:
+            outputs, throughput = asyncio.run(
+                run_scheduler(scheduler, prompts, args.max_new_tokens, args.arrival_ms)
+            )
+        finally:
+            scheduler.close()
+        baseline = baseline or throughput
+        matches = sum(a == b for a, b in zip(outputs, reference))
+        print(
+            f"{f'batch={batch_size}':>12}: {throughput:8.2f} tok/s "
+            f"({throughput / baseline:.2f}x), "
+            f"{matches}/{len(prompts)} outputs match sequential generation"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import statistics
+import time
+
+import numpy as np
+import skimage.measure
+import skimage.transform
+
+from medrax.tools.segmentation import region_statistics
+
+
+def make_masks(num_organs: int, size: int, rng: np.random.Generator) -> np.ndarray:
+    """Random elliptical masks standing in for predicted organs.
+
+    Returns:
+        np.ndarray: (num_organs, size, size) boolean masks.
+    """
+    y, x = np.mgrid[:size, :size]
+    masks = np.zeros((num_organs, size, size), dtype=bool)
+    for k in range(num_organs):
+        cy, cx = rng.uniform(0.2, 0.8, 2) * size
+        ry, rx = rng.uniform(0.05, 0.25, 2) * size
+        masks[k] = ((y - cy) / ry) ** 2 + ((x - cx) / rx) ** 2 <= 1
+    return masks
+
+
+def per_organ_statistics(masks: np.ndarray, image: np.ndarray) -> list[tuple]:
+    """Previous implementation: resize and run regionprops on each mask separately."""
+    height, width = image.shape
+    crop = min(height, width)
+    top, left = (height - crop) // 2, (width - crop) // 2
+
+    results = []
+    for mask in masks:
+        resized = skimage.transform.resize(
+            mask.astype(float), (crop, crop), order=0, preserve_range=True, anti_aliasing=False
+        )
+        full_mask = np.zeros(image.shape)
+        full_mask[top : top + crop, left : left + crop] = resized
+        props = skimage.measure.regionprops(full_mask.astype(int))
+        if not props:
+            results.append(None)
+            continue
+        pixels = image[full_mask > 0]
+        results.append(
+            (
+                int(full_mask.sum()),
+                props[0].centroid,
+                props[0].bbox,
+                pixels.mean(),
+                pixels.std(),
+            )
+        )
+    return results
+
+
+def compare(masks: np.ndarray, image: np.ndarray) -> dict[str, float]:
+    """Largest differences between both implementations.
+
+    Rounding of pixel centers that fall exactly halfway can differ, so areas and
+    boxes may differ by a row or column of pixels in rare cases.
+    """
+    stats = region_statistics(masks, image)
+    diffs = {"area": 0.0, "bbox": 0.0, "centroid": 0.0, "intensity": 0.0}
+    for k, reference in enumerate(per_organ_statistics(masks, image)):
+        if reference is None:
+            diffs["area"] = max(diffs["area"], float(stats["area"][k]))
+            continue
+        area, centroid, bbox, mean, std = reference
+        diffs["area"] = max(diffs["area"], abs(float(stats["area"][k]) - area))
+        diffs["bbox"] = max(diffs["bbox"], float(np.abs(stats["bbox"][k] - bbox).max()))
+        diffs["centroid"] = max(
+            diffs["centroid"], float(np.abs(stats["centroid"][k] - centroid).max())
+        )
+        diffs["intensity"] = max(
+            diffs["intensity"],
+            abs(stats["mean_intensity"][k] - mean),
+            abs(stats["std_intensity"][k] - std),
+        )
+    return diffs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare per-organ and vectorized segmentation metrics"
+    )
+    parser.add_argument("--height", type=int, default=2500)
+    parser.add_argument("--width", type=int, default=2048)
+    parser.add_argument("--organs", type=int, default=14)
+    parser.add_argument("--model-size", type=int, default=512)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    masks = make_masks(args.organs, args.model_size, rng)
+    image = rng.integers(0, 256, (args.height, args.width)).astype(np.uint8)
+
+    diffs = compare(masks, image)
+    print("max difference: " + ", ".join(f"{k} {v:.2e}" for k, v in diffs.items()))
+
+    for name, fn in (
+        ("per-organ", per_organ_statistics),
+        ("vectorized", region_statistics),
+    ):
+        timings = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            fn(masks, image)
+            timings.append(time.perf_counter() - start)
+        print(f"{name:>10}: {statistics.median(timings) * 1000:8.1f} ms per image")
+
+
+if __name__ == "__main__":
+    main()
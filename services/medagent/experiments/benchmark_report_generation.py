@@ -0,0 +1,60 @@
+import argparse
+import statistics
+import time
+
+from medrax.tools.image_cache import image_cache
+from medrax.tools.report_generation import ChestXRayReportGeneratorTool
+
+
+def time_report(
+    tool: ChestXRayReportGeneratorTool, image_path: str
+) -> tuple[float, float]:
+    """Generate one report with streaming enabled.
+
+    Returns:
+        Tuple[float, float]: Seconds until findings were available and until the full report was.
+    """
+    # Measure preprocessing too, as a fresh image would incur it
+    image_cache.clear()
+    start = time.perf_counter()
+    first_section = None
+    for _section, _text in tool.stream_report(image_path):
+        if first_section is None:
+            first_section = time.perf_counter() - start
+    return first_section, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure CPU latency of chest X-ray report generation"
+    )
+    parser.add_argument("image_path", help="Path to a chest X-ray image (JPG or PNG)")
+    parser.add_argument("--model-dir", default="./model-weights")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--num-beams", type=int, default=1)
+    parser.add_argument("--max-length", type=int, default=128)
+    args = parser.parse_args()
+
+    tool = ChestXRayReportGeneratorTool(
+        cache_dir=args.model_dir,
+        device="cpu",
+        generation_args={"num_beams": args.num_beams, "max_length": args.max_length},
+    )
+
+    # Warm up kernels and tokenizer caches once
+    time_report(tool, args.image_path)
+
+    for concurrent in (False, True):
+        tool.concurrent_sections = concurrent
+        timings = [time_report(tool, args.image_path) for _ in range(args.runs)]
+        first = statistics.median(t[0] for t in timings)
+        total = statistics.median(t[1] for t in timings)
+        mode = "concurrent" if concurrent else "sequential"
+        print(
+            f"{mode:>10}: findings after {first:6.2f}s, full report after {total:6.2f}s "
+            f"(median of {args.runs})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,647 @@
+"""Concurrent, resumable runner for ChestAgentBench evaluations.
+
+Questions are answered by a pool of asyncio workers sharing a token-bucket rate
+limit. Each result is appended to a JSONL file as soon as it is available, in the
+format read by analyze_axes.py and compare_runs.py. The output file doubles as the
+checkpoint: when a run is restarted, questions already answered or skipped are not
+asked again, while errors are retried.
+
+Example:
+    python benchmark_runner.py --backend gpt4o --output results/gpt4o.jsonl \\
+        --concurrency 8 --rate 2
+    python benchmark_runner.py --backend stub --output /tmp/stub.jsonl
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Protocol
+
+STRICT_SYSTEM_PROMPT = """You are a medical imaging expert. Your task is to provide ONLY a single letter answer.
+Rules:
+1. Respond with exactly one uppercase letter (A/B/C/D/E/F)
+2. Do not add periods, explanations, or any other text
+3. Do not use markdown or formatting
+4. Do not restate the question
+5. Do not explain your reasoning
+
+Examples of valid responses:
+A
+B
+C
+
+Examples of invalid responses:
+"A."
+"Answer: B"
+"C) This shows..."
+"The answer is D"
+"""
+
+GPT_SYSTEM_PROMPT = (
+    "You are a medical imaging expert. Provide only the letter corresponding to your "
+    "answer choice (A/B/C/D/E/F)."
+)
+
+
+class SkipQuestion(Exception):
+    """The question cannot be asked to the backend, e.g. it has no usable images."""
+
+
+class RetryableError(Exception):
+    """A transient backend failure, such as a rate limit, worth retrying.
+
+    Attributes:
+        retry_after (Optional[float]): Delay requested by the server in seconds.
+    """
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class BenchmarkQuestion:
+    """A benchmark question with the case it belongs to."""
+
+    case_id: str
+    question_id: str
+    question_data: dict[str, Any]
+    case_details: dict[str, Any]
+
+    @property
+    def prompt(self) -> str:
+        return f"""Given the following medical case:
+Please answer this multiple choice question:
+{self.question_data["question"]}
+Base your answer only on the provided images and case information."""
+
+    def subfigures(self) -> list[dict[str, Any]]:
+        """Subfigures of the case referenced by the question's "figures" field.
+
+        "Figure 2" selects every subfigure of figure 2, "Figure 2b" only subfigure b.
+        """
+        figures = self.question_data["figures"]
+        if isinstance(figures, str):
+            try:
+                required_figures = json.loads(figures)
+            except json.JSONDecodeError:
+                required_figures = [figures]
+        elif isinstance(figures, list):
+            required_figures = figures
+        else:
+            required_figures = [str(figures)]
+
+        subfigures = []
+        for figure in required_figures:
+            figure = figure if figure.startswith("Figure ") else f"Figure {figure}"
+            base_figure_num = "".join(filter(str.isdigit, figure))
+            figure_letter = "".join(filter(str.isalpha, figure.split()[-1])) or None
+
+            for case_figure in self.case_details.get("figures", []):
+                if case_figure["number"] != f"Figure {base_figure_num}":
+                    continue
+                if figure_letter:
+                    subfigures.extend(
+                        subfig
+                        for subfig in case_figure.get("subfigures", [])
+                        if subfig.get("number", "").lower().endswith(figure_letter.lower())
+                        or subfig.get("label", "").lower() == figure_letter.lower()
+                    )
+                else:
+                    subfigures.extend(case_figure.get("subfigures", []))
+        return subfigures
+
+    def log_input(self) -> dict[str, Any]:
+        return {
+            "question_data": {
+                "question": self.question_data["question"],
+                "explanation": self.question_data.get("explanation"),
+                "metadata": self.question_data.get("metadata", {}),
+                "figures": self.question_data["figures"],
+            },
+        }
+
+
+def validate_answer(response_text: str | None) -> str | None:
+    """Extract a single-letter answer (A-F) from a model response.
+
+    Args:
+        response_text: Raw response text from the model
+
+    Returns:
+        str | None: Single uppercase letter if found, None otherwise
+    """
+    if not response_text:
+        return None
+
+    cleaned = response_text.strip().upper()
+    if len(cleaned) == 1 and cleaned in "ABCDEF":
+        return cleaned
+
+    match = re.search(r"ANSWER\s*(?:IS)?:?\s*([A-F])\b", cleaned) or re.search(
+        r"\b([A-F])\b", cleaned
+    )
+    return match.group(1) if match else None
+
+
+class Backend(Protocol):
+    """A model answering benchmark questions.
+
+    `answer` returns the fields added to the result record, at least "model_answer",
+    and raises SkipQuestion or RetryableError.
+    """
+
+    name: str
+    temperature: float | None
+
+    async def answer(self, question: BenchmarkQuestion) -> dict[str, Any]: ...
+
+
+class OpenAIChatBackend:
+    """Chat completions API with image URLs, e.g. OpenAI or OpenRouter."""
+
+    def __init__(
+        self,
+        name: str,
+        api_key: str,
+        base_url: str | None = None,
+        temperature: float = 0.2,
+        system_prompt: str = STRICT_SYSTEM_PROMPT,
+        max_tokens: int | None = None,
+        timeout: float = 120,
+    ):
+        import openai
+
+        self.openai = openai
+        self.name = name
+        self.temperature = temperature
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+        self.client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, timeout=timeout)
+
+    async def answer(self, question: BenchmarkQuestion) -> dict[str, Any]:
+        image_urls = [subfig["url"] for subfig in question.subfigures() if "url" in subfig]
+        if not image_urls:
+            raise SkipQuestion("no_images")
+
+        content = [{"type": "text", "text": question.prompt}] + [
+            {"type": "image_url", "image_url": {"url": url}} for url in image_urls
+        ]
+        kwargs = {"max_tokens": self.max_tokens} if self.max_tokens else {}
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.name,
+                temperature=self.temperature,
+                messages=[
+                    {"role": "system", "content": self.system_prompt},
+                    {"role": "user", "content": content},
+                ],
+                **kwargs,
+            )
+        except self.openai.RateLimitError as e:
+            retry_after = e.response.headers.get("retry-after")
+            raise RetryableError(str(e), float(retry_after) if retry_after else None) from e
+        except (
+            self.openai.APIConnectionError,
+            self.openai.APITimeoutError,
+            self.openai.InternalServerError,
+        ) as e:
+            raise RetryableError(str(e)) from e
+
+        raw_answer = response.choices[0].message.content
+        return {
+            "usage": {
+                "prompt_tokens": response.usage.prompt_tokens,
+                "completion_tokens": response.usage.completion_tokens,
+                "total_tokens": response.usage.total_tokens,
+            },
+            "raw_output": raw_answer,
+            "model_answer": validate_answer(raw_answer),
+            "image_urls": image_urls,
+        }
+
+
+class LlavaMedBackend:
+    """LLaVA-Med model worker, queried with the request format of benchmark_llavamed.py."""
+
+    temperature = 0.5
+
+    def __init__(self, worker_addr: str, name: str):
+        from benchmark_llavamed import create_inference_request
+
+        self.create_inference_request = create_inference_request
+        self.worker_addr = worker_addr
+        self.name = name
+
+    async def answer(self, question: BenchmarkQuestion) -> dict[str, Any]:
+        # The request helper reads images from MedMAX/data relative to the working directory
+        result = await asyncio.to_thread(
+            self.create_inference_request,
+            question.question_data,
+            question.case_details,
+            question.case_id,
+            question.question_id,
+            self.worker_addr,
+            self.name,
+            True,
+        )
+        if result == ("skipped", 0.0):
+            raise SkipQuestion("no_images")
+        if not isinstance(result, dict):
+            raise RetryableError("worker request failed")
+        return {
+            "raw_output": result["raw_output"],
+            "model_answer": result["validated_answer"],
+            "image_paths": result["image_paths"],
+        }
+
+
+class CheXagentBackend:
+    """CheXagent run locally. Generation is serialized since the model holds one GPU."""
+
+    temperature = None
+
+    def __init__(self, name: str, data_dir: str, device: str = "cuda"):
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        self.torch = torch
+        self.name = name
+        self.data_dir = data_dir
+        self.device = device
+        self.tokenizer = AutoTokenizer.from_pretrained(name, trust_remote_code=True)
+        self.model = (
+            AutoModelForCausalLM.from_pretrained(name, device_map="auto", trust_remote_code=True)
+            .to(torch.bfloat16)
+            .eval()
+        )
+        self.lock = asyncio.Lock()
+
+    def _generate(self, image_paths: list[str], prompt: str) -> str:
+        query = self.tokenizer.from_list_format(
+            [*[{"image": path} for path in image_paths], {"text": prompt}]
+        )
+        conv = [
+            {"from": "system", "value": STRICT_SYSTEM_PROMPT},
+            {"from": "human", "value": query},
+        ]
+        input_ids = self.tokenizer.apply_chat_template(
+            conv, add_generation_prompt=True, return_tensors="pt"
+        )
+        with self.torch.no_grad():
+            output = self.model.generate(
+                input_ids.to(self.device),
+                do_sample=False,
+                num_beams=1,
+                use_cache=True,
+                max_new_tokens=512,
+            )[0]
+        return self.tokenizer.decode(output[input_ids.size(1) : -1])
+
+    async def answer(self, question: BenchmarkQuestion) -> dict[str, Any]:
+        image_paths = [
+            os.path.join(self.data_dir, subfig["local_path"])
+            for subfig in question.subfigures()
+            if "local_path" in subfig
+        ]
+        if not image_paths:
+            raise SkipQuestion("no_images")
+        async with self.lock:
+            raw_answer = await asyncio.to_thread(self._generate, image_paths, question.prompt)
+        return {
+            "raw_output": raw_answer,
+            "model_answer": validate_answer(raw_answer),
+            "image_paths": image_paths,
+        }
+
+
+class StubBackend:
+    """Offline backend answering from a hash of the question id, for testing the runner.
+
+    Attributes:
+        latency (float): Simulated response time in seconds.
+        failure_rate (float): Fraction of requests failing with a retryable error.
+    """
+
+    temperature = None
+
+    def __init__(self, name: str = "stub", latency: float = 0.05, failure_rate: float = 0.0):
+        self.name = name
+        self.latency = latency
+        self.failure_rate = failure_rate
+
+    async def answer(self, question: BenchmarkQuestion) -> dict[str, Any]:
+        await asyncio.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            raise RetryableError("simulated failure")
+        digest = hashlib.sha256(question.question_id.encode()).digest()
+        letter = "ABCDEF"[digest[0] % 6]
+        return {"raw_output": letter, "model_answer": letter}
+
+
+class TokenBucket:
+    """Asyncio token bucket allowing `rate` requests per second with bursts of `capacity`.
+
+    A rate limit reported by the server pauses every worker, instead of each one
+    retrying on its own.
+    """
+
+    def __init__(self, rate: float | None, capacity: int = 1):
+        """
+        Args:
+            rate: Requests per second, None for no limit.
+            capacity: Largest burst of requests.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        """Hold back all requests for `seconds`."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                if self.rate is None:
+                    return
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def iter_questions(questions_dir: str, metadata: dict[str, Any]) -> Iterator[BenchmarkQuestion]:
+    """Questions of the cases in `metadata`, in case order.
+
+    The questions directory is listed once; each question file is read when reached.
+    """
+    question_files: dict[str, list[str]] = {}
+    with os.scandir(questions_dir) as cases:
+        for case_dir in cases:
+            if case_dir.is_dir():
+                question_files[case_dir.name] = sorted(
+                    entry.path
+                    for entry in os.scandir(case_dir.path)
+                    if entry.name.startswith(f"{case_dir.name}_") and entry.name.endswith(".json")
+                )
+
+    for case_id, case_details in metadata.items():
+        for question_file in question_files.get(case_id, []):
+            with open(question_file) as file:
+                question_data = json.load(file)
+            yield BenchmarkQuestion(
+                case_id=case_id,
+                question_id=os.path.basename(question_file).split(".")[0],
+                question_data=question_data,
+                case_details=case_details,
+            )
+
+
+def load_finished(output_path: str) -> set[str]:
+    """Ids of the questions already answered or skipped in a previous run."""
+    finished = set()
+    if not os.path.exists(output_path):
+        return finished
+    with open(output_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Partial line written when a previous run was interrupted
+                continue
+            if record.get("status") in ("completed", "skipped"):
+                finished.add(record["question_id"])
+    return finished
+
+
+class BenchmarkRunner:
+    """Ask benchmark questions to a backend concurrently and record the results."""
+
+    def __init__(
+        self,
+        backend: Backend,
+        output_path: str,
+        concurrency: int = 4,
+        rate: float | None = None,
+        burst: int = 1,
+        max_retries: int = 5,
+    ):
+        """
+        Args:
+            backend: Model answering the questions.
+            output_path: JSONL file receiving one record per question, also used to resume.
+            concurrency: Number of questions in flight.
+            rate: Maximum requests per second, None for no limit.
+            burst: Largest burst of requests allowed by the rate limit.
+            max_retries: Attempts after a retryable error before recording it.
+        """
+        self.backend = backend
+        self.output_path = output_path
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.counts = {"completed": 0, "skipped": 0, "error": 0, "correct": 0}
+
+    async def run(self, questions: Iterator[BenchmarkQuestion]) -> dict[str, int]:
+        """Answer every question not already in the output file.
+
+        Returns:
+            dict[str, int]: Number of questions completed, skipped, failed and answered correctly.
+        """
+        finished = load_finished(self.output_path)
+        if finished:
+            print(f"Resuming: {len(finished)} questions already done")
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.output_path)), exist_ok=True)
+        with open(self.output_path, "a+") as output:
+            # Terminate a line left incomplete by an interrupted run
+            if output.tell() > 0:
+                output.seek(output.tell() - 1)
+                if output.read(1) != "\n":
+                    output.write("\n")
+
+            queue: asyncio.Queue[BenchmarkQuestion | None] = asyncio.Queue(self.concurrency * 2)
+            workers = [
+                asyncio.create_task(self._worker(queue, output)) for _ in range(self.concurrency)
+            ]
+            for question in questions:
+                if question.question_id not in finished:
+                    await queue.put(question)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        return self.counts
+
+    async def _worker(self, queue: asyncio.Queue, output) -> None:
+        while (question := await queue.get()) is not None:
+            try:
+                record = await self._ask(question)
+            except Exception as e:
+                # A malformed question must not stop the worker, or run() would
+                # block forever on the full queue
+                record = {
+                    "case_id": question.case_id,
+                    "question_id": question.question_id,
+                    "model": self.backend.name,
+                    "status": "error",
+                    "error": str(e),
+                    "timestamp": datetime.now().isoformat(),
+                }
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+
+            status = record["status"]
+            self.counts[status] += 1
+            if status == "completed" and record.get("model_answer") == record["correct_answer"]:
+                self.counts["correct"] += 1
+            done = self.counts["completed"] + self.counts["skipped"] + self.counts["error"]
+            print(
+                f"[{done}] {question.question_id}: {status}"
+                + (
+                    f", answer {record.get('model_answer')} (correct {record['correct_answer']})"
+                    if status == "completed"
+                    else ""
+                )
+            )
+
+    async def _ask(self, question: BenchmarkQuestion) -> dict[str, Any]:
+        """Ask one question with retries, returning its result record."""
+        record = {
+            "case_id": question.case_id,
+            "question_id": question.question_id,
+            "model": self.backend.name,
+            "temperature": self.backend.temperature,
+        }
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            start_time = time.time()
+            try:
+                result = await self.backend.answer(question)
+                record.update(
+                    status="completed",
+                    duration=round(time.time() - start_time, 2),
+                    correct_answer=question.question_data["answer"],
+                    **result,
+                )
+            except SkipQuestion as e:
+                record.update(status="skipped", reason=str(e))
+                break
+            except RetryableError as e:
+                if attempt == self.max_retries:
+                    record.update(status="error", reason="retries_exhausted", error=str(e))
+                    break
+                delay = e.retry_after or min(60.0, 2**attempt + random.random())
+                if e.retry_after:
+                    self.bucket.pause(delay)
+                print(f"{question.question_id}: {e}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            except Exception as e:
+                record.update(status="error", error=str(e))
+                break
+            else:
+                break
+
+        record["timestamp"] = datetime.now().isoformat()
+        record["input"] = question.log_input()
+        for key in ("image_urls", "image_paths"):
+            if key in record:
+                record["input"][key] = record.pop(key)
+        return record
+
+
+def create_backend(args: argparse.Namespace) -> Backend:
+    if args.backend == "gpt4o":
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY environment variable is not set.")
+        return OpenAIChatBackend(
+            args.model_name or "chatgpt-4o-latest",
+            api_key,
+            system_prompt=GPT_SYSTEM_PROMPT,
+            max_tokens=50,
+        )
+    if args.backend == "llama":
+        api_key = os.getenv("OPENROUTER_API_KEY")
+        if not api_key:
+            raise ValueError("OPENROUTER_API_KEY environment variable is not set.")
+        return OpenAIChatBackend(
+            args.model_name or "meta-llama/llama-3.2-90b-vision-instruct",
+            api_key,
+            base_url="https://openrouter.ai/api/v1",
+        )
+    if args.backend == "llava-med":
+        return LlavaMedBackend(args.worker_address, args.model_name or "llava-med-v1.5-mistral-7b")
+    if args.backend == "chexagent":
+        return CheXagentBackend(args.model_name or "StanfordAIMI/CheXagent-2-3b", args.data_dir)
+    return StubBackend(args.model_name or "stub", failure_rate=args.stub_failure_rate)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run ChestAgentBench against a model backend")
+    parser.add_argument(
+        "--backend", choices=["gpt4o", "llama", "llava-med", "chexagent", "stub"], required=True
+    )
+    parser.add_argument("--model-name", help="Model name, defaults to the backend's usual model")
+    parser.add_argument("--output", required=True, help="JSONL results file, resumed if it exists")
+    parser.add_argument("--questions-dir", default="../benchmark/questions")
+    parser.add_argument("--metadata", default="../data/eurorad_metadata.json")
+    parser.add_argument("--data-dir", default="../data", help="Root of the cases' local images")
+    parser.add_argument("--worker-address", default="http://localhost:21002")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, help="Maximum requests per second")
+    parser.add_argument("--burst", type=int, default=1)
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument("--limit", type=int, help="Ask at most this many pending questions")
+    parser.add_argument("--stub-failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with open(args.metadata) as file:
+        metadata = json.load(file)
+
+    backend = create_backend(args)
+    runner = BenchmarkRunner(
+        backend,
+        args.output,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        burst=args.burst,
+        max_retries=args.max_retries,
+    )
+    questions = iter_questions(args.questions_dir, metadata)
+    if args.limit is not None:
+        finished = load_finished(args.output)
+        questions = (q for q in questions if q.question_id not in finished)
+        questions = (q for _, q in zip(range(args.limit), questions))
+
+    print(f"Beginning benchmark evaluation for {backend.name} with temperature {backend.temperature}")
+    counts = asyncio.run(runner.run(questions))
+
+    answered = counts["completed"]
+    print("\nBenchmark Summary:")
+    print(f"Questions Completed: {answered}")
+    print(f"Questions Skipped: {counts['skipped']}")
+    print(f"Questions Failed: {counts['error']}")
+    if answered:
+        print(f"Accuracy: {counts['correct'] / answered * 100:.2f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,19 +2,24 @@ import argparse
 import json
 from pathlib import Path
 
+from medrax.agent.log_writer import open_log
 
-def get_latest_log() -> str:
-    """Find the most recently modified log file in the current directory.
+
+def get_latest_log(pattern: str = "api_usage_*.json") -> str:
+    """Find the most recently modified log file matching a pattern.
+
+    Args:
+        pattern: Glob pattern relative to the current directory
 
     Returns:
         str: Path to the most recently modified log file
 
     Raises:
-        FileNotFoundError: If no log files are found in the current directory
+        FileNotFoundError: If no log files match the pattern
     """
-    logs = list(Path(".").glob("api_usage_*.json"))
+    logs = list(Path(".").glob(pattern))
     if not logs:
-        raise FileNotFoundError("No log files found in the current directory.")
+        raise FileNotFoundError(f"No log files matching '{pattern}' found.")
     return str(max(logs, key=lambda p: p.stat().st_mtime))
 
 
@@ -100,6 +105,20 @@ def print_llama_entry(entry: dict) -> None:
         )
 
 
+def print_tool_call_entry(entry: dict) -> None:
+    """Print entry of the agent tool call log
+
+    Args:
+        entry: Log entry dictionary with the tool name, arguments and result
+    """
+    print("\n=== Tool Call ===")
+    print(f"Timestamp: {entry['timestamp']}")
+    print(f"Round ID: {entry.get('round_id', 'N/A')}")
+    print(f"Tool: {entry['name']} ({entry['tool_call_id']})")
+    print(f"Args: {json.dumps(entry['args'])}")
+    print(f"\nResult: {entry['content']}")
+
+
 def determine_model_type(entry: dict) -> str:
     """Determine the model type from the entry
 
@@ -107,8 +126,10 @@ def determine_model_type(entry: dict) -> str:
         entry: Log entry dictionary containing model information
 
     Returns:
-        str: Model type - 'gpt4', 'llama', or 'unknown'
+        str: Model type - 'gpt4', 'llama', 'tools', or 'unknown'
     """
+    if "tool_call_id" in entry:
+        return "tools"
     model = entry.get("model", "").lower()
     if "gpt-4" in model:
         return "gpt4"
@@ -132,17 +153,21 @@ def print_log_entry(
     Args:
         log_file: Path to the log file. If None, uses the latest log file.
         num_entries: Number of entries to print. If None, prints all entries.
-        model_filter: Filter entries by model type ('gpt4' or 'llama'). If None, prints all.
+        model_filter: Filter entries by model type ('gpt4', 'llama' or 'tools'). If None, prints all.
     """
     if log_file is None:
-        log_file = get_latest_log()
+        if model_filter == "tools":
+            log_file = get_latest_log("logs/tool_calls_*.jsonl*")
+        else:
+            log_file = get_latest_log()
         print(f"Using latest log file: {log_file}")
 
     entries_printed = 0
     total_entries = 0
     filtered_entries = 0
 
-    with open(log_file) as f:
+    # Plain and gzip-compressed JSONL logs are streamed line by line
+    with open_log(log_file) as f:
         for line in f:
             if line.startswith("HTTP"):
                 continue
@@ -160,6 +185,8 @@ def print_log_entry(
                     print_gpt4_entry(entry)
                 elif model_type == "llama":
                     print_llama_entry(entry)
+                elif model_type == "tools":
+                    print_tool_call_entry(entry)
                 else:
                     print(f"Unknown model type in entry: {entry['model']}")
                     continue
@@ -194,9 +221,9 @@ def main() -> None:
     parser.add_argument(
         "-m",
         "--model",
-        choices=["gpt4", "llama"],
+        choices=["gpt4", "llama", "tools"],
         default="gpt4",
-        help="Model type to display (default: gpt4)",
+        help="Model type to display, or 'tools' for agent tool call logs (default: gpt4)",
     )
     args = parser.parse_args()
 
@@ -0,0 +1,380 @@
+"""Indexed store of benchmark results.
+
+Result logs (JSONL written by the benchmark scripts, or the JSON summary written by
+benchmark_llavamed.py) are ingested once into SQLite, with indexes on run, case,
+question, category and model. Accuracy and run comparisons are then answered by
+SQL aggregates instead of re-parsing the logs. Logs that grew since they were
+ingested, like those of a resumed run, are read from where ingestion stopped.
+
+Example:
+    python results_store.py --db results.sqlite ingest gpt4o.jsonl medrax.jsonl
+    python results_store.py --db results.sqlite accuracy gpt4o.jsonl
+    python results_store.py --db results.sqlite diff gpt4o.jsonl medrax.jsonl
+    python results_store.py --db results.sqlite compare gpt4o.jsonl medrax.jsonl
+"""
+
+import argparse
+import json
+import sqlite3
+from collections.abc import Iterator, Sequence
+from pathlib import Path
+from typing import Any
+
+from analyze_axes import QUESTION_TYPES, extract_answer_letter
+from compare_runs import CATEGORY_ORDER
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    model TEXT,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    offset INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    case_id TEXT NOT NULL,
+    question_id TEXT NOT NULL,
+    model TEXT,
+    model_answer TEXT,
+    correct_answer TEXT,
+    is_correct INTEGER,
+    PRIMARY KEY (run_id, question_id)
+);
+CREATE INDEX IF NOT EXISTS results_case ON results (case_id);
+CREATE INDEX IF NOT EXISTS results_question ON results (question_id);
+CREATE INDEX IF NOT EXISTS results_model ON results (model);
+CREATE TABLE IF NOT EXISTS result_categories (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    question_id TEXT NOT NULL,
+    category TEXT NOT NULL,
+    PRIMARY KEY (run_id, question_id, category)
+);
+CREATE INDEX IF NOT EXISTS result_categories_category ON result_categories (category, run_id);
+"""
+
+# Categories assumed for LLaVA-Med summaries, which do not record question metadata
+ALL_CATEGORIES = list(CATEGORY_ORDER)
+
+
+def _letter_result(entry: dict[str, Any]) -> tuple[str | None, str | None, int | None]:
+    """Answer letters of a result entry and whether they match, None when not gradable."""
+    model_letter = extract_answer_letter(entry.get("model_answer"))
+    correct_letter = extract_answer_letter(entry.get("correct_answer"))
+    if model_letter and correct_letter:
+        return model_letter, correct_letter, int(model_letter == correct_letter)
+    return model_letter, correct_letter, None
+
+
+def _summary_entries(path: Path) -> Iterator[dict[str, Any]]:
+    """Entries of a benchmark_llavamed.py JSON summary, in the JSONL entry format."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    for result in data.get("results", []):
+        if all(k in result for k in ("case_id", "question_id", "correct_answer")):
+            yield {
+                "case_id": result["case_id"],
+                "question_id": result["question_id"],
+                "model": data.get("model"),
+                "model_answer": result.get("model_answer")
+                or result.get("validated_answer")
+                or result.get("raw_output", ""),
+                "correct_answer": result["correct_answer"],
+                "input": {"question_data": {"metadata": {"categories": ALL_CATEGORIES}}},
+            }
+
+
+def _jsonl_entries(path: Path, progress: dict[str, int]) -> Iterator[dict[str, Any]]:
+    """Stream the entries of a JSONL log from progress["offset"], advancing it past each complete line."""
+    with open(path, "rb") as f:
+        f.seek(progress["offset"])
+        for line in f:
+            if not line.endswith(b"\n"):
+                # Line still being written, read on the next ingestion
+                break
+            progress["offset"] += len(line)
+            if line.startswith(b"HTTP Request:"):
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(entry, dict):
+                yield entry
+
+
+def _is_summary(path: Path) -> bool:
+    with open(path, encoding="utf-8") as f:
+        return f.readline().strip() == "{"
+
+
+class ResultsStore:
+    """SQLite store of benchmark results, queried by run.
+
+    Runs are identified by the path of the log they were ingested from.
+    """
+
+    def __init__(self, db_path: str | Path = "results.sqlite"):
+        self.conn = sqlite3.connect(str(db_path))
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(SCHEMA)
+
+    def ingest(self, path: str | Path) -> int:
+        """Ingest a result log, or the part appended since it was last ingested.
+
+        Later entries for a question replace earlier ones, so a question retried
+        after an error counts once.
+
+        Args:
+            path: JSONL result log or LLaVA-Med JSON summary.
+
+        Returns:
+            int: Number of entries read.
+        """
+        path = Path(path).resolve()
+        stat = path.stat()
+        row = self.conn.execute(
+            "SELECT run_id, size, mtime_ns, offset FROM runs WHERE path = ?", (str(path),)
+        ).fetchone()
+        if row and (row[1], row[2]) == (stat.st_size, stat.st_mtime_ns):
+            return 0
+
+        summary = _is_summary(path)
+        if row and (summary or stat.st_size < row[3]):
+            # Rewritten rather than appended: start over
+            self.conn.execute("DELETE FROM runs WHERE run_id = ?", (row[0],))
+            row = None
+        if row is None:
+            run_id = self.conn.execute(
+                "INSERT INTO runs (path, size, mtime_ns, offset) VALUES (?, 0, 0, 0)",
+                (str(path),),
+            ).lastrowid
+            offset = 0
+        else:
+            run_id, offset = row[0], row[3]
+
+        progress = {"offset": stat.st_size if summary else offset}
+        entries = _summary_entries(path) if summary else _jsonl_entries(path, progress)
+
+        count = 0
+        model = None
+        for entry in entries:
+            if not all(k in entry for k in ("case_id", "question_id")):
+                continue
+            model = entry.get("model") or model
+            self._insert(run_id, entry)
+            count += 1
+
+        self.conn.execute(
+            "UPDATE runs SET model = COALESCE(?, model), size = ?, mtime_ns = ?, offset = ? "
+            "WHERE run_id = ?",
+            (model, stat.st_size, stat.st_mtime_ns, progress["offset"], run_id),
+        )
+        self.conn.commit()
+        return count
+
+    def _insert(self, run_id: int, entry: dict[str, Any]) -> None:
+        model_letter, correct_letter, is_correct = _letter_result(entry)
+        question_id = entry["question_id"]
+        self.conn.execute(
+            "INSERT OR REPLACE INTO results "
+            "(run_id, case_id, question_id, model, model_answer, correct_answer, is_correct) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                run_id,
+                entry["case_id"],
+                question_id,
+                entry.get("model"),
+                model_letter,
+                correct_letter,
+                is_correct,
+            ),
+        )
+        categories = (
+            entry.get("input", {}).get("question_data", {}).get("metadata", {}).get("categories")
+            or []
+        )
+        self.conn.execute(
+            "DELETE FROM result_categories WHERE run_id = ? AND question_id = ?",
+            (run_id, question_id),
+        )
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO result_categories (run_id, question_id, category) "
+            "VALUES (?, ?, ?)",
+            [(run_id, question_id, category) for category in categories],
+        )
+
+    def run_id(self, path: str | Path) -> int:
+        """Id of the run ingested from `path`, ingesting it if needed."""
+        self.ingest(path)
+        return self.conn.execute(
+            "SELECT run_id FROM runs WHERE path = ?", (str(Path(path).resolve()),)
+        ).fetchone()[0]
+
+    def model_name(self, run_id: int) -> str:
+        model, path = self.conn.execute(
+            "SELECT model, path FROM runs WHERE run_id = ?", (run_id,)
+        ).fetchone()
+        return model or path
+
+    def _scope(self, run_id: int, common_with: Sequence[int]) -> tuple[str, list]:
+        """SQL condition on results `r` restricting to gradable questions shared with other runs."""
+        condition = "r.run_id = ? AND r.is_correct IS NOT NULL"
+        params: list = [run_id]
+        for other in common_with:
+            condition += (
+                " AND EXISTS (SELECT 1 FROM results o WHERE o.run_id = ? "
+                "AND o.question_id = r.question_id AND o.is_correct IS NOT NULL)"
+            )
+            params.append(other)
+        return condition, params
+
+    def accuracy(self, run_id: int, common_with: Sequence[int] = ()) -> dict[str, float]:
+        """Overall accuracy of a run.
+
+        Args:
+            run_id: Run to evaluate.
+            common_with: Other runs; only questions answered in all of them are counted.
+
+        Returns:
+            dict: "accuracy" in percent, "correct" and "total".
+        """
+        condition, params = self._scope(run_id, common_with)
+        correct, total = self.conn.execute(
+            f"SELECT COALESCE(SUM(r.is_correct), 0), COUNT(*) FROM results r WHERE {condition}",
+            params,
+        ).fetchone()
+        return {"accuracy": correct / total * 100 if total else 0.0, "correct": correct, "total": total}
+
+    def category_accuracy(
+        self, run_id: int, common_with: Sequence[int] = ()
+    ) -> dict[str, dict[str, float]]:
+        """Accuracy per question category, in the format of analyze_axes.process_results."""
+        condition, params = self._scope(run_id, common_with)
+        rows = self.conn.execute(
+            f"SELECT c.category, SUM(r.is_correct), COUNT(*) FROM results r "
+            f"JOIN result_categories c ON c.run_id = r.run_id AND c.question_id = r.question_id "
+            f"WHERE {condition} GROUP BY c.category",
+            params,
+        ).fetchall()
+        return {
+            category: {"accuracy": correct / total * 100, "total": total, "correct": correct}
+            for category, correct, total in rows
+        }
+
+    def question_type_accuracy(self, run_id: int) -> dict[str, dict[str, float]]:
+        """Accuracy per question type, summing the categories each type covers."""
+        categories = self.category_accuracy(run_id)
+        stats = {}
+        for qtype, type_categories in QUESTION_TYPES.items():
+            total = sum(categories[c]["total"] for c in type_categories if c in categories)
+            correct = sum(categories[c]["correct"] for c in type_categories if c in categories)
+            stats[qtype] = {
+                "accuracy": correct / total * 100 if total else 0,
+                "total": total,
+                "correct": correct,
+            }
+        return stats
+
+    def question_ids(self, run_id: int, correct: bool) -> list[str]:
+        return [
+            row[0]
+            for row in self.conn.execute(
+                "SELECT question_id FROM results WHERE run_id = ? AND is_correct = ? "
+                "ORDER BY question_id",
+                (run_id, int(correct)),
+            )
+        ]
+
+    def diff(self, run_a: int, run_b: int) -> dict[str, list[tuple[str, str, str | None, str | None]]]:
+        """Questions graded in both runs whose outcome differs.
+
+        Returns:
+            dict: "fixed" (wrong in run_a, right in run_b) and "regressed" (the reverse),
+                as (case_id, question_id, answer in run_a, answer in run_b) tuples.
+        """
+        rows = self.conn.execute(
+            "SELECT a.case_id, a.question_id, a.model_answer, b.model_answer, b.is_correct "
+            "FROM results a JOIN results b ON b.run_id = ? AND b.question_id = a.question_id "
+            "WHERE a.run_id = ? AND a.is_correct IS NOT NULL AND b.is_correct IS NOT NULL "
+            "AND a.is_correct != b.is_correct ORDER BY a.question_id",
+            (run_b, run_a),
+        ).fetchall()
+        diff = {"fixed": [], "regressed": []}
+        for case_id, question_id, answer_a, answer_b, b_correct in rows:
+            diff["fixed" if b_correct else "regressed"].append(
+                (case_id, question_id, answer_a, answer_b)
+            )
+        return diff
+
+
+def print_accuracy(store: ResultsStore, run_id: int) -> None:
+    overall = store.accuracy(run_id)
+    print(
+        f"\nOverall Accuracy: {overall['accuracy']:.2f}% "
+        f"({overall['correct']} correct out of {overall['total']} questions)"
+    )
+    print("\nCategory Performance:")
+    for category, metrics in sorted(
+        store.category_accuracy(run_id).items(), key=lambda x: x[1]["accuracy"], reverse=True
+    ):
+        print(f"{category}: {metrics['accuracy']:.2f}% ({metrics['correct']}/{metrics['total']})")
+    print("\nQuestion Type Performance:")
+    for qtype, metrics in sorted(
+        store.question_type_accuracy(run_id).items(), key=lambda x: x[1]["accuracy"], reverse=True
+    ):
+        print(f"{qtype}: {metrics['accuracy']:.2f}% ({metrics['correct']}/{metrics['total']})")
+
+
+def print_comparison(store: ResultsStore, run_ids: list[int]) -> None:
+    names = [store.model_name(run_id) for run_id in run_ids]
+    print("\nAccuracy on Common Questions:")
+    for run_id, name in zip(run_ids, names):
+        others = [other for other in run_ids if other != run_id]
+        stats = store.accuracy(run_id, common_with=others)
+        print(f"{name}: Accuracy = {stats['accuracy']:.2f}% ({stats['correct']}/{stats['total']} correct)")
+
+    print("\nCategory Performance (Common Questions):")
+    category_stats = [
+        store.category_accuracy(run_id, common_with=[o for o in run_ids if o != run_id])
+        for run_id in run_ids
+    ]
+    for category in CATEGORY_ORDER:
+        print(f"\n{category.capitalize()}:")
+        for name, stats in zip(names, category_stats):
+            metrics = stats.get(category, {"accuracy": 0, "total": 0, "correct": 0})
+            print(f"  {name}: {metrics['accuracy']:.2f}% ({metrics['correct']}/{metrics['total']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest and query benchmark results")
+    parser.add_argument("--db", default="results.sqlite", help="SQLite results database")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("ingest").add_argument("files", nargs="+")
+    subparsers.add_parser("accuracy").add_argument("file")
+    diff_parser = subparsers.add_parser("diff")
+    diff_parser.add_argument("file_a")
+    diff_parser.add_argument("file_b")
+    subparsers.add_parser("compare").add_argument("files", nargs="+")
+    args = parser.parse_args()
+
+    store = ResultsStore(args.db)
+    if args.command == "ingest":
+        for file in args.files:
+            print(f"{file}: {store.ingest(file)} new entries")
+    elif args.command == "accuracy":
+        print_accuracy(store, store.run_id(args.file))
+    elif args.command == "diff":
+        diff = store.diff(store.run_id(args.file_a), store.run_id(args.file_b))
+        for kind in ("fixed", "regressed"):
+            print(f"\n{kind.capitalize()} ({len(diff[kind])}):")
+            for case_id, question_id, answer_a, answer_b in diff[kind]:
+                print(f"  {question_id} (case {case_id}): {answer_a} -> {answer_b}")
+    else:
+        print_comparison(store, [store.run_id(file) for file in args.files])
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@ import sys
 from collections import defaultdict
 from pathlib import Path
 
+from medrax.agent.log_writer import open_log
+
 
 def get_latest_log() -> str:
     """Find the most recently modified log file in the current directory.
@@ -43,7 +45,7 @@ def analyze_log_file(
     skipped = []
 
     try:
-        with open(filename) as f:
+        with open_log(filename) as f:
             for line_num, line in enumerate(f, 1):
                 # Skip HTTP request logs
                 if line.startswith("HTTP Request:") or line.strip() == "":
@@ -1,12 +1,39 @@
-import base64
+import asyncio
 import re
 import shutil
 import time
-from collections.abc import AsyncGenerator
+import uuid
+from collections.abc import AsyncGenerator, AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
 
 import gradio as gr
 from gradio import ChatMessage
+from langchain_core.messages import AIMessageChunk
+
+from medrax.agent.messages import image_reference_part
+
+
+@dataclass
+class SessionState:
+    """
+    Per-browser-session state of the chat interface.
+
+    Gradio gives every session its own copy, so concurrent users never share a
+    conversation thread or uploaded image.
+
+    Attributes:
+        session_id (str): Identifier used to queue this session's requests.
+        thread_id (Optional[str]): Agent conversation thread, created on first message.
+        original_file_path (Optional[str]): Uploaded file sent to the tools (.dcm or other).
+        display_file_path (Optional[str]): Viewable image shown in the UI.
+    """
+
+    session_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    thread_id: str | None = None
+    original_file_path: str | None = None
+    display_file_path: str | None = None
 
 
 class ChatInterface:
@@ -15,58 +42,90 @@ class ChatInterface:
 
     Handles file uploads, message processing, and chat history management.
     Supports both regular image files and DICOM medical imaging files.
+    Conversation state is kept per session, and each session processes at most
+    `session_concurrency` messages at a time while others wait in its queue.
     """
 
-    def __init__(self, agent, tools_dict):
+    def __init__(self, agent, tools_dict, session_concurrency: int = 1):
         """
         Initialize the chat interface.
 
         Args:
             agent: The medical AI agent to handle requests
             tools_dict (dict): Dictionary of available tools for image processing
+            session_concurrency (int): Messages processed at the same time per session
         """
         self.agent = agent
         self.tools_dict = tools_dict
         self.upload_dir = Path("temp")
         self.upload_dir.mkdir(exist_ok=True)
-        self.current_thread_id = None
-        # Separate storage for original and display paths
-        self.original_file_path = None  # For LLM (.dcm or other)
-        self.display_file_path = None  # For UI (always viewable format)
+        self.session_concurrency = session_concurrency
+        # Session id -> (semaphore, number of requests holding or waiting for it)
+        self._session_slots: dict[str, tuple[asyncio.Semaphore, int]] = {}
 
-    def handle_upload(self, file_path: str) -> str:
+    @asynccontextmanager
+    async def session_slot(self, session: SessionState) -> AsyncIterator[None]:
+        """
+        Wait for a free processing slot of the session.
+
+        Args:
+            session (SessionState): Session the request belongs to
+        """
+        semaphore, users = self._session_slots.get(
+            session.session_id, (asyncio.Semaphore(self.session_concurrency), 0)
+        )
+        self._session_slots[session.session_id] = (semaphore, users + 1)
+        try:
+            async with semaphore:
+                yield
+        finally:
+            semaphore, users = self._session_slots[session.session_id]
+            if users == 1:
+                del self._session_slots[session.session_id]
+            else:
+                self._session_slots[session.session_id] = (semaphore, users - 1)
+
+    async def handle_upload(
+        self, file_path: str, session: SessionState
+    ) -> tuple[str | None, SessionState]:
         """
         Handle new file upload and set appropriate paths.
 
         Args:
             file_path (str): Path to the uploaded file
+            session (SessionState): State of the uploading session
 
         Returns:
-            str: Display path for UI, or None if no file uploaded
+            Tuple[Optional[str], SessionState]: Display path for UI, or None if no file uploaded, and the session
         """
         if not file_path:
-            return None
+            return None, session
 
         source = Path(file_path)
-        timestamp = int(time.time())
 
-        # Save original file with proper suffix
+        # Save original file with proper suffix, unique across sessions
         suffix = source.suffix.lower()
-        saved_path = self.upload_dir / f"upload_{timestamp}{suffix}"
-        shutil.copy2(file_path, saved_path)  # Use file_path directly instead of source
-        self.original_file_path = str(saved_path)
+        saved_path = self.upload_dir / f"upload_{int(time.time())}_{uuid.uuid4().hex[:8]}{suffix}"
+        await asyncio.to_thread(shutil.copy2, file_path, saved_path)
+        session.original_file_path = str(saved_path)
 
         # Handle DICOM conversion for display only
         if suffix == ".dcm":
-            output, _ = self.tools_dict["DicomProcessorTool"]._run(str(saved_path))
-            self.display_file_path = output["image_path"]
+            output, _ = await asyncio.to_thread(
+                self.tools_dict["DicomProcessorTool"]._run, str(saved_path)
+            )
+            session.display_file_path = output["image_path"]
         else:
-            self.display_file_path = str(saved_path)
+            session.display_file_path = str(saved_path)
 
-        return self.display_file_path
+        return session.display_file_path, session
 
     def add_message(
-        self, message: str, display_image: str, history: list[dict]
+        self,
+        message: str,
+        display_image: str,
+        history: list[dict],
+        session: SessionState,
     ) -> tuple[list[dict], gr.Textbox]:
         """
         Add a new message to the chat history.
@@ -75,11 +134,12 @@ class ChatInterface:
             message (str): Text message to add
             display_image (str): Path to image being displayed
             history (List[dict]): Current chat history
+            session (SessionState): State of the sending session
 
         Returns:
             Tuple[List[dict], gr.Textbox]: Updated history and textbox component
         """
-        image_path = self.original_file_path or display_image
+        image_path = session.original_file_path or display_image
         if image_path is not None:
             history.append({"role": "user", "content": {"path": image_path}})
         if message is not None:
@@ -91,14 +151,19 @@ class ChatInterface:
         message: str,
         display_image: str | None,
         chat_history: list[ChatMessage],
+        session: SessionState,
     ) -> AsyncGenerator[tuple[list[ChatMessage], str | None, str], None]:
         """
         Process a message and generate responses.
 
+        The agent graph runs with `astream`, so tools and model calls do not block
+        the event loop, and model output is streamed token by token.
+
         Args:
             message (str): User message to process
             display_image (Optional[str]): Path to currently displayed image
             chat_history (List[ChatMessage]): Current chat history
+            session (SessionState): State of the sending session
 
         Yields:
             Tuple[List[ChatMessage], Optional[str], str]: Updated chat history, display path, and empty string
@@ -106,33 +171,18 @@ class ChatInterface:
         chat_history = chat_history or []
 
         # Initialize thread if needed
-        if not self.current_thread_id:
-            self.current_thread_id = str(time.time())
+        if not session.thread_id:
+            session.thread_id = str(uuid.uuid4())
 
         messages = []
-        image_path = self.original_file_path or display_image
+        image_path = session.original_file_path or display_image
 
         if image_path is not None:
             # Send path for tools
             messages.append({"role": "user", "content": f"image_path: {image_path}"})
 
-            # Load and encode image for multimodal
-            with open(image_path, "rb") as img_file:
-                img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
-
-            messages.append(
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{img_base64}"
-                            },
-                        }
-                    ],
-                }
-            )
+            # Stored by reference; the agent inlines the image only for the model request
+            messages.append({"role": "user", "content": [image_reference_part(image_path)]})
 
         if message is not None:
             messages.append(
@@ -140,52 +190,9 @@ class ChatInterface:
             )
 
         try:
-            for event in self.agent.workflow.stream(
-                {"messages": messages},
-                {"configurable": {"thread_id": self.current_thread_id}},
-            ):
-                if isinstance(event, dict):
-                    if "process" in event:
-                        content = event["process"]["messages"][-1].content
-                        if content:
-                            content = re.sub(r"temp/[^\s]*", "", content)
-                            chat_history.append(
-                                ChatMessage(role="assistant", content=content)
-                            )
-                            yield chat_history, self.display_file_path, ""
-
-                    elif "execute" in event:
-                        for message in event["execute"]["messages"]:
-                            tool_name = message.name
-                            tool_result = eval(message.content)[0]
-
-                            if tool_result:
-                                metadata = {"title": f"🖼️ Image from tool: {tool_name}"}
-                                formatted_result = " ".join(
-                                    line.strip()
-                                    for line in str(tool_result).splitlines()
-                                ).strip()
-                                metadata["description"] = formatted_result
-                                chat_history.append(
-                                    ChatMessage(
-                                        role="assistant",
-                                        content=formatted_result,
-                                        metadata=metadata,
-                                    )
-                                )
-
-                            # For image_visualizer, use display path
-                            if tool_name == "image_visualizer":
-                                self.display_file_path = tool_result["image_path"]
-                                chat_history.append(
-                                    ChatMessage(
-                                        role="assistant",
-                                        # content=gr.Image(value=self.display_file_path),
-                                        content={"path": self.display_file_path},
-                                    )
-                                )
-
-                            yield chat_history, self.display_file_path, ""
+            async with self.session_slot(session):
+                async for chunk in self._stream_agent(messages, chat_history, session):
+                    yield chunk
 
         except Exception as e:
             chat_history.append(
@@ -195,23 +202,116 @@ class ChatInterface:
                     metadata={"title": "Error"},
                 )
             )
-            yield chat_history, self.display_file_path
+            yield chat_history, session.display_file_path, ""
+
+    async def _stream_agent(
+        self,
+        messages: list[dict],
+        chat_history: list[ChatMessage],
+        session: SessionState,
+    ) -> AsyncGenerator[tuple[list[ChatMessage], str | None, str], None]:
+        """
+        Run the agent on new messages and yield the chat history as it grows.
+
+        Args:
+            messages (List[dict]): New user messages
+            chat_history (List[ChatMessage]): Chat history to append to
+            session (SessionState): State of the session
+
+        Yields:
+            Tuple[List[ChatMessage], Optional[str], str]: Updated chat history, display path, and empty string
+        """
+        # Assistant message receiving tokens of the model response in progress
+        streaming: ChatMessage | None = None
+
+        async for mode, event in self.agent.workflow.astream(
+            {"messages": messages},
+            {"configurable": {"thread_id": session.thread_id}},
+            stream_mode=["messages", "updates"],
+        ):
+            if mode == "messages":
+                token, metadata = event
+                if (
+                    metadata.get("langgraph_node") == "process"
+                    and isinstance(token, AIMessageChunk)
+                    and isinstance(token.content, str)
+                    and token.content
+                ):
+                    if streaming is None:
+                        streaming = ChatMessage(role="assistant", content="")
+                        chat_history.append(streaming)
+                    streaming.content += token.content
+                    yield chat_history, session.display_file_path, ""
+
+            elif "process" in event:
+                content = event["process"]["messages"][-1].content
+                if content:
+                    # Replace the streamed text with the final, cleaned response
+                    content = re.sub(r"temp/[^\s]*", "", content)
+                    if streaming is None:
+                        chat_history.append(ChatMessage(role="assistant", content=content))
+                    else:
+                        streaming.content = content
+                    yield chat_history, session.display_file_path, ""
+                streaming = None
+
+            elif "execute" in event:
+                for message in event["execute"]["messages"]:
+                    tool_name = message.name
+                    try:
+                        tool_result = eval(message.content)[0]
+                    except Exception:
+                        # Invalid tool, timeouts and failures are reported as plain text
+                        tool_result = message.content
+
+                    if tool_result:
+                        metadata = {"title": f"🖼️ Image from tool: {tool_name}"}
+                        formatted_result = " ".join(
+                            line.strip()
+                            for line in str(tool_result).splitlines()
+                        ).strip()
+                        metadata["description"] = formatted_result
+                        chat_history.append(
+                            ChatMessage(
+                                role="assistant",
+                                content=formatted_result,
+                                metadata=metadata,
+                            )
+                        )
+
+                    # For image_visualizer, use display path
+                    if tool_name == "image_visualizer" and isinstance(tool_result, dict):
+                        session.display_file_path = tool_result["image_path"]
+                        chat_history.append(
+                            ChatMessage(
+                                role="assistant",
+                                # content=gr.Image(value=session.display_file_path),
+                                content={"path": session.display_file_path},
+                            )
+                        )
+
+                    yield chat_history, session.display_file_path, ""
 
 
-def create_demo(agent, tools_dict):
+def create_demo(agent, tools_dict, max_concurrent_requests: int = 16, session_concurrency: int = 1):
     """
     Create a Gradio demo interface for the medical AI agent.
 
     Args:
         agent: The medical AI agent to handle requests
         tools_dict (dict): Dictionary of available tools for image processing
+        max_concurrent_requests (int): Requests processed at the same time across all sessions
+        session_concurrency (int): Messages processed at the same time per session
 
     Returns:
         gr.Blocks: Gradio Blocks interface
     """
-    interface = ChatInterface(agent, tools_dict)
+    interface = ChatInterface(agent, tools_dict, session_concurrency=session_concurrency)
 
     with gr.Blocks(theme=gr.themes.Soft()) as demo:
+        # Called on every page load, so each browser session gets fresh state
+        session = gr.State(SessionState)
+
         with gr.Column():
             gr.Markdown(
                 """
@@ -261,39 +361,46 @@ def create_demo(agent, tools_dict):
                         new_thread_btn = gr.Button("New Thread")
 
         # Event handlers
-        def clear_chat():
-            interface.original_file_path = None
-            interface.display_file_path = None
-            return [], None
+        def clear_chat(session: SessionState):
+            session.original_file_path = None
+            session.display_file_path = None
+            return [], None, session
 
-        def new_thread():
-            interface.current_thread_id = str(time.time())
-            return [], interface.display_file_path
+        def new_thread(session: SessionState):
+            session.thread_id = str(uuid.uuid4())
+            return [], session.display_file_path, session
 
-        def handle_file_upload(file):
-            return interface.handle_upload(file.name)
+        async def handle_file_upload(file, session: SessionState):
+            return await interface.handle_upload(file.name, session)
 
         chat_msg = txt.submit(
             interface.add_message,
-            inputs=[txt, image_display, chatbot],
+            inputs=[txt, image_display, chatbot, session],
             outputs=[chatbot, txt],
         )
         bot_msg = chat_msg.then(
             interface.process_message,
-            inputs=[txt, image_display, chatbot],
+            inputs=[txt, image_display, chatbot, session],
             outputs=[chatbot, image_display, txt],
         )
         bot_msg.then(lambda: gr.Textbox(interactive=True), None, [txt])
 
         upload_button.upload(
-            handle_file_upload, inputs=upload_button, outputs=image_display
+            handle_file_upload,
+            inputs=[upload_button, session],
+            outputs=[image_display, session],
         )
 
         dicom_upload.upload(
-            handle_file_upload, inputs=dicom_upload, outputs=image_display
+            handle_file_upload,
+            inputs=[dicom_upload, session],
+            outputs=[image_display, session],
         )
 
-        clear_btn.click(clear_chat, outputs=[chatbot, image_display])
-        new_thread_btn.click(new_thread, outputs=[chatbot, image_display])
+        clear_btn.click(clear_chat, inputs=session, outputs=[chatbot, image_display, session])
+        new_thread_btn.click(new_thread, inputs=session, outputs=[chatbot, image_display, session])
+
+    # Requests of different sessions run concurrently; each session queues its own
+    demo.queue(default_concurrency_limit=max_concurrent_requests)
 
     return demo
@@ -3,12 +3,14 @@ import warnings
 
 from dotenv import load_dotenv
 from langchain_openai import AzureChatOpenAI
-from langgraph.checkpoint.memory import MemorySaver
 from transformers import logging
 
 from interface import create_demo
 from medrax.agent import *
+from medrax.agent.cache import ResultCache
+from medrax.agent.checkpointer import SQLiteCheckpointSaver
 from medrax.tools import *
+from medrax.tools.registry import LazyTool, ModelRegistry
 from medrax.utils import *
 
 warnings.filterwarnings("ignore")
@@ -26,6 +28,11 @@ def initialize_agent(
     temperature=0.7,
     top_p=0.95,
     openai_kwargs={},
+    lazy=True,
+    memory_budget_gb=None,
+    warm_tools=None,
+    cpu_backends=None,
+    cache_path=None,
 ):
     """Initialize the MedRAX agent with specified tools and configuration.
 
@@ -39,41 +46,94 @@ def initialize_agent(
         temperature (float, optional): Temperature for the model. Defaults to 0.7.
         top_p (float, optional): Top P for the model. Defaults to 0.95.
         openai_kwargs (dict, optional): Additional keyword arguments for OpenAI API, such as API key and base URL.
+        lazy (bool, optional): Load tool weights on first invocation instead of at startup. Defaults to True.
+        memory_budget_gb (float, optional): Memory budget for loaded tool models when lazy. Least recently
+            used idle tools are unloaded to stay under it. Defaults to None (unlimited).
+        warm_tools (List[str], optional): Tools to preload when lazy, e.g. the hot set. Defaults to None.
+        cpu_backends (Dict[str, str], optional): CPU inference backend per tool name, "torch", "int8" or
+            "onnx". Supported by the classifier, segmentation and report generation tools. Defaults to "torch".
+        cache_path (str, optional): SQLite file caching tool results, and model responses when the temperature
+            is 0. Defaults to None (no caching).
 
     Returns:
-        Tuple[Agent, Dict[str, BaseTool]]: Initialized agent and dictionary of tool instances
+        Tuple[Agent, Dict[str, BaseTool]]: Initialized agent and dictionary of tool instances (or lazy proxies)
     """
     prompts = load_prompts_from_file(prompt_file)
     prompt = prompts["MEDICAL_ASSISTANT"]
+    cpu_backends = cpu_backends or {}
 
     all_tools = {
-        "ChestXRayClassifierTool": lambda: ChestXRayClassifierTool(device=device),
-        "ChestXRaySegmentationTool": lambda: ChestXRaySegmentationTool(device=device),
-        "LlavaMedTool": lambda: LlavaMedTool(
-            cache_dir=model_dir, device=device, load_in_8bit=True
+        "ChestXRayClassifierTool": (
+            ChestXRayClassifierTool,
+            lambda: ChestXRayClassifierTool(
+                device=device,
+                backend=cpu_backends.get("ChestXRayClassifierTool", "torch"),
+                cache_dir=model_dir,
+            ),
         ),
-        "XRayVQATool": lambda: XRayVQATool(cache_dir=model_dir, device=device),
-        "ChestXRayReportGeneratorTool": lambda: ChestXRayReportGeneratorTool(
-            cache_dir=model_dir, device=device
+        "ChestXRaySegmentationTool": (
+            ChestXRaySegmentationTool,
+            lambda: ChestXRaySegmentationTool(
+                device=device,
+                backend=cpu_backends.get("ChestXRaySegmentationTool", "torch"),
+                cache_dir=model_dir,
+            ),
         ),
-        "XRayPhraseGroundingTool": lambda: XRayPhraseGroundingTool(
-            cache_dir=model_dir, temp_dir=temp_dir, load_in_8bit=True, device=device
+        "LlavaMedTool": (
+            LlavaMedTool,
+            lambda: LlavaMedTool(cache_dir=model_dir, device=device, load_in_8bit=True),
         ),
-        "ChestXRayGeneratorTool": lambda: ChestXRayGeneratorTool(
-            model_path=f"{model_dir}/roentgen", temp_dir=temp_dir, device=device
+        "XRayVQATool": (
+            XRayVQATool,
+            lambda: XRayVQATool(cache_dir=model_dir, device=device),
+        ),
+        "ChestXRayReportGeneratorTool": (
+            ChestXRayReportGeneratorTool,
+            lambda: ChestXRayReportGeneratorTool(
+                cache_dir=model_dir,
+                device=device,
+                backend=cpu_backends.get("ChestXRayReportGeneratorTool", "torch"),
+            ),
+        ),
+        "XRayPhraseGroundingTool": (
+            XRayPhraseGroundingTool,
+            lambda: XRayPhraseGroundingTool(
+                cache_dir=model_dir, temp_dir=temp_dir, load_in_8bit=True, device=device
+            ),
+        ),
+        "ChestXRayGeneratorTool": (
+            ChestXRayGeneratorTool,
+            lambda: ChestXRayGeneratorTool(
+                model_path=f"{model_dir}/roentgen", temp_dir=temp_dir, device=device
+            ),
+        ),
+        "ImageVisualizerTool": (ImageVisualizerTool, lambda: ImageVisualizerTool()),
+        "DicomProcessorTool": (
+            DicomProcessorTool,
+            lambda: DicomProcessorTool(temp_dir=temp_dir),
         ),
-        "ImageVisualizerTool": lambda: ImageVisualizerTool(),
-        "DicomProcessorTool": lambda: DicomProcessorTool(temp_dir=temp_dir),
     }
 
     # Initialize only selected tools or all if none specified
     tools_dict = {}
-    tools_to_use = tools_to_use or all_tools.keys()
-    for tool_name in tools_to_use:
-        if tool_name in all_tools:
-            tools_dict[tool_name] = all_tools[tool_name]()
-
-    checkpointer = MemorySaver()
+    tools_to_use = [name for name in tools_to_use or all_tools.keys() if name in all_tools]
+    if lazy:
+        budget = int(memory_budget_gb * 2**30) if memory_budget_gb is not None else None
+        registry = ModelRegistry(memory_budget_bytes=budget)
+        for tool_name in tools_to_use:
+            tool_class, factory = all_tools[tool_name]
+            registry.register(tool_name, factory)
+            tools_dict[tool_name] = LazyTool(registry, tool_name, tool_class)
+        registry.warm_up(name for name in warm_tools or [] if name in tools_dict)
+    else:
+        for tool_name in tools_to_use:
+            tools_dict[tool_name] = all_tools[tool_name][1]()
+
+    # Conversation state lives on disk, bounded per thread and expired after inactivity
+    checkpointer = SQLiteCheckpointSaver(
+        os.getenv("MEDRAX_CHECKPOINT_DB", "checkpoints/medrax.sqlite"),
+        ttl_seconds=float(os.getenv("MEDRAX_THREAD_TTL_HOURS", "24")) * 3600,
+    )
     model = AzureChatOpenAI(
         azure_endpoint=os.getenv("AZURE_ENDPOINT"),
         azure_deployment=os.getenv("AZURE_DEPLOYMENT"),
@@ -84,6 +144,14 @@ def initialize_agent(
         top_p=top_p,
         **openai_kwargs,
     )
+    cache = None
+    if cache_path:
+        cache = ResultCache(
+            cache_path,
+            ttl_seconds=float(os.getenv("MEDRAX_CACHE_TTL_HOURS", "168")) * 3600,
+            max_entries=int(os.getenv("MEDRAX_CACHE_MAX_ENTRIES", "10000")),
+            max_bytes=int(float(os.getenv("MEDRAX_CACHE_MAX_MB", "512")) * 2**20),
+        )
     agent = Agent(
         model,
         tools=list(tools_dict.values()),
@@ -91,6 +159,7 @@ def initialize_agent(
         log_dir="logs",
         system_prompt=prompt,
         checkpointer=checkpointer,
+        cache=cache,
     )
 
     print("Agent initialized")
@@ -136,7 +205,17 @@ if __name__ == "__main__":
         temperature=0.7,
         top_p=0.95,
         openai_kwargs=openai_kwargs,
+        lazy=True,  # Load tool weights on first use
+        memory_budget_gb=float(os.getenv("MEDRAX_MEMORY_BUDGET_GB", "0")) or None,
+        warm_tools=["ChestXRayClassifierTool", "ChestXRaySegmentationTool"],
+        # Accelerated inference when running on CPU, e.g. {"ChestXRayClassifierTool": "onnx"}
+        cpu_backends={},
+        # Reuse results of repeated questions on the same image, e.g. "cache/medrax_cache.sqlite"
+        cache_path=os.getenv("MEDRAX_CACHE_DB"),
     )
     demo = create_demo(agent, tools_dict)
 
     demo.launch(server_name="0.0.0.0", server_port=8585, share=True)
+
+    if agent.cache is not None:
+        print(f"Cache hit rates: {agent.cache.stats()}")
@@ -1,5 +1,9 @@
-import json
+import contextvars
 import operator
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime
 from pathlib import Path
 from typing import Annotated, Any, TypedDict
@@ -10,8 +14,31 @@ from langchain_core.messages import AnyMessage, SystemMessage, ToolMessage
 from langchain_core.tools import BaseTool
 from langgraph.graph import END, StateGraph
 
+from .cache import (
+    ResultCache,
+    normalize_message,
+    stable_hash,
+    tool_args_key,
+    tool_artifacts_exist,
+    tool_result_cacheable,
+)
+from .log_writer import ToolCallLogWriter
+from .messages import MessageCompactor, trim_history
+
 _ = load_dotenv()
 
+# Tools whose outputs depend only on their arguments (greedy decoding, no side effects)
+DETERMINISTIC_TOOLS = frozenset(
+    {
+        "chest_xray_classifier",
+        "chest_xray_segmentation",
+        "chest_xray_report_generator",
+        "chest_xray_expert",
+        "llava_med_qa",
+        "xray_phrase_grounding",
+    }
+)
+
 
 class ToolCallLog(TypedDict):
     """
@@ -19,6 +46,7 @@ class ToolCallLog(TypedDict):
 
     Attributes:
         timestamp (str): The timestamp of when the tool call was made.
+        round_id (str): Identifier shared by the tool calls of one model response.
         tool_call_id (str): The unique identifier for the tool call.
         name (str): The name of the tool that was called.
         args (Any): The arguments passed to the tool.
@@ -26,6 +54,7 @@ class ToolCallLog(TypedDict):
     """
 
     timestamp: str
+    round_id: str
     tool_call_id: str
     name: str
     args: Any
@@ -58,6 +87,12 @@ class Agent:
         workflow (StateGraph): The compiled workflow for the agent's processing.
         log_tools (bool): Whether to log tool calls.
         log_path (Path): Path to save tool call logs.
+        log_writer (Optional[ToolCallLogWriter]): Background writer of the tool call logs.
+        tool_timeout (Optional[float]): Default time limit in seconds for a tool call.
+        tool_timeouts (Dict[str, float]): Time limits overriding the default per tool name.
+        tool_executor (ThreadPoolExecutor): Runs the tool calls of a model response concurrently.
+        cache (Optional[ResultCache]): Cache of model responses and tool results.
+        cacheable_tools (FrozenSet[str]): Names of the tools whose results are cached.
     """
 
     def __init__(
@@ -68,6 +103,16 @@ class Agent:
         system_prompt: str = "",
         log_tools: bool = True,
         log_dir: str | None = "logs",
+        max_parallel_tools: int = 4,
+        tool_timeout: float | None = 300,
+        tool_timeouts: dict[str, float] | None = None,
+        log_max_bytes: int = 64 * 1024 * 1024,
+        log_compress: bool = False,
+        log_sample_rate: float = 1.0,
+        max_history_messages: int | None = 40,
+        message_compactor: MessageCompactor | None = None,
+        cache: ResultCache | None = None,
+        cacheable_tools: frozenset[str] = DETERMINISTIC_TOOLS,
     ):
         """
         Initialize the Agent.
@@ -79,13 +124,43 @@ class Agent:
             system_prompt (str, optional): System instructions. Defaults to "".
             log_tools (bool, optional): Whether to log tool calls. Defaults to True.
             log_dir (str, optional): Directory to save logs. Defaults to 'logs'.
+            max_parallel_tools (int, optional): Maximum tool calls run at the same time. Defaults to 4.
+            tool_timeout (float, optional): Time limit in seconds for a tool call, None for no limit.
+                Defaults to 300.
+            tool_timeouts (Dict[str, float], optional): Time limits per tool name overriding tool_timeout.
+            log_max_bytes (int, optional): Size after which a new log file is started. Defaults to 64 MB.
+            log_compress (bool, optional): Gzip-compress the logs. Defaults to False.
+            log_sample_rate (float, optional): Fraction of tool rounds logged. Defaults to 1.0.
+            max_history_messages (int, optional): Most recent messages sent to the model, trimmed at
+                user turn boundaries. None sends the whole history. Defaults to 40.
+            message_compactor (MessageCompactor, optional): Prepares images in the history for model
+                requests. Defaults to a MessageCompactor with default settings.
+            cache (ResultCache, optional): Cache of model responses, used only when the model samples
+                with temperature 0, and of tool results. Defaults to None (no caching).
+            cacheable_tools (FrozenSet[str], optional): Names of the tools whose results are cached.
+                Defaults to the tools with deterministic outputs.
         """
         self.system_prompt = system_prompt
+        self.max_history_messages = max_history_messages
+        self.message_compactor = message_compactor or MessageCompactor()
         self.log_tools = log_tools
+        self.cache = cache
+        self.cacheable_tools = cacheable_tools
+        self.tool_timeout = tool_timeout
+        self.tool_timeouts = tool_timeouts or {}
+        self.tool_executor = ThreadPoolExecutor(
+            max_workers=max_parallel_tools, thread_name_prefix="agent_tool"
+        )
 
+        self.log_writer = None
         if self.log_tools:
             self.log_path = Path(log_dir or "logs")
-            self.log_path.mkdir(exist_ok=True)
+            self.log_writer = ToolCallLogWriter(
+                self.log_path,
+                max_bytes=log_max_bytes,
+                compress=log_compress,
+                sample_rate=log_sample_rate,
+            )
 
         # Define the agent workflow
         workflow = StateGraph(AgentState)
@@ -100,6 +175,7 @@ class Agent:
         self.workflow = workflow.compile(checkpointer=checkpointer)
         self.tools = {t.name: t for t in tools}
         self.model = model.bind_tools(tools)
+        self.model_cache_prefix = self._model_cache_prefix(model, tools)
 
     def process_request(self, state: AgentState) -> dict[str, list[AnyMessage]]:
         """
@@ -111,12 +187,42 @@ class Agent:
         Returns:
             Dict[str, List[AnyMessage]]: A dictionary containing the model's response.
         """
-        messages = state["messages"]
+        messages = trim_history(state["messages"], self.max_history_messages)
+        # Images are stored by reference in the state and only inlined, downsized and
+        # deduplicated for the request
+        messages = self.message_compactor.compact(messages)
         if self.system_prompt:
             messages = [SystemMessage(content=self.system_prompt)] + messages
-        response = self.model.invoke(messages)
+        if self.cache is None or self.model_cache_prefix is None:
+            response = self.model.invoke(messages)
+        else:
+            key = stable_hash([self.model_cache_prefix, [normalize_message(m) for m in messages]])
+            response = self.cache.get_or_compute("llm", key, lambda: self.model.invoke(messages))
         return {"messages": [response]}
 
+    def _model_cache_prefix(self, model: BaseLanguageModel, tools: list[BaseTool]) -> str | None:
+        """
+        Identify the model, its sampling parameters and the bound tools for response cache keys.
+
+        Args:
+            model (BaseLanguageModel): The language model.
+            tools (List[BaseTool]): The tools bound to the model.
+
+        Returns:
+            Optional[str]: Hash of the configuration, or None if responses are not deterministic
+                (temperature other than 0) and must not be cached.
+        """
+        if getattr(model, "temperature", None) != 0:
+            return None
+        params = getattr(model, "_identifying_params", {})
+        return stable_hash(
+            {
+                "model": type(model).__name__,
+                "params": params,
+                "tools": [(t.name, t.description, t.tool_call_schema.model_json_schema()) for t in tools],
+            }
+        )
+
     def has_tool_calls(self, state: AgentState) -> bool:
         """
         Check if the response contains any tool calls.
@@ -134,6 +240,9 @@ class Agent:
         """
         Execute tool calls from the model's response.
 
+        Independent tool calls run concurrently, each with its own time limit.
+        Results are returned in the order of the tool calls.
+
         Args:
             state (AgentState): The current state of the agent.
 
@@ -141,15 +250,29 @@ class Agent:
             Dict[str, List[ToolMessage]]: A dictionary containing tool execution results.
         """
         tool_calls = state["messages"][-1].tool_calls
-        results = []
 
+        futures: list[Future | None] = []
         for call in tool_calls:
             print(f"Executing tool: {call}")
             if call["name"] not in self.tools:
                 print("\n....invalid tool....")
+                futures.append(None)
+            else:
+                # Copy the context so callbacks and run config reach the worker thread
+                context = contextvars.copy_context()
+                futures.append(
+                    self.tool_executor.submit(
+                        context.run, self._invoke_tool, call["name"], call["args"]
+                    )
+                )
+        started = time.monotonic()
+
+        results = []
+        for call, future in zip(tool_calls, futures):
+            if future is None:
                 result = "invalid tool, please retry"
             else:
-                result = self.tools[call["name"]].invoke(call["args"])
+                result = self._wait_for_tool(call["name"], future, started)
 
             results.append(
                 ToolMessage(
@@ -165,9 +288,61 @@ class Agent:
 
         return {"messages": results}
 
+    def _invoke_tool(self, name: str, args: dict) -> Any:
+        """
+        Run a tool, serving results of deterministic tools from the cache.
+
+        Cached results are keyed by the image content rather than its path, and are
+        only reused while the files they reference, such as visualizations, exist.
+
+        Args:
+            name (str): Name of the tool.
+            args (dict): Arguments of the tool call.
+
+        Returns:
+            Any: The tool result.
+        """
+        tool = self.tools[name]
+        if self.cache is None or name not in self.cacheable_tools:
+            return tool.invoke(args)
+
+        key = tool_args_key(name, args)
+        found, result = self.cache.get("tool", key)
+        if found and tool_artifacts_exist(result):
+            return result
+        result = tool.invoke(args)
+        if tool_result_cacheable(result):
+            self.cache.set("tool", key, result)
+        return result
+
+    def _wait_for_tool(self, name: str, future: Future, started: float) -> Any:
+        """
+        Wait for a tool call started at `started` until its time limit.
+
+        Args:
+            name (str): Name of the tool.
+            future (Future): Pending tool call.
+            started (float): time.monotonic() when the tool calls were submitted.
+
+        Returns:
+            Any: The tool result, or an error message if it failed or timed out.
+        """
+        timeout = self.tool_timeouts.get(name, self.tool_timeout)
+        remaining = None if timeout is None else max(0.0, started + timeout - time.monotonic())
+        try:
+            return future.result(timeout=remaining)
+        except FutureTimeoutError:
+            # A running tool cannot be interrupted; its result is discarded when it finishes
+            future.cancel()
+            print(f"\n....tool {name} timed out after {timeout}s....")
+            return f"{name} timed out after {timeout} seconds, please retry or use another tool"
+        except Exception as e:
+            print(f"\n....tool {name} failed: {e}....")
+            return f"{name} failed: {e}"
+
     def _save_tool_calls(self, tool_calls: list[ToolMessage]) -> None:
         """
-        Save tool calls to a JSON file with timestamp-based naming.
+        Queue tool calls to be appended to the JSONL tool call log.
 
         Args:
             tool_calls (List[ToolMessage]): List of tool calls to save.
@@ -175,19 +350,17 @@ class Agent:
         if not self.log_tools:
             return
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = self.log_path / f"tool_calls_{timestamp}.json"
-
-        logs: list[ToolCallLog] = []
-        for call in tool_calls:
-            log_entry = {
+        timestamp = datetime.now().isoformat()
+        round_id = uuid.uuid4().hex
+        logs: list[ToolCallLog] = [
+            {
+                "timestamp": timestamp,
+                "round_id": round_id,
                 "tool_call_id": call.tool_call_id,
                 "name": call.name,
                 "args": call.args,
                 "content": call.content,
-                "timestamp": datetime.now().isoformat(),
             }
-            logs.append(log_entry)
-
-        with open(filename, "w") as f:
-            json.dump(logs, f, indent=4)
+            for call in tool_calls
+        ]
+        self.log_writer.write(logs)
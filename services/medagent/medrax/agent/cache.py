@@ -0,0 +1,258 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from langchain_core.messages import BaseMessage
+
+from medrax.tools.image_cache import image_cache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at);
+"""
+
+
+def stable_hash(value: Any) -> str:
+    """SHA-256 of a JSON-serializable value, independent of dict key order."""
+    payload = json.dumps(value, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def normalize_message(message: BaseMessage | dict) -> dict:
+    """Content of a message relevant to the model's answer, without ids or metadata."""
+    if isinstance(message, dict):
+        return {"role": message.get("role"), "content": message.get("content")}
+    return {
+        "type": message.type,
+        "content": message.content,
+        # Tool call ids are generated per response and do not affect the answer
+        "tool_calls": [
+            {"name": call["name"], "args": call["args"]}
+            for call in getattr(message, "tool_calls", None) or []
+        ],
+    }
+
+
+class ResultCache:
+    """Persistent cache of LLM responses and tool results in SQLite.
+
+    Entries expire after `ttl_seconds`. When the cache exceeds `max_entries` or
+    `max_bytes`, the least recently used entries are evicted. Values are pickled,
+    so the cache file must only be writable by the service itself.
+    Hits and misses are counted per namespace.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = "cache/medrax_cache.sqlite",
+        ttl_seconds: float | None = 7 * 24 * 3600,
+        max_entries: int = 10000,
+        max_bytes: int = 512 * 1024 * 1024,
+    ):
+        """
+        Args:
+            path (str | Path): SQLite database file.
+            ttl_seconds (Optional[float]): Lifetime of an entry, None for no expiry.
+            max_entries (int): Maximum number of entries.
+            max_bytes (int): Maximum total size of the pickled values.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        self.lock = threading.Lock()
+
+        self.hits: dict[str, int] = defaultdict(int)
+        self.misses: dict[str, int] = defaultdict(int)
+
+    def get(self, namespace: str, key: str) -> tuple[bool, Any]:
+        """Look up an entry.
+
+        Returns:
+            Tuple[bool, Any]: Whether the entry was found, and its value.
+        """
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value, created_at FROM cache WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+            if row is not None and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                self.conn.execute(
+                    "DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key)
+                )
+                self.conn.commit()
+                row = None
+            if row is None:
+                self.misses[namespace] += 1
+                return False, None
+            self.conn.execute(
+                "UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, namespace, key),
+            )
+            self.conn.commit()
+            self.hits[namespace] += 1
+        return True, pickle.loads(row[0])  # noqa: S301
+
+    def set(self, namespace: str, key: str, value: Any) -> None:
+        """Store an entry, evicting least recently used entries beyond the limits."""
+        data = pickle.dumps(value)
+        if len(data) > self.max_bytes:
+            return
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, key, data, len(data), now, now),
+            )
+            self._evict()
+            self.conn.commit()
+
+    def get_or_compute(
+        self,
+        namespace: str,
+        key: str,
+        compute: Callable[[], Any],
+        should_cache: Callable[[Any], bool] = lambda _: True,
+    ) -> Any:
+        """Return the cached value, or compute and store it.
+
+        Args:
+            namespace (str): Cache namespace, e.g. "llm" or "tool".
+            key (str): Entry key within the namespace.
+            compute (Callable[[], Any]): Produces the value on a miss.
+            should_cache (Callable[[Any], bool]): Whether a computed value may be stored,
+                e.g. to skip errors.
+        """
+        found, value = self.get(namespace, key)
+        if found:
+            return value
+        value = compute()
+        if should_cache(value):
+            self.set(namespace, key, value)
+        return value
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """Hits, misses and hit rate per namespace since startup."""
+        with self.lock:
+            namespaces = set(self.hits) | set(self.misses)
+            return {
+                namespace: {
+                    "hits": self.hits[namespace],
+                    "misses": self.misses[namespace],
+                    "hit_rate": self.hits[namespace]
+                    / max(1, self.hits[namespace] + self.misses[namespace]),
+                }
+                for namespace in namespaces
+            }
+
+    def clear(self) -> None:
+        """Delete every entry."""
+        with self.lock:
+            self.conn.execute("DELETE FROM cache")
+            self.conn.commit()
+
+    def _evict(self) -> None:
+        """Drop expired entries, then least recently used ones beyond the limits. Caller holds the lock."""
+        if self.ttl_seconds is not None:
+            self.conn.execute(
+                "DELETE FROM cache WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+        count, total = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        rows = self.conn.execute(
+            "SELECT namespace, key, size FROM cache ORDER BY accessed_at ASC"
+        ).fetchall()
+        for namespace, key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self.conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key)
+            )
+            count -= 1
+            total -= size
+
+
+def file_content_hash(path: Any) -> str | None:
+    """SHA-256 of a file's content, or None if `path` is not an existing file.
+
+    Uses the shared image cache's digests, memoized by size and modification time.
+    """
+    try:
+        if not os.path.isfile(path):
+            return None
+        return image_cache.file_digest(path)
+    except (OSError, TypeError, ValueError):
+        return None
+
+
+def tool_args_key(name: str, args: dict) -> str:
+    """Cache key of a tool call: tool name and arguments, with file arguments identified by content.
+
+    A re-uploaded image with the same content hits the cache under a new path, and
+    an image overwritten in place does not.
+    """
+    normalized = {
+        arg: (
+            {"sha256": digest}
+            if isinstance(value, str) and (digest := file_content_hash(value))
+            else value
+        )
+        for arg, value in args.items()
+    }
+    return stable_hash({"tool": name, "args": normalized})
+
+
+def tool_result_cacheable(result: Any) -> bool:
+    """Whether a tool result may be cached: successful and free of errors.
+
+    Tools return either an output or an (output, metadata) tuple, with failures
+    reported as {"error": ...} outputs or an "analysis_status" of "failed".
+    """
+    output, metadata = result if isinstance(result, tuple) and len(result) == 2 else (result, None)
+    if isinstance(output, dict) and "error" in output:
+        return False
+    if isinstance(metadata, dict) and (
+        metadata.get("analysis_status") == "failed" or "error" in metadata
+    ):
+        return False
+    return True
+
+
+def tool_artifacts_exist(result: Any) -> bool:
+    """Whether the files a cached tool result points to, e.g. visualizations in the temp directory, still exist."""
+    parts = result if isinstance(result, tuple) else (result,)
+    for part in parts:
+        if not isinstance(part, dict):
+            continue
+        for key, value in part.items():
+            if key.endswith("_path") and key != "image_path" and isinstance(value, str):
+                if not os.path.exists(value):
+                    return False
+    return True
@@ -0,0 +1,130 @@
+import atexit
+import gzip
+import json
+import os
+import queue
+import random
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Any
+
+
+def open_log(path: str | Path) -> IO[str]:
+    """Open a plain or gzip-compressed JSONL log for reading as text."""
+    path = Path(path)
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+class ToolCallLogWriter:
+    """Append-only JSONL log written by a background thread.
+
+    `write` only enqueues records, so callers never wait for disk I/O. The writer
+    thread appends one compact JSON object per line, flushes after draining the
+    queue, and starts a new file once the current one exceeds `max_bytes`.
+    Records still queued at interpreter exit are written before it terminates.
+    """
+
+    def __init__(
+        self,
+        log_dir: str | Path,
+        prefix: str = "tool_calls",
+        max_bytes: int = 64 * 1024 * 1024,
+        compress: bool = False,
+        sample_rate: float = 1.0,
+    ):
+        """
+        Args:
+            log_dir (str | Path): Directory the log files are written to.
+            prefix (str): File name prefix.
+            max_bytes (int): Uncompressed size after which a new file is started.
+            compress (bool): Write gzip-compressed files (.jsonl.gz).
+            sample_rate (float): Fraction of writes to keep, between 0 and 1. Records
+                passed to one `write` call are kept or dropped together.
+        """
+        self.log_dir = Path(log_dir)
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.sample_rate = sample_rate
+
+        # Process start time and pid keep concurrent writers from sharing files
+        self._run_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+        self._sequence = 0
+        self._file: IO[str] | None = None
+        self._bytes = 0
+
+        self._queue: queue.Queue[list[dict[str, Any]] | None] = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._loop, name=f"{prefix}_log_writer", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    @property
+    def current_path(self) -> Path:
+        """Path of the file currently written to."""
+        suffix = ".jsonl.gz" if self.compress else ".jsonl"
+        return self.log_dir / f"{self.prefix}_{self._run_id}_{self._sequence:04d}{suffix}"
+
+    def write(self, records: list[dict[str, Any]]) -> None:
+        """Queue records to be appended to the log. Never blocks on I/O."""
+        if not records or not self._thread.is_alive():
+            return
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:  # noqa: S311
+            return
+        self._queue.put(records)
+
+    def close(self) -> None:
+        """Write all queued records and close the current file."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _open(self) -> IO[str]:
+        if self.compress:
+            return gzip.open(self.current_path, "at", encoding="utf-8")
+        return open(self.current_path, "a", encoding="utf-8")
+
+    def _append(self, records: list[dict[str, Any]]) -> None:
+        if self._file is not None and self._bytes >= self.max_bytes:
+            self._file.close()
+            self._file = None
+            self._sequence += 1
+            self._bytes = 0
+        if self._file is None:
+            self._file = self._open()
+
+        for record in records:
+            line = json.dumps(record, separators=(",", ":"), default=str) + "\n"
+            self._file.write(line)
+            self._bytes += len(line)
+
+    def _loop(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            # Drain whatever else is queued so one flush covers all of it
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for records in batch:
+                if records is None:
+                    stopping = True
+                    continue
+                try:
+                    self._append(records)
+                except Exception as e:
+                    print(f"Failed to write tool call log: {e}")
+            if self._file is not None:
+                self._file.flush()
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,214 @@
+import base64
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+from urllib.parse import unquote, urlparse
+
+from langchain_core.messages import AnyMessage, HumanMessage
+from PIL import Image
+
+FILE_URL_PREFIX = "file://"
+
+
+def image_reference_part(image_path: str | Path) -> dict:
+    """Message content part pointing to a local image instead of embedding it.
+
+    Conversation state stores only the reference; the image is encoded when a
+    request is sent to the model, see `MessageCompactor`.
+    """
+    return {
+        "type": "image_url",
+        "image_url": {"url": Path(image_path).resolve().as_uri()},
+    }
+
+
+def _is_user_message(message: AnyMessage | dict) -> bool:
+    """Whether a message is from the user, either a HumanMessage or a role dict as sent by the interface."""
+    if isinstance(message, dict):
+        return message.get("role") in ("user", "human")
+    return isinstance(message, HumanMessage)
+
+
+def _content(message: AnyMessage | dict):
+    return message.get("content") if isinstance(message, dict) else message.content
+
+
+def _with_content(message: AnyMessage | dict, content: list) -> AnyMessage | dict:
+    if isinstance(message, dict):
+        return {**message, "content": content}
+    return message.model_copy(update={"content": content})
+
+
+class MessageCompactor:
+    """Prepare stored conversation messages for a model request.
+
+    Images are referenced in the conversation state by file URL (or, for older
+    threads, embedded as data URLs). Before each request the compactor:
+
+    - keeps images only in the latest `keep_image_turns` user turns, and only the
+      most recent occurrence of an image sent several times, replacing the others
+      with a short text note;
+    - downsizes the remaining images so their longest side is at most
+      `max_image_side`, beyond which vision models gain no detail, and re-encodes
+      them as JPEG;
+    - encodes each distinct image once, caching the data URL by content hash.
+
+    The stored messages are never modified.
+    """
+
+    def __init__(
+        self,
+        max_image_side: int = 1024,
+        keep_image_turns: int | None = 1,
+        jpeg_quality: int = 85,
+        cache_size: int = 64,
+    ):
+        """
+        Args:
+            max_image_side (int): Longest image side sent to the model, in pixels.
+            keep_image_turns (Optional[int]): Most recent user turns whose images are sent,
+                0 to send none, None to send images of every turn.
+            jpeg_quality (int): JPEG quality of re-encoded images.
+            cache_size (int): Number of encoded images kept in memory.
+        """
+        self.max_image_side = max_image_side
+        self.keep_image_turns = keep_image_turns
+        self.jpeg_quality = jpeg_quality
+        self.cache_size = cache_size
+
+        self._encoded: OrderedDict[str, str] = OrderedDict()
+        self._file_digests: dict[Path, tuple[int, int, str]] = {}
+        self._lock = threading.Lock()
+
+    def compact(self, messages: list[AnyMessage | dict]) -> list[AnyMessage | dict]:
+        """Return the messages to send to the model, with compacted image parts."""
+        turn_starts = _turn_starts(messages)
+        first_image_turn = 0
+        if self.keep_image_turns == 0:
+            # turn_starts[-0] would be the first turn: send no images at all
+            first_image_turn = len(messages)
+        elif self.keep_image_turns is not None:
+            first_image_turn = (
+                turn_starts[-self.keep_image_turns] if len(turn_starts) >= self.keep_image_turns else 0
+            )
+
+        seen: set[str] = set()
+        compacted = []
+        # Walk backwards so the most recent occurrence of a repeated image is kept
+        for index in range(len(messages) - 1, -1, -1):
+            message = messages[index]
+            if not _is_user_message(message) or not isinstance(_content(message), list):
+                compacted.append(message)
+                continue
+
+            content = []
+            for part in reversed(_content(message)):
+                if not _is_image_part(part):
+                    content.append(part)
+                    continue
+                content.append(self._compact_image(part, index >= first_image_turn, seen))
+            compacted.append(_with_content(message, content[::-1]))
+        return compacted[::-1]
+
+    def _compact_image(self, part: dict, in_recent_turn: bool, seen: set[str]) -> dict:
+        url = part["image_url"]["url"]
+        if not url.startswith((FILE_URL_PREFIX, "data:")):
+            # Remote URLs are fetched by the provider and left untouched
+            return part
+
+        name = _image_name(url)
+        if not in_recent_turn:
+            return {"type": "text", "text": f"[image {name} omitted, shown earlier in the conversation]"}
+
+        try:
+            digest, data = self._digest(url)
+        except FileNotFoundError:
+            return {"type": "text", "text": f"[image no longer available: {name}]"}
+
+        if digest in seen:
+            return {"type": "text", "text": f"[image {name} omitted, repeated later in the conversation]"}
+        seen.add(digest)
+        return {"type": "image_url", "image_url": {"url": self._encode(digest, url, data)}}
+
+    def _digest(self, url: str) -> tuple[str, bytes | None]:
+        """Content hash of an image, and its bytes if they had to be read.
+
+        Digests of files are memoized by size and modification time, so images
+        already encoded are not read again.
+        """
+        if url.startswith(FILE_URL_PREFIX):
+            path = Path(unquote(urlparse(url).path))
+            stat = path.stat()
+            with self._lock:
+                known = self._file_digests.get(path)
+            if known and known[:2] == (stat.st_size, stat.st_mtime_ns):
+                return known[2], None
+            data = path.read_bytes()
+            digest = hashlib.sha256(data).hexdigest()
+            with self._lock:
+                if len(self._file_digests) >= 16 * self.cache_size:
+                    self._file_digests.clear()
+                self._file_digests[path] = (stat.st_size, stat.st_mtime_ns, digest)
+            return digest, data
+        data = base64.b64decode(url.split(",", 1)[1])
+        return hashlib.sha256(data).hexdigest(), data
+
+    def _encode(self, digest: str, url: str, data: bytes | None) -> str:
+        """Downsized JPEG data URL of an image, cached by content hash."""
+        with self._lock:
+            if digest in self._encoded:
+                self._encoded.move_to_end(digest)
+                return self._encoded[digest]
+
+        if data is None:
+            data = Path(unquote(urlparse(url).path)).read_bytes()
+
+        with Image.open(io.BytesIO(data)) as image:
+            image = image.convert("RGB")
+            image.thumbnail((self.max_image_side, self.max_image_side), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, format="JPEG", quality=self.jpeg_quality, optimize=True)
+        url = f"data:image/jpeg;base64,{base64.b64encode(buffer.getvalue()).decode('utf-8')}"
+
+        with self._lock:
+            self._encoded[digest] = url
+            while len(self._encoded) > self.cache_size:
+                self._encoded.popitem(last=False)
+        return url
+
+
+def _image_name(url: str) -> str:
+    if url.startswith(FILE_URL_PREFIX):
+        return Path(unquote(urlparse(url).path)).name
+    return "attachment"
+
+
+def _is_image_part(part: Any) -> bool:
+    return isinstance(part, dict) and part.get("type") == "image_url"
+
+
+def _turn_starts(messages: list[AnyMessage | dict]) -> list[int]:
+    """Indices of the messages starting a user turn: user messages that follow a non-user one."""
+    return [
+        i
+        for i, message in enumerate(messages)
+        if _is_user_message(message) and (i == 0 or not _is_user_message(messages[i - 1]))
+    ]
+
+
+def trim_history(messages: list[AnyMessage | dict], max_messages: int | None) -> list[AnyMessage | dict]:
+    """Keep the most recent conversation turns within `max_messages` messages.
+
+    The cut is placed at the start of a user turn, so a tool call is never
+    separated from its results. The latest turn is always kept in full.
+    """
+    if max_messages is None or len(messages) <= max_messages:
+        return messages
+
+    turn_starts = _turn_starts(messages)
+    earliest = len(messages) - max_messages
+    start = next((i for i in turn_starts if i >= earliest), turn_starts[-1] if turn_starts else 0)
+    return messages[start:]
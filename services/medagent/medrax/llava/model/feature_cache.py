@@ -0,0 +1,85 @@
+import os
+import threading
+from collections import OrderedDict
+
+import torch
+
+
+class VisionFeatureCache:
+    """Process-wide LRU cache of projected image features.
+
+    Entries are keyed by a model signature and the content hash of the image, so
+    follow-up questions about the same image skip the vision tower and the
+    projector, and models of different weights or dtypes never share features.
+    Features stay on the device they were computed on and count against
+    `max_bytes` there.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, max_entries: int = 128):
+        """
+        Args:
+            max_bytes (int): Maximum total size of cached features.
+            max_entries (int): Maximum number of cached images.
+        """
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+
+        self._entries: OrderedDict[tuple[str, str], torch.Tensor] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, signature: str, image_key: str) -> torch.Tensor | None:
+        """Cached features of an image for a model, or None."""
+        with self._lock:
+            features = self._entries.get((signature, image_key))
+            if features is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((signature, image_key))
+            self.hits += 1
+            return features
+
+    def put(self, signature: str, image_key: str, features: torch.Tensor) -> None:
+        """Store features, evicting least recently used entries beyond the limits."""
+        size = features.element_size() * features.nelement()
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop((signature, image_key), None)
+            if previous is not None:
+                self._size -= previous.element_size() * previous.nelement()
+            self._entries[(signature, image_key)] = features
+            self._size += size
+
+            while self._entries and (
+                self._size > self.max_bytes or len(self._entries) > self.max_entries
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.element_size() * evicted.nelement()
+
+    def clear(self) -> None:
+        """Drop every cached feature."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict[str, int]:
+        """Current cache occupancy and hit/miss counters."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# Shared by every LLaVA model in the process
+vision_feature_cache = VisionFeatureCache(
+    max_bytes=int(os.getenv("MEDRAX_VISION_FEATURE_CACHE_MB", "256")) * 1024 * 1024,
+    max_entries=int(os.getenv("MEDRAX_VISION_FEATURE_CACHE_ENTRIES", "128")),
+)
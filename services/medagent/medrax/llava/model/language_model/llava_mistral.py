@@ -92,6 +92,7 @@ class LlavaMistralForCausalLM(MistralForCausalLM, LlavaMetaForCausalLM):
         inputs: torch.Tensor | None = None,
         images: torch.Tensor | None = None,
         image_sizes: torch.Tensor | None = None,
+        image_keys: list[str] | None = None,
         **kwargs,
     ) -> GenerateOutput | torch.LongTensor:
         position_ids = kwargs.pop("position_ids", None)
@@ -115,6 +116,7 @@ class LlavaMistralForCausalLM(MistralForCausalLM, LlavaMetaForCausalLM):
                 None,
                 images,
                 image_sizes=image_sizes,
+                image_keys=image_keys,
             )
         else:
             inputs_embeds = self.get_model().embed_tokens(inputs)
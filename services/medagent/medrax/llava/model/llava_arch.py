@@ -27,6 +27,7 @@ from medrax.llava.constants import (
     IMAGE_TOKEN_INDEX,
 )
 
+from .feature_cache import vision_feature_cache
 from .multimodal_encoder.builder import build_vision_tower
 from .multimodal_projector.builder import build_vision_projector
 
@@ -139,6 +140,40 @@ class LlavaMetaForCausalLM(ABC):
         image_features = self.get_model().mm_projector(image_features)
         return image_features
 
+    def vision_feature_signature(self):
+        """Identifies the weights and precision producing image features, for the feature cache."""
+        return (
+            f"{getattr(self.config, '_name_or_path', '')}:"
+            f"{getattr(self.config, 'mm_vision_tower', '')}:{self.dtype}"
+        )
+
+    def encode_images_cached(self, images, image_keys):
+        """Encode images, reusing the projected features of images seen before.
+
+        Args:
+            images: One (N, C, H, W) tensor per image, N being its number of crops.
+            image_keys: Content hash of each image.
+
+        Returns:
+            list[torch.Tensor]: (N, T, D) projected features of each image.
+        """
+        if len(images) != len(image_keys):
+            raise ValueError(
+                f"Got {len(image_keys)} image keys for {len(images)} images"
+            )
+
+        signature = self.vision_feature_signature()
+        features = [vision_feature_cache.get(signature, key) for key in image_keys]
+        missing = [i for i, cached in enumerate(features) if cached is None]
+        if missing:
+            # Encode every new image in a single vision tower pass
+            encoded = self.encode_images(torch.cat([images[i] for i in missing]))
+            encoded = torch.split(encoded, [images[i].shape[0] for i in missing])
+            for i, image_features in zip(missing, encoded):
+                features[i] = image_features.clone()
+                vision_feature_cache.put(signature, image_keys[i], features[i])
+        return features
+
     def prepare_inputs_labels_for_multimodal(
         self,
         input_ids,
@@ -148,6 +183,7 @@ class LlavaMetaForCausalLM(ABC):
         labels,
         images,
         image_sizes=None,
+        image_keys=None,
     ):
         vision_tower = self.get_vision_tower()
         if vision_tower is None or images is None or input_ids.shape[1] == 1:
@@ -182,7 +218,17 @@ class LlavaMetaForCausalLM(ABC):
                 labels,
             )
 
-        if type(images) is list or images.ndim == 5:
+        # Cached features are only valid when no gradient flows to the vision modules
+        use_cache = image_keys is not None and not torch.is_grad_enabled()
+        if use_cache and (type(images) is list or images.ndim == 5):
+            image_features = self.encode_images_cached(list(images), image_keys)
+            image_features = [x.flatten(0, 1).to(self.device) for x in image_features]
+        elif use_cache:
+            image_features = self.encode_images_cached(
+                list(images.split(1)), image_keys
+            )
+            image_features = torch.cat(image_features).to(self.device)
+        elif type(images) is list or images.ndim == 5:
             concat_images = torch.cat([image for image in images], dim=0)
             image_features = self.encode_images(concat_images)
             split_sizes = [image.shape[0] for image in images]
@@ -0,0 +1,395 @@
+"""
+Continuous batching of generation requests for the model worker.
+
+Requests join the running batch between decoding steps and leave it as soon as
+they finish, so the model advances every active sequence with one forward pass
+per token. Prompts of different lengths are left-padded, and the key/value
+caches of newly admitted requests are padded and concatenated to the running
+batch.
+"""
+
+import asyncio
+import collections
+import dataclasses
+import queue
+import threading
+import time
+from collections.abc import AsyncIterator
+
+import torch
+from transformers.cache_utils import DynamicCache
+
+
+@dataclasses.dataclass
+class GenerationRequest:
+    """A prompt to complete, with its sampling parameters and output channel.
+
+    Attributes:
+        input_ids: (L,) prompt token ids, with IMAGE_TOKEN_INDEX where images go.
+        images: Preprocessed images, one per image token, or None.
+        image_keys: Content hash of each image, to reuse cached vision features.
+        prefix: Text prepended to every streamed output, the original prompt.
+        temperature: Sampling temperature; greedy decoding at or below 1e-3.
+        top_p: Nucleus sampling threshold.
+        max_new_tokens: Maximum number of generated tokens.
+        stop_str: Text ending the generation, excluded from the output.
+    """
+
+    input_ids: torch.Tensor
+    images: torch.Tensor | list[torch.Tensor] | None = None
+    image_keys: list[str] | None = None
+    prefix: str = ""
+    temperature: float = 1.0
+    top_p: float = 1.0
+    max_new_tokens: int = 256
+    stop_str: str | None = None
+    output_ids: list[int] = dataclasses.field(default_factory=list)
+    text: str = ""
+    cancelled: bool = False
+    loop: asyncio.AbstractEventLoop | None = None
+    outputs: asyncio.Queue | None = None
+
+    def emit(self, item: dict | None) -> None:
+        """Send an output, or None to end the stream, to the requesting event loop."""
+        self.loop.call_soon_threadsafe(self.outputs.put_nowait, item)
+
+
+def sample_next_tokens(
+    logits: torch.Tensor, temperature: torch.Tensor, top_p: torch.Tensor
+) -> torch.Tensor:
+    """Sample one token per row with per-row temperature and nucleus threshold.
+
+    Args:
+        logits: (B, V) next token logits.
+        temperature: (B,) temperatures; rows at or below 1e-3 are decoded greedily.
+        top_p: (B,) nucleus sampling thresholds.
+
+    Returns:
+        torch.Tensor: (B,) token ids.
+    """
+    greedy = logits.argmax(dim=-1)
+    sampled_rows = temperature > 1e-3
+    if not sampled_rows.any():
+        return greedy
+
+    probs = torch.softmax(logits.float() / temperature.clamp(min=1e-3)[:, None], dim=-1)
+    sorted_probs, sorted_ids = probs.sort(dim=-1, descending=True)
+    # Keep the smallest prefix whose mass reaches top_p, always including the first token
+    outside = sorted_probs.cumsum(dim=-1) - sorted_probs > top_p[:, None]
+    sorted_probs = sorted_probs.masked_fill(outside, 0)
+    choice = torch.multinomial(sorted_probs, 1)
+    sampled = sorted_ids.gather(-1, choice).squeeze(-1)
+    return torch.where(sampled_rows, sampled, greedy)
+
+
+def _left_pad(tensors: list[torch.Tensor], length: int, dim: int) -> torch.Tensor:
+    """Left-pad tensors with zeros along `dim` to `length` and stack them on a new batch dimension."""
+    padded = []
+    for tensor in tensors:
+        shape = list(tensor.shape)
+        shape[dim] = length - tensor.shape[dim]
+        padded.append(torch.cat([tensor.new_zeros(shape), tensor], dim=dim))
+    return torch.stack(padded)
+
+
+def _legacy_cache(past_key_values) -> tuple:
+    if hasattr(past_key_values, "to_legacy_cache"):
+        return past_key_values.to_legacy_cache()
+    return past_key_values
+
+
+class ContinuousBatchScheduler:
+    """
+    Run generation requests of one model in a shared, continuously refilled batch.
+
+    The model runs in a dedicated thread. Each step admits waiting requests up to
+    `max_batch_size` (prefilling them together, with their images encoded in one
+    pass), decodes one token for every running request, streams the new text and
+    drops finished or cancelled requests.
+
+    Works with LLaVA models and with any Hugging Face causal language model, which
+    allows exercising it on CPU with a tiny model.
+    """
+
+    def __init__(
+        self,
+        model,
+        tokenizer,
+        max_batch_size: int = 8,
+        stream_interval: int = 1,
+        metrics_window: float = 10.0,
+    ):
+        """
+        Args:
+            model: Causal language model, optionally with LLaVA image support.
+            tokenizer: Tokenizer of the model.
+            max_batch_size: Maximum number of sequences decoded together.
+            stream_interval: Number of tokens between streamed outputs.
+            metrics_window: Period in seconds over which the token rate is measured.
+        """
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max_batch_size
+        self.stream_interval = stream_interval
+        self.metrics_window = metrics_window
+        self.device = next(model.parameters()).device
+
+        self.waiting: queue.Queue[GenerationRequest] = queue.Queue()
+        self.running: list[GenerationRequest] = []
+        self._token_times: collections.deque[tuple[float, int]] = collections.deque()
+        self._metrics_lock = threading.Lock()
+
+        # Batch state: caches and attention mask cover every token fed to the model;
+        # next_tokens holds the last sampled token of each row, not yet fed
+        self.past_key_values = None
+        self.attention_mask = None
+        self.next_tokens = None
+
+        self._closed = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="batch_scheduler", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def queue_length(self) -> int:
+        """Requests waiting or being decoded."""
+        return self.waiting.qsize() + len(self.running)
+
+    def tokens_per_second(self) -> float:
+        """Generated tokens per second over the metrics window."""
+        now = time.monotonic()
+        with self._metrics_lock:
+            while self._token_times and self._token_times[0][0] < now - self.metrics_window:
+                self._token_times.popleft()
+            return sum(n for _, n in self._token_times) / self.metrics_window
+
+    def stats(self) -> dict:
+        return {
+            "queue_length": self.queue_length,
+            "batch_size": len(self.running),
+            "tokens_per_second": round(self.tokens_per_second(), 2),
+        }
+
+    async def stream(self, request: GenerationRequest) -> AsyncIterator[dict]:
+        """Submit a request and yield its outputs, {"text": ..., "error_code": ...}, as they are produced."""
+        request.loop = asyncio.get_running_loop()
+        request.outputs = asyncio.Queue()
+        self.waiting.put(request)
+        try:
+            while (item := await request.outputs.get()) is not None:
+                yield item
+        finally:
+            # The client went away or the stream ended: stop decoding for it
+            request.cancelled = True
+
+    def close(self) -> None:
+        self._closed.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._closed.is_set():
+            try:
+                with torch.inference_mode():
+                    if not self.running:
+                        try:
+                            first = self.waiting.get(timeout=0.1)
+                        except queue.Empty:
+                            continue
+                        self._admit([first])
+                    else:
+                        self._admit([])
+                    if self.running:
+                        self._decode_step()
+            except Exception as e:
+                # Fail the whole batch rather than leave its requests hanging
+                self._fail(self.running, e)
+                self.running = []
+                self.past_key_values = self.attention_mask = self.next_tokens = None
+                if self.device.type == "cuda":
+                    torch.cuda.empty_cache()
+
+    def _admit(self, requests: list[GenerationRequest]) -> None:
+        """Prefill waiting requests and merge them into the running batch."""
+        while len(self.running) + len(requests) < self.max_batch_size:
+            try:
+                requests.append(self.waiting.get_nowait())
+            except queue.Empty:
+                break
+        requests = [r for r in requests if not r.cancelled]
+        if not requests:
+            return
+
+        try:
+            embeds = self._embed(requests)
+            length = max(e.shape[0] for e in embeds)
+            inputs_embeds = _left_pad(embeds, length, dim=0)
+            attention_mask = _left_pad(
+                [torch.ones(e.shape[0], dtype=torch.long, device=self.device) for e in embeds],
+                length,
+                dim=0,
+            )
+            position_ids = (attention_mask.cumsum(-1) - 1).clamp(min=0)
+            out = self.model(
+                inputs_embeds=inputs_embeds,
+                attention_mask=attention_mask,
+                position_ids=position_ids,
+                use_cache=True,
+            )
+        except Exception as e:
+            # A bad prompt or image only fails the requests being admitted
+            self._fail(requests, e)
+            return
+        next_tokens = self._sample(out.logits[:, -1], requests)
+        self._merge(requests, _legacy_cache(out.past_key_values), attention_mask, next_tokens)
+        self._record(requests, next_tokens)
+
+    def _embed(self, requests: list[GenerationRequest]) -> list[torch.Tensor]:
+        """Prompt embeddings of each request, with image features in place of image tokens."""
+        embed_tokens = self.model.get_input_embeddings()
+        embeds: list[torch.Tensor | None] = [None] * len(requests)
+
+        with_images = [i for i, r in enumerate(requests) if r.images is not None]
+        if with_images:
+            # Encode the images of every new request in a single vision tower pass
+            ids = [requests[i].input_ids.to(self.device) for i in with_images]
+            length = max(len(x) for x in ids)
+            input_ids = torch.stack(
+                [torch.cat([x, x.new_zeros(length - len(x))]) for x in ids]
+            )
+            mask = torch.stack(
+                [
+                    torch.arange(length, device=self.device) < len(x)
+                    for x in ids
+                ]
+            )
+            images = [requests[i].images for i in with_images]
+            if all(isinstance(x, torch.Tensor) for x in images):
+                images = torch.cat(images)
+            else:
+                images = [
+                    image
+                    for x in images
+                    for image in (x if isinstance(x, list) else x.unbind(0))
+                ]
+            image_keys = None
+            if all(requests[i].image_keys for i in with_images):
+                image_keys = [key for i in with_images for key in requests[i].image_keys]
+            _, _, out_mask, _, inputs_embeds, _ = self.model.prepare_inputs_labels_for_multimodal(
+                input_ids, None, mask, None, None, images, image_keys=image_keys
+            )
+            for row, i in enumerate(with_images):
+                embeds[i] = inputs_embeds[row][out_mask[row].bool()]
+
+        for i, request in enumerate(requests):
+            if embeds[i] is None:
+                embeds[i] = embed_tokens(request.input_ids.to(self.device))
+        return embeds
+
+    def _merge(
+        self,
+        requests: list[GenerationRequest],
+        past_key_values: tuple,
+        attention_mask: torch.Tensor,
+        next_tokens: torch.Tensor,
+    ) -> None:
+        """Append prefilled requests to the running batch, left-padding the shorter caches."""
+        if not self.running:
+            self.running = requests
+            self.past_key_values = past_key_values
+            self.attention_mask = attention_mask
+            self.next_tokens = next_tokens
+            return
+
+        length = max(self.attention_mask.shape[1], attention_mask.shape[1])
+
+        def pad(tensor: torch.Tensor, dim: int) -> torch.Tensor:
+            shape = list(tensor.shape)
+            shape[dim] = length - tensor.shape[dim]
+            return torch.cat([tensor.new_zeros(shape), tensor], dim=dim)
+
+        self.past_key_values = tuple(
+            tuple(torch.cat([pad(old, 2), pad(new, 2)]) for old, new in zip(old_layer, new_layer))
+            for old_layer, new_layer in zip(self.past_key_values, past_key_values)
+        )
+        self.attention_mask = torch.cat([pad(self.attention_mask, 1), pad(attention_mask, 1)])
+        self.next_tokens = torch.cat([self.next_tokens, next_tokens])
+        self.running = self.running + requests
+
+    def _decode_step(self) -> None:
+        """Feed the last sampled tokens and sample the next ones for every running request."""
+        self.attention_mask = torch.cat(
+            [self.attention_mask, self.attention_mask.new_ones(len(self.running), 1)], dim=1
+        )
+        position_ids = self.attention_mask.sum(-1, keepdim=True) - 1
+        out = self.model(
+            input_ids=self.next_tokens[:, None],
+            attention_mask=self.attention_mask,
+            position_ids=position_ids,
+            past_key_values=DynamicCache.from_legacy_cache(self.past_key_values),
+            use_cache=True,
+        )
+        self.past_key_values = _legacy_cache(out.past_key_values)
+        self.next_tokens = self._sample(out.logits[:, -1], self.running)
+        self._record(self.running, self.next_tokens)
+
+    def _sample(self, logits: torch.Tensor, requests: list[GenerationRequest]) -> torch.Tensor:
+        temperature = torch.tensor([r.temperature for r in requests], device=logits.device)
+        top_p = torch.tensor([r.top_p for r in requests], device=logits.device)
+        return sample_next_tokens(logits, temperature, top_p)
+
+    def _record(self, requests: list[GenerationRequest], tokens: torch.Tensor) -> None:
+        """Append sampled tokens, stream text and drop finished requests from the batch."""
+        eos_token_id = self.tokenizer.eos_token_id
+        keep = []
+        for row, (request, token) in enumerate(zip(requests, tokens.tolist())):
+            finished = token == eos_token_id
+            if not finished:
+                request.output_ids.append(token)
+            finished = finished or len(request.output_ids) >= request.max_new_tokens
+
+            if finished or len(request.output_ids) % self.stream_interval == 0:
+                request.text = self.tokenizer.decode(request.output_ids, skip_special_tokens=True)
+                if request.stop_str and request.stop_str in request.text:
+                    request.text = request.text[: request.text.index(request.stop_str)]
+                    finished = True
+                if not request.cancelled:
+                    request.emit({"text": request.prefix + request.text, "error_code": 0})
+
+            if finished or request.cancelled:
+                request.emit(None)
+            else:
+                keep.append(row)
+
+        with self._metrics_lock:
+            self._token_times.append((time.monotonic(), len(requests)))
+
+        self._retain(requests, keep)
+
+    def _fail(self, requests: list[GenerationRequest], error: Exception) -> None:
+        for request in requests:
+            request.emit({"text": f"{request.prefix}{request.text}\n\n{error}", "error_code": 1})
+            request.emit(None)
+
+    def _retain(self, requests: list[GenerationRequest], keep: list[int]) -> None:
+        """Keep only the given rows of `requests`, which are the last rows of the batch."""
+        offset = len(self.running) - len(requests)
+        rows = list(range(offset)) + [offset + row for row in keep]
+        if len(rows) == len(self.running):
+            return
+
+        self.running = [self.running[i] for i in rows]
+        if not self.running:
+            self.past_key_values = self.attention_mask = self.next_tokens = None
+            return
+
+        index = torch.tensor(rows, device=self.device)
+        mask = self.attention_mask[index]
+        # Drop cache columns that are padding for every remaining row
+        start = int((mask.sum(0) == 0).long().cumprod(0).sum())
+        self.attention_mask = mask[:, start:]
+        self.next_tokens = self.next_tokens[index]
+        self.past_key_values = tuple(
+            tuple(t[index][:, :, start:] for t in layer) for layer in self.past_key_values
+        )
+
@@ -4,14 +4,15 @@ It sends worker addresses to clients.
 """
 
 import argparse
+import asyncio
 import dataclasses
 import json
-import threading
+import random
 import time
+from contextlib import asynccontextmanager
 from enum import Enum, auto
 
-import numpy as np
-import requests
+import httpx
 import uvicorn
 from fastapi import FastAPI, Request
 from fastapi.responses import StreamingResponse
@@ -21,10 +22,16 @@ from medrax.llava.utils import build_logger, server_error_msg
 
 logger = build_logger("controller", "controller.log")
 
+# A worker failing this many requests in a row is removed
+MAX_CONSECUTIVE_FAILURES = 3
+# A worker is not selected for this many seconds after a failed request
+FAILURE_COOLDOWN = 10.0
+
 
 class DispatchMethod(Enum):
     LOTTERY = auto()
     SHORTEST_QUEUE = auto()
+    POWER_OF_TWO = auto()
 
     @classmethod
     def from_str(cls, name):
@@ -32,6 +39,8 @@ class DispatchMethod(Enum):
             return cls.LOTTERY
         elif name == "shortest_queue":
             return cls.SHORTEST_QUEUE
+        elif name == "power_of_two":
+            return cls.POWER_OF_TWO
         else:
             raise ValueError("Invalid dispatch method")
 
@@ -42,12 +51,21 @@ class WorkerInfo:
     speed: int
     queue_length: int
     check_heart_beat: bool
-    last_heart_beat: str
+    last_heart_beat: float
+    # Requests currently proxied to the worker by this controller
+    in_flight: int = 0
+    consecutive_failures: int = 0
+    unavailable_until: float = 0.0
+
+    @property
+    def load(self) -> float:
+        """Expected wait on the worker: the larger of its reported queue and our live in-flight count, per unit of speed."""
+        return max(self.queue_length, self.in_flight) / max(self.speed, 1e-4)
 
 
-def heart_beat_controller(controller):
+async def heart_beat_controller(controller):
     while True:
-        time.sleep(CONTROLLER_HEART_BEAT_EXPIRATION)
+        await asyncio.sleep(CONTROLLER_HEART_BEAT_EXPIRATION)
         controller.remove_stable_workers_by_expiration()
 
 
@@ -56,15 +74,24 @@ class Controller:
         # Dict[str -> WorkerInfo]
         self.worker_info = {}
         self.dispatch_method = DispatchMethod.from_str(dispatch_method)
+        self.client = None
+        self.heart_beat_task = None
+
+        logger.info("Init controller")
 
-        self.heart_beat_thread = threading.Thread(
-            target=heart_beat_controller, args=(self,)
+    async def start(self):
+        """Create the HTTP client and the expiration task, on the server's event loop."""
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(60.0, connect=5.0),
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=64),
         )
-        self.heart_beat_thread.start()
+        self.heart_beat_task = asyncio.create_task(heart_beat_controller(self))
 
-        logger.info("Init controller")
+    async def stop(self):
+        self.heart_beat_task.cancel()
+        await self.client.aclose()
 
-    def register_worker(
+    async def register_worker(
         self, worker_name: str, check_heart_beat: bool, worker_status: dict
     ):
         if worker_name not in self.worker_info:
@@ -73,25 +100,34 @@ class Controller:
             logger.info(f"Register an existing worker: {worker_name}")
 
         if not worker_status:
-            worker_status = self.get_worker_status(worker_name)
+            worker_status = await self.get_worker_status(worker_name)
         if not worker_status:
             return False
 
-        self.worker_info[worker_name] = WorkerInfo(
-            worker_status["model_names"],
-            worker_status["speed"],
-            worker_status["queue_length"],
-            check_heart_beat,
-            time.time(),
-        )
+        w_info = self.worker_info.get(worker_name)
+        if w_info is None:
+            self.worker_info[worker_name] = WorkerInfo(
+                worker_status["model_names"],
+                worker_status["speed"],
+                worker_status["queue_length"],
+                check_heart_beat,
+                time.time(),
+            )
+        else:
+            # Update in place: streams in flight decrement this object's count when they end
+            w_info.model_names = worker_status["model_names"]
+            w_info.speed = worker_status["speed"]
+            w_info.queue_length = worker_status["queue_length"]
+            w_info.check_heart_beat = check_heart_beat
+            w_info.last_heart_beat = time.time()
 
         logger.info(f"Register done: {worker_name}, {worker_status}")
         return True
 
-    def get_worker_status(self, worker_name: str):
+    async def get_worker_status(self, worker_name: str):
         try:
-            r = requests.post(worker_name + "/worker_get_status", timeout=5)
-        except requests.exceptions.RequestException as e:
+            r = await self.client.post(worker_name + "/worker_get_status", timeout=5)
+        except httpx.HTTPError as e:
             logger.error(f"Get status fails: {worker_name}, {e}")
             return None
 
@@ -102,15 +138,21 @@ class Controller:
         return r.json()
 
     def remove_worker(self, worker_name: str):
-        del self.worker_info[worker_name]
+        self.worker_info.pop(worker_name, None)
 
-    def refresh_all_workers(self):
+    async def refresh_all_workers(self):
         old_info = dict(self.worker_info)
-        self.worker_info = {}
 
-        for w_name, w_info in old_info.items():
-            if not self.register_worker(w_name, w_info.check_heart_beat, None):
+        results = await asyncio.gather(
+            *(
+                self.register_worker(w_name, w_info.check_heart_beat, None)
+                for w_name, w_info in old_info.items()
+            )
+        )
+        for w_name, registered in zip(old_info, results):
+            if not registered:
                 logger.info(f"Remove stale worker: {w_name}")
+                self.remove_worker(w_name)
 
     def list_models(self):
         model_names = set()
@@ -120,59 +162,41 @@ class Controller:
 
         return list(model_names)
 
-    def get_worker_address(self, model_name: str):
+    def get_worker_address(self, model_name: str, exclude: frozenset = frozenset()):
+        """Select a worker serving `model_name`, skipping workers in `exclude` or cooling down after a failure."""
+        now = time.time()
+        candidates = [
+            (w_name, w_info)
+            for w_name, w_info in self.worker_info.items()
+            if model_name in w_info.model_names
+            and w_name not in exclude
+            and w_info.unavailable_until <= now
+        ]
+        if not candidates:
+            return ""
+
         if self.dispatch_method == DispatchMethod.LOTTERY:
-            worker_names = []
-            worker_speeds = []
-            for w_name, w_info in self.worker_info.items():
-                if model_name in w_info.model_names:
-                    worker_names.append(w_name)
-                    worker_speeds.append(w_info.speed)
-            worker_speeds = np.array(worker_speeds, dtype=np.float32)
-            norm = np.sum(worker_speeds)
-            if norm < 1e-4:
+            weights = [w_info.speed for _, w_info in candidates]
+            if sum(weights) < 1e-4:
                 return ""
-            worker_speeds = worker_speeds / norm
-            if True:  # Directly return address
-                pt = np.random.choice(np.arange(len(worker_names)), p=worker_speeds)
-                worker_name = worker_names[pt]
-                return worker_name
-
-            # Check status before returning
-            while True:
-                pt = np.random.choice(np.arange(len(worker_names)), p=worker_speeds)
-                worker_name = worker_names[pt]
-
-                if self.get_worker_status(worker_name):
-                    break
-                else:
-                    self.remove_worker(worker_name)
-                    worker_speeds[pt] = 0
-                    norm = np.sum(worker_speeds)
-                    if norm < 1e-4:
-                        return ""
-                    worker_speeds = worker_speeds / norm
-                    continue
-            return worker_name
+            w_name, w_info = random.choices(candidates, weights=weights)[0]
         elif self.dispatch_method == DispatchMethod.SHORTEST_QUEUE:
-            worker_names = []
-            worker_qlen = []
-            for w_name, w_info in self.worker_info.items():
-                if model_name in w_info.model_names:
-                    worker_names.append(w_name)
-                    worker_qlen.append(w_info.queue_length / w_info.speed)
-            if len(worker_names) == 0:
-                return ""
-            min_index = np.argmin(worker_qlen)
-            w_name = worker_names[min_index]
-            self.worker_info[w_name].queue_length += 1
-            logger.info(
-                f"names: {worker_names}, queue_lens: {worker_qlen}, ret: {w_name}"
-            )
-            return w_name
+            w_name, w_info = min(candidates, key=lambda c: c[1].load)
+        elif self.dispatch_method == DispatchMethod.POWER_OF_TWO:
+            # Two random candidates, the less loaded wins: near-optimal balance
+            # without all clients piling onto the same least-loaded worker
+            sampled = random.sample(candidates, min(2, len(candidates)))
+            w_name, w_info = min(sampled, key=lambda c: c[1].load)
         else:
             raise ValueError(f"Invalid dispatch method: {self.dispatch_method}")
 
+        # Count the assignment until the next heart beat reports the real queue
+        w_info.queue_length += 1
+        logger.info(
+            f"candidates: {[(n, round(i.load, 2)) for n, i in candidates]}, ret: {w_name}"
+        )
+        return w_name
+
     def receive_heart_beat(self, worker_name: str, queue_length: int):
         if worker_name not in self.worker_info:
             logger.info(f"Receive unknown heart beat. {worker_name}")
@@ -193,43 +217,81 @@ class Controller:
         for worker_name in to_delete:
             self.remove_worker(worker_name)
 
-    def worker_api_generate_stream(self, params):
-        worker_addr = self.get_worker_address(params["model"])
-        if not worker_addr:
-            logger.info(f"no worker: {params['model']}")
-            ret = {
-                "text": server_error_msg,
-                "error_code": 2,
-            }
-            yield json.dumps(ret).encode() + b"\0"
+    def report_failure(self, worker_name: str):
+        """Back off from a worker after a failed request, removing it after repeated failures."""
+        w_info = self.worker_info.get(worker_name)
+        if w_info is None:
+            return
+        w_info.consecutive_failures += 1
+        w_info.unavailable_until = time.time() + FAILURE_COOLDOWN
+        if w_info.consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+            logger.info(f"Remove failing worker: {worker_name}")
+            self.remove_worker(worker_name)
 
-        try:
-            response = requests.post(
-                worker_addr + "/worker_generate_stream",
-                json=params,
-                stream=True,
-                timeout=5,
-            )
-            for chunk in response.iter_lines(decode_unicode=False, delimiter=b"\0"):
-                if chunk:
-                    yield chunk + b"\0"
-        except requests.exceptions.RequestException:
-            logger.info(f"worker timeout: {worker_addr}")
-            ret = {
-                "text": server_error_msg,
-                "error_code": 3,
-            }
-            yield json.dumps(ret).encode() + b"\0"
+    def report_success(self, worker_name: str):
+        w_info = self.worker_info.get(worker_name)
+        if w_info is not None:
+            w_info.consecutive_failures = 0
+
+    async def worker_api_generate_stream(self, params, max_attempts: int = 2):
+        tried = set()
+        while True:
+            worker_addr = self.get_worker_address(params["model"], frozenset(tried))
+            if not worker_addr:
+                logger.info(f"no worker: {params['model']}")
+                ret = {
+                    "text": server_error_msg,
+                    "error_code": 2,
+                }
+                yield json.dumps(ret).encode() + b"\0"
+                return
+
+            tried.add(worker_addr)
+            w_info = self.worker_info[worker_addr]
+            w_info.in_flight += 1
+            started = False
+            try:
+                async with self.client.stream(
+                    "POST", worker_addr + "/worker_generate_stream", json=params
+                ) as response:
+                    response.raise_for_status()
+                    buffer = b""
+                    async for data in response.aiter_bytes():
+                        buffer += data
+                        *chunks, buffer = buffer.split(b"\0")
+                        for chunk in chunks:
+                            if chunk:
+                                started = True
+                                yield chunk + b"\0"
+                    if buffer:
+                        yield buffer + b"\0"
+                self.report_success(worker_addr)
+                return
+            except httpx.HTTPError as e:
+                logger.info(f"worker error: {worker_addr}, {e!r}")
+                self.report_failure(worker_addr)
+                # Fail over to another worker unless output was already streamed
+                if started or len(tried) >= max_attempts:
+                    ret = {
+                        "text": server_error_msg,
+                        "error_code": 3,
+                    }
+                    yield json.dumps(ret).encode() + b"\0"
+                    return
+            finally:
+                w_info.in_flight -= 1
 
     # Let the controller act as a worker to achieve hierarchical
     # management. This can be used to connect isolated sub networks.
-    def worker_api_get_status(self):
+    async def worker_api_get_status(self):
         model_names = set()
         speed = 0
         queue_length = 0
 
-        for w_name in self.worker_info:
-            worker_status = self.get_worker_status(w_name)
+        statuses = await asyncio.gather(
+            *(self.get_worker_status(w_name) for w_name in list(self.worker_info))
+        )
+        for worker_status in statuses:
             if worker_status is not None:
                 model_names.update(worker_status["model_names"])
                 speed += worker_status["speed"]
@@ -242,20 +304,27 @@ class Controller:
         }
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await controller.start()
+    yield
+    await controller.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 @app.post("/register_worker")
 async def register_worker(request: Request):
     data = await request.json()
-    controller.register_worker(
+    await controller.register_worker(
         data["worker_name"], data["check_heart_beat"], data.get("worker_status", None)
     )
 
 
 @app.post("/refresh_all_workers")
 async def refresh_all_workers():
-    models = controller.refresh_all_workers()
+    await controller.refresh_all_workers()
 
 
 @app.post("/list_models")
@@ -287,7 +356,7 @@ async def worker_api_generate_stream(request: Request):
 
 @app.post("/worker_get_status")
 async def worker_api_get_status(request: Request):
-    return controller.worker_api_get_status()
+    return await controller.worker_api_get_status()
 
 
 if __name__ == "__main__":
@@ -297,8 +366,8 @@ if __name__ == "__main__":
     parser.add_argument(
         "--dispatch-method",
         type=str,
-        choices=["lottery", "shortest_queue"],
-        default="shortest_queue",
+        choices=["lottery", "shortest_queue", "power_of_two"],
+        default="power_of_two",
     )
     args = parser.parse_args()
     logger.info(f"args: {args}")
@@ -4,19 +4,17 @@ A model worker executes the model.
 
 import argparse
 import asyncio
+import hashlib
 import json
 import threading
 import time
 import uuid
-from functools import partial
-from threading import Thread
 
 import requests
 import torch
 import uvicorn
 from fastapi import BackgroundTasks, FastAPI, Request
 from fastapi.responses import StreamingResponse
-from transformers import TextIteratorStreamer
 
 from medrax.llava.constants import (
     DEFAULT_IM_END_TOKEN,
@@ -26,13 +24,13 @@ from medrax.llava.constants import (
     WORKER_HEART_BEAT_INTERVAL,
 )
 from medrax.llava.mm_utils import (
-    KeywordsStoppingCriteria,
     load_image_from_base64,
     process_images,
     tokenizer_image_token,
 )
 from medrax.llava.model.builder import load_pretrained_model
-from medrax.llava.utils import build_logger, pretty_print_semaphore, server_error_msg
+from medrax.llava.serve.batch_scheduler import ContinuousBatchScheduler, GenerationRequest
+from medrax.llava.utils import build_logger, server_error_msg
 
 GB = 1 << 30
 
@@ -40,8 +38,6 @@ worker_id = str(uuid.uuid4())[:6]
 logger = build_logger("model_worker", f"model_worker_{worker_id}.log")
 global_counter = 0
 
-model_semaphore = None
-
 
 def heart_beat_worker(controller):
     while True:
@@ -62,6 +58,8 @@ class ModelWorker:
         load_8bit,
         load_4bit,
         device,
+        max_batch_size=8,
+        stream_interval=1,
     ):
         self.controller_addr = controller_addr
         self.worker_addr = worker_addr
@@ -90,6 +88,12 @@ class ModelWorker:
             )
         )
         self.is_multimodal = "llava" in self.model_name.lower()
+        self.scheduler = ContinuousBatchScheduler(
+            self.model,
+            self.tokenizer,
+            max_batch_size=max_batch_size,
+            stream_interval=stream_interval,
+        )
 
         if not no_register:
             self.register_to_controller()
@@ -113,7 +117,7 @@ class ModelWorker:
     def send_heart_beat(self):
         logger.info(
             f"Send heart beat. Models: {[self.model_name]}. "
-            f"Semaphore: {pretty_print_semaphore(model_semaphore)}. "
+            f"Scheduler: {self.scheduler.stats()}. "
             f"global_counter: {global_counter}"
         )
 
@@ -139,28 +143,23 @@ class ModelWorker:
             self.register_to_controller()
 
     def get_queue_length(self):
-        if model_semaphore is None:
-            return 0
-        else:
-            return (
-                args.limit_model_concurrency
-                - model_semaphore._value
-                + (
-                    len(model_semaphore._waiters)
-                    if model_semaphore._waiters is not None
-                    else 0
-                )
-            )
+        return self.scheduler.queue_length
 
     def get_status(self):
         return {
             "model_names": [self.model_name],
             "speed": 1,
             "queue_length": self.get_queue_length(),
+            "tokens_per_second": self.scheduler.tokens_per_second(),
         }
 
-    @torch.inference_mode()
-    def generate_stream(self, params):
+    def prepare_request(self, params):
+        """Decode the images and tokenize the prompt of a generation request.
+
+        Returns:
+            GenerationRequest | None: The request to schedule, or None if the
+            prompt leaves no room for new tokens in the context.
+        """
         tokenizer, model, image_processor = (
             self.tokenizer,
             self.model,
@@ -170,71 +169,71 @@ class ModelWorker:
         prompt = params["prompt"]
         ori_prompt = prompt
         images = params.get("images", None)
+        image_keys = None
         num_image_tokens = 0
         if images is not None and len(images) > 0 and self.is_multimodal:
-            if len(images) > 0:
-                if len(images) != prompt.count(DEFAULT_IMAGE_TOKEN):
-                    raise ValueError(
-                        "Number of images does not match number of <image> tokens in prompt"
-                    )
-
-                images = [load_image_from_base64(image) for image in images]
-                images = process_images(images, image_processor, model.config)
-
-                if type(images) is list:
-                    images = [
-                        image.to(self.model.device, dtype=torch.float16)
-                        for image in images
-                    ]
-                else:
-                    images = images.to(self.model.device, dtype=torch.float16)
-
-                replace_token = DEFAULT_IMAGE_TOKEN
-                if getattr(self.model.config, "mm_use_im_start_end", False):
-                    replace_token = (
-                        DEFAULT_IM_START_TOKEN + replace_token + DEFAULT_IM_END_TOKEN
-                    )
-                prompt = prompt.replace(DEFAULT_IMAGE_TOKEN, replace_token)
-
-                num_image_tokens = (
-                    prompt.count(replace_token) * model.get_vision_tower().num_patches
+            if len(images) != prompt.count(DEFAULT_IMAGE_TOKEN):
+                raise ValueError(
+                    "Number of images does not match number of <image> tokens in prompt"
                 )
+
+            # Conversations resend their images every turn: identify them by
+            # content so the model reuses their vision features
+            image_keys = [hashlib.sha256(image.encode()).hexdigest() for image in images]
+            images = [load_image_from_base64(image) for image in images]
+            images = process_images(images, image_processor, model.config)
+
+            if type(images) is list:
+                images = [
+                    image.to(self.model.device, dtype=torch.float16)
+                    for image in images
+                ]
             else:
-                images = None
-            image_args = {"images": images}
+                images = images.to(self.model.device, dtype=torch.float16)
+
+            replace_token = DEFAULT_IMAGE_TOKEN
+            if getattr(self.model.config, "mm_use_im_start_end", False):
+                replace_token = (
+                    DEFAULT_IM_START_TOKEN + replace_token + DEFAULT_IM_END_TOKEN
+                )
+            prompt = prompt.replace(DEFAULT_IMAGE_TOKEN, replace_token)
+
+            num_image_tokens = (
+                prompt.count(replace_token) * model.get_vision_tower().num_patches
+            )
         else:
             images = None
-            image_args = {}
 
-        temperature = float(params.get("temperature", 1.0))
-        top_p = float(params.get("top_p", 1.0))
         max_context_length = getattr(model.config, "max_position_embeddings", 2048)
         max_new_tokens = min(int(params.get("max_new_tokens", 256)), 1024)
-        stop_str = params.get("stop", None)
-        do_sample = True if temperature > 0.001 else False
 
-        input_ids = (
-            tokenizer_image_token(
-                prompt, tokenizer, IMAGE_TOKEN_INDEX, return_tensors="pt"
-            )
-            .unsqueeze(0)
-            .to(self.device)
+        input_ids = tokenizer_image_token(
+            prompt, tokenizer, IMAGE_TOKEN_INDEX, return_tensors="pt"
         )
-        keywords = [stop_str]
-        stopping_criteria = KeywordsStoppingCriteria(keywords, tokenizer, input_ids)
-        streamer = TextIteratorStreamer(
-            tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=15
-        )
-
         max_new_tokens = min(
             max_new_tokens, max_context_length - input_ids.shape[-1] - num_image_tokens
         )
-
         if max_new_tokens < 1:
+            return None
+
+        return GenerationRequest(
+            input_ids=input_ids,
+            images=images,
+            image_keys=image_keys,
+            prefix=ori_prompt,
+            temperature=float(params.get("temperature", 1.0)),
+            top_p=float(params.get("top_p", 1.0)),
+            max_new_tokens=max_new_tokens,
+            stop_str=params.get("stop", None),
+        )
+
+    async def generate_stream(self, params):
+        request = await asyncio.to_thread(self.prepare_request, params)
+        if request is None:
             yield (
                 json.dumps(
                     {
-                        "text": ori_prompt
+                        "text": params["prompt"]
                         + "Exceeds max token length. Please start a new conversation, thanks.",
                         "error_code": 0,
                     }
@@ -243,32 +242,15 @@ class ModelWorker:
             )
             return
 
-        thread = Thread(
-            target=model.generate,
-            kwargs=dict(
-                inputs=input_ids,
-                do_sample=do_sample,
-                temperature=temperature,
-                top_p=top_p,
-                max_new_tokens=max_new_tokens,
-                streamer=streamer,
-                stopping_criteria=[stopping_criteria],
-                use_cache=True,
-                **image_args,
-            ),
-        )
-        thread.start()
-
-        generated_text = ori_prompt
-        for new_text in streamer:
-            generated_text += new_text
-            if generated_text.endswith(stop_str):
-                generated_text = generated_text[: -len(stop_str)]
-            yield json.dumps({"text": generated_text, "error_code": 0}).encode() + b"\0"
+        async for output in self.scheduler.stream(request):
+            if output["error_code"] != 0:
+                logger.error(f"Generation failed: {output['text']}")
+                output = {"text": server_error_msg, "error_code": output["error_code"]}
+            yield json.dumps(output).encode() + b"\0"
 
-    def generate_stream_gate(self, params):
+    async def generate_stream_gate(self, params):
         try:
-            for x in self.generate_stream(params):
+            async for x in self.generate_stream(params):
                 yield x
         except ValueError as e:
             print("Caught ValueError:", e)
@@ -296,27 +278,18 @@ class ModelWorker:
 app = FastAPI()
 
 
-def release_model_semaphore(fn=None):
-    model_semaphore.release()
-    if fn is not None:
-        fn()
-
-
 @app.post("/worker_generate_stream")
 async def generate_stream(request: Request):
-    global model_semaphore, global_counter
+    global global_counter
     global_counter += 1
     params = await request.json()
 
-    if model_semaphore is None:
-        model_semaphore = asyncio.Semaphore(args.limit_model_concurrency)
-    await model_semaphore.acquire()
-    worker.send_heart_beat()
+    # Requests are not serialized anymore: the scheduler batches them, so the
+    # controller only needs the updated queue length
+    await asyncio.to_thread(worker.send_heart_beat)
     generator = worker.generate_stream_gate(params)
     background_tasks = BackgroundTasks()
-    background_tasks.add_task(
-        partial(release_model_semaphore, fn=worker.send_heart_beat)
-    )
+    background_tasks.add_task(worker.send_heart_beat)
     return StreamingResponse(generator, background=background_tasks)
 
 
@@ -325,6 +298,11 @@ async def get_status(request: Request):
     return worker.get_status()
 
 
+@app.get("/metrics")
+async def metrics():
+    return worker.scheduler.stats()
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--host", type=str, default="localhost")
@@ -342,7 +320,12 @@ if __name__ == "__main__":
         action="store_true",
         help="Multimodal mode is automatically detected with model name, please make sure `llava` is included in the model path.",
     )
-    parser.add_argument("--limit-model-concurrency", type=int, default=5)
+    parser.add_argument(
+        "--limit-model-concurrency",
+        type=int,
+        default=5,
+        help="Maximum number of requests decoded together in a batch.",
+    )
     parser.add_argument("--stream-interval", type=int, default=1)
     parser.add_argument("--no-register", action="store_true")
     parser.add_argument("--load-8bit", action="store_true")
@@ -366,5 +349,7 @@ if __name__ == "__main__":
         args.load_8bit,
         args.load_4bit,
         args.device,
+        max_batch_size=args.limit_model_concurrency,
+        stream_interval=args.stream_interval,
     )
     uvicorn.run(app, host=args.host, port=args.port, log_level="info")
@@ -0,0 +1,145 @@
+import asyncio
+import queue
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+
+import torch
+
+
+def configure_cpu_threads(num_threads: int | None = None, num_interop_threads: int | None = None) -> None:
+    """Tune PyTorch CPU thread pools for batched inference.
+
+    Intra-op threads parallelize a single batched forward pass; inter-op threads
+    are rarely useful for a single model, so keeping them low avoids oversubscription
+    when several models share the host.
+
+    Args:
+        num_threads (Optional[int]): Threads used inside each operator. Unchanged if None.
+        num_interop_threads (Optional[int]): Threads used across operators. Unchanged if None.
+    """
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    if num_interop_threads:
+        try:
+            torch.set_num_interop_threads(num_interop_threads)
+        except RuntimeError:
+            # Can only be set once, before any inter-op parallel work has started
+            pass
+
+
+class DynamicBatcher:
+    """Dynamic batching inference server for a single model.
+
+    Callers submit one preprocessed tensor at a time. A background thread collects
+    up to `max_batch_size` requests or waits at most `max_wait_ms` after the first
+    one, runs a single batched forward pass in `torch.inference_mode`, and resolves
+    each caller's future with its own row of the output.
+
+    Requests with different tensor shapes are grouped and run as separate batches.
+    """
+
+    def __init__(
+        self,
+        model: Callable[[torch.Tensor], torch.Tensor],
+        device: str | torch.device = "cpu",
+        max_batch_size: int = 16,
+        max_wait_ms: float = 10.0,
+        name: str = "batcher",
+    ):
+        """Start the batching thread.
+
+        Args:
+            model (Callable): Model called with a batch tensor of shape (B, ...).
+            device (str | torch.device): Device the batch is moved to before the forward pass.
+            max_batch_size (int): Maximum number of requests in one forward pass.
+            max_wait_ms (float): Maximum time to wait for more requests after the first one.
+            name (str): Name of the background thread.
+        """
+        self.model = model
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue: queue.Queue[tuple[torch.Tensor, Future] | None] = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, tensor: torch.Tensor) -> Future:
+        """Queue a single preprocessed tensor (without batch dimension) for inference.
+
+        Returns:
+            Future: Resolved with the model output for this tensor, on CPU.
+        """
+        future: Future = Future()
+        self._queue.put((tensor, future))
+        return future
+
+    def infer(self, tensor: torch.Tensor) -> torch.Tensor:
+        """Blocking inference for a single tensor."""
+        return self.submit(tensor).result()
+
+    async def ainfer(self, tensor: torch.Tensor) -> torch.Tensor:
+        """Asynchronous inference for a single tensor."""
+        return await asyncio.wrap_future(self.submit(tensor))
+
+    def close(self) -> None:
+        """Stop the batching thread after pending requests are processed."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self) -> list[tuple[torch.Tensor, Future]] | None:
+        """Block for the first request, then gather more until the batch is full or the deadline passes."""
+        first = self._queue.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Process what we have, then stop
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run_batch(self, items: list[tuple[torch.Tensor, Future]]) -> None:
+        """Run one forward pass and resolve every future in the batch."""
+        # Drop requests whose caller has given up
+        items = [(tensor, future) for tensor, future in items if future.set_running_or_notify_cancel()]
+        if not items:
+            return
+
+        try:
+            batch = torch.stack([tensor for tensor, _ in items]).to(self.device)
+            with torch.inference_mode():
+                outputs = self.model(batch).cpu()
+        except Exception as e:
+            for _, future in items:
+                future.set_exception(e)
+            return
+
+        for (_, future), output in zip(items, outputs):
+            future.set_result(output)
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            # Tensors of different shapes cannot be stacked into one batch
+            groups: dict[tuple, list[tuple[torch.Tensor, Future]]] = {}
+            for item in batch:
+                groups.setdefault(tuple(item[0].shape), []).append(item)
+            for items in groups.values():
+                self._run_batch(items)
@@ -1,4 +1,3 @@
-import skimage.io
 import torch
 import torchvision
 import torchxrayvision as xrv
@@ -9,6 +8,10 @@ from langchain_core.callbacks import (
 from langchain_core.tools import BaseTool
 from pydantic import BaseModel, Field
 
+from .batching import DynamicBatcher, configure_cpu_threads
+from .cpu_backends import optimize_for_cpu
+from .image_cache import image_cache, load_grayscale
+
 
 class ChestXRayInput(BaseModel):
     """Input for chest X-ray analysis tools. Only supports JPG or PNG images."""
@@ -47,25 +50,66 @@ class ChestXRayClassifierTool(BaseTool):
     model: xrv.models.DenseNet = None
     device: str | None = "cuda" if torch.cuda.is_available() else "cpu"
     transform: torchvision.transforms.Compose = None
+    batcher: DynamicBatcher | None = None
 
     def __init__(
-        self, model_name: str = "densenet121-res224-all", device: str | None = "cuda"
+        self,
+        model_name: str = "densenet121-res224-all",
+        device: str | None = "cuda",
+        max_batch_size: int = 16,
+        max_wait_ms: float = 10.0,
+        num_threads: int | None = None,
+        backend: str = "torch",
+        cache_dir: str = "./model-weights",
     ):
+        """Initialize the classifier and its batching inference server.
+
+        Args:
+            model_name (str): torchxrayvision DenseNet weights to load.
+            device (Optional[str]): Device to run the model on.
+            max_batch_size (int): Maximum number of images classified in one forward pass.
+            max_wait_ms (float): Maximum time a request waits for others to join its batch.
+            num_threads (Optional[int]): CPU intra-op threads, only applied when running on CPU.
+            backend (str): CPU inference backend, "torch", "int8" or "onnx". Ignored on GPU.
+            cache_dir (str): Directory where the ONNX export is stored.
+        """
         super().__init__()
         self.model = xrv.models.DenseNet(weights=model_name)
         self.model.eval()
         self.device = (
             torch.device(device) if device and torch.cuda.is_available() else "cpu"
         )
+        if self.device == "cpu":
+            configure_cpu_threads(num_threads, num_interop_threads=1)
         self.model = self.model.to(self.device)
-        self.transform = torchvision.transforms.Compose([xrv.datasets.XRayCenterCrop()])
+        inference_model = self.model
+        if self.device == "cpu":
+            inference_model = optimize_for_cpu(
+                self.model,
+                backend,
+                example_input=torch.rand(1, 1, 224, 224) * 2048 - 1024,
+                onnx_path=f"{cache_dir}/onnx/xrv-densenet-{model_name}.onnx",
+            )
+        # Resize after cropping so every image has the same shape and can be batched
+        self.transform = torchvision.transforms.Compose(
+            [xrv.datasets.XRayCenterCrop(), xrv.datasets.XRayResizer(224)]
+        )
+        self.batcher = DynamicBatcher(
+            inference_model,
+            device=self.device,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            name="chest_xray_classifier_batcher",
+        )
 
     def _process_image(self, image_path: str) -> torch.Tensor:
         """
         Process the input chest X-ray image for model inference.
 
         This method loads the image, normalizes it, applies necessary transformations,
-        and prepares it as a torch.Tensor for model input.
+        and prepares it as a torch.Tensor for model input. The tensor has no batch
+        dimension; batching and device placement are handled by the batcher.
+        Decoded images and tensors are shared with other tools through the image cache.
 
         Args:
             image_path (str): The file path to the chest X-ray image.
@@ -77,19 +121,16 @@ class ChestXRayClassifierTool(BaseTool):
             FileNotFoundError: If the specified image file does not exist.
             ValueError: If the image cannot be properly loaded or processed.
         """
-        img = skimage.io.imread(image_path)
-        img = xrv.datasets.normalize(img, 255)
-
-        if len(img.shape) > 2:
-            img = img[:, :, 0]
-
-        img = img[None, :, :]
-        img = self.transform(img)
-        img = torch.from_numpy(img).unsqueeze(0)
 
-        img = img.to(self.device)
+        def preprocess() -> torch.Tensor:
+            img = xrv.datasets.normalize(load_grayscale(image_path), 255)
+            img = img[None, :, :]
+            img = self.transform(img)
+            return torch.from_numpy(img)
 
-        return img
+        return image_cache.get_or_compute(
+            image_path, "xrv:normalize255:center_crop:resize224", preprocess
+        )
 
     def _run(
         self,
@@ -111,24 +152,26 @@ class ChestXRayClassifierTool(BaseTool):
             Exception: If there's an error processing the image or during classification.
         """
         try:
-            img = self._process_image(image_path)
-
-            with torch.inference_mode():
-                preds = self.model(img).cpu()[0]
-
-            output = dict(zip(xrv.datasets.default_pathologies, preds.numpy()))
-            metadata = {
-                "image_path": image_path,
-                "analysis_status": "completed",
-                "note": "Probabilities range from 0 to 1, with higher values indicating higher likelihood of the condition.",
-            }
-            return output, metadata
+            preds = self.batcher.infer(self._process_image(image_path))
+            return self._format_output(image_path, preds)
         except Exception as e:
             return {"error": str(e)}, {
                 "image_path": image_path,
                 "analysis_status": "failed",
             }
 
+    def _format_output(
+        self, image_path: str, preds: torch.Tensor
+    ) -> tuple[dict[str, float], dict]:
+        """Map model outputs to pathology names and build the result metadata."""
+        output = dict(zip(xrv.datasets.default_pathologies, preds.numpy()))
+        metadata = {
+            "image_path": image_path,
+            "analysis_status": "completed",
+            "note": "Probabilities range from 0 to 1, with higher values indicating higher likelihood of the condition.",
+        }
+        return output, metadata
+
     async def _arun(
         self,
         image_path: str,
@@ -136,9 +179,8 @@ class ChestXRayClassifierTool(BaseTool):
     ) -> tuple[dict[str, float], dict]:
         """Asynchronously classify the chest X-ray image for multiple pathologies.
 
-        This method currently calls the synchronous version, as the model inference
-        is not inherently asynchronous. For true asynchronous behavior, consider
-        using a separate thread or process.
+        The image is submitted to the batching inference server and awaited without
+        blocking the event loop, so concurrent sessions share forward passes.
 
         Args:
             image_path (str): The path to the chest X-ray image file.
@@ -152,4 +194,11 @@ class ChestXRayClassifierTool(BaseTool):
         Raises:
             Exception: If there's an error processing the image or during classification.
         """
-        return self._run(image_path)
+        try:
+            preds = await self.batcher.ainfer(self._process_image(image_path))
+            return self._format_output(image_path, preds)
+        except Exception as e:
+            return {"error": str(e)}, {
+                "image_path": image_path,
+                "analysis_status": "failed",
+            }
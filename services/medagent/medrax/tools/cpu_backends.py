@@ -0,0 +1,176 @@
+import warnings
+from collections.abc import Callable, Sequence
+from pathlib import Path
+
+import numpy as np
+import torch
+
+CPU_BACKENDS = ("torch", "int8", "onnx")
+
+
+class OnnxModel:
+    """ONNX Runtime session with the calling convention of a PyTorch module.
+
+    Takes and returns CPU torch tensors so it can replace a model in the tools
+    and in `DynamicBatcher` without further changes.
+    """
+
+    def __init__(self, onnx_path: str | Path, num_threads: int | None = None):
+        """
+        Args:
+            onnx_path (str | Path): Exported ONNX model.
+            num_threads (Optional[int]): Intra-op threads, defaults to the PyTorch setting.
+        """
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError(
+                "The onnx CPU backend requires onnxruntime: pip install onnxruntime"
+            ) from e
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = num_threads or torch.get_num_threads()
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            str(onnx_path), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x: torch.Tensor) -> torch.Tensor:
+        inputs = {self.input_name: x.detach().cpu().numpy().astype(np.float32, copy=False)}
+        return torch.from_numpy(self.session.run(None, inputs)[0])
+
+
+def export_onnx(
+    model: torch.nn.Module,
+    example_input: torch.Tensor,
+    onnx_path: str | Path,
+    dynamic_batch: bool = True,
+    opset_version: int = 17,
+) -> Path:
+    """Export a model to ONNX once; an existing file at `onnx_path` is reused.
+
+    Args:
+        model (torch.nn.Module): Model in eval mode, on CPU.
+        example_input (torch.Tensor): Input used to trace the model.
+        onnx_path (str | Path): Destination file. Delete it to force a new export.
+        dynamic_batch (bool): Allow any batch size along the first dimension.
+        opset_version (int): ONNX opset to target.
+
+    Returns:
+        Path: Path of the exported model.
+    """
+    onnx_path = Path(onnx_path)
+    if onnx_path.exists():
+        return onnx_path
+
+    onnx_path.parent.mkdir(parents=True, exist_ok=True)
+    dynamic_axes = {"input": {0: "batch"}, "output": {0: "batch"}} if dynamic_batch else None
+    # Export to a temporary name so a crash never leaves a truncated model behind
+    tmp_path = onnx_path.with_suffix(".onnx.tmp")
+    with torch.no_grad(), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        torch.onnx.export(
+            model,
+            (example_input,),
+            str(tmp_path),
+            input_names=["input"],
+            output_names=["output"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset_version,
+        )
+    tmp_path.replace(onnx_path)
+    return onnx_path
+
+
+def quantize_int8(model: torch.nn.Module) -> torch.nn.Module:
+    """Dynamic int8 quantization of the linear layers of a model.
+
+    Weights are stored as int8 and activations are quantized on the fly, which
+    mostly speeds up transformer encoders and decoders. Convolutions are left in
+    fp32, so CNNs only gain on their classifier heads.
+    """
+    return torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
+def check_parity(
+    reference: Callable[[torch.Tensor], torch.Tensor],
+    candidate: Callable[[torch.Tensor], torch.Tensor],
+    inputs: Sequence[torch.Tensor],
+    atol: float = 1e-2,
+) -> dict[str, float | bool]:
+    """Compare the outputs of an optimized model against the fp32 PyTorch model.
+
+    Args:
+        reference (Callable): Original model.
+        candidate (Callable): Optimized model.
+        inputs (Sequence[torch.Tensor]): Model inputs to compare on.
+        atol (float): Maximum tolerated absolute difference of any output.
+
+    Returns:
+        Dict[str, float | bool]: Maximum and mean absolute difference, and whether it is within `atol`.
+    """
+    max_diff = 0.0
+    total_diff = 0.0
+    with torch.inference_mode():
+        for x in inputs:
+            diff = (reference(x).float() - candidate(x).float()).abs()
+            max_diff = max(max_diff, float(diff.max()))
+            total_diff += float(diff.mean())
+    return {
+        "max_abs_diff": max_diff,
+        "mean_abs_diff": total_diff / max(1, len(inputs)),
+        "passed": max_diff <= atol,
+    }
+
+
+def optimize_for_cpu(
+    model: torch.nn.Module,
+    backend: str,
+    example_input: torch.Tensor,
+    onnx_path: str | Path | None = None,
+    dynamic_batch: bool = True,
+    parity_atol: float | None = 1e-2,
+) -> Callable[[torch.Tensor], torch.Tensor]:
+    """Build an accelerated CPU version of a model.
+
+    When `parity_atol` is set, the optimized model is checked against the original on
+    `example_input` and the original is kept if the outputs differ by more than the
+    tolerance, so a bad export or quantization never silently changes predictions.
+
+    Args:
+        model (torch.nn.Module): fp32 model in eval mode, on CPU.
+        backend (str): One of "torch" (unchanged), "int8" or "onnx".
+        example_input (torch.Tensor): Representative input for export and the parity check.
+        onnx_path (Optional[str | Path]): Where the ONNX export is stored, required for "onnx".
+        dynamic_batch (bool): Export with a dynamic batch dimension.
+        parity_atol (Optional[float]): Tolerance of the parity check, None to skip it.
+
+    Returns:
+        Callable[[torch.Tensor], torch.Tensor]: Model to run inference with.
+    """
+    if backend not in CPU_BACKENDS:
+        raise ValueError(f"Unknown CPU backend {backend!r}, expected one of {CPU_BACKENDS}")
+    if backend == "torch":
+        return model
+
+    if backend == "int8":
+        optimized = quantize_int8(model)
+    else:
+        if onnx_path is None:
+            raise ValueError("onnx_path is required for the onnx backend")
+        optimized = OnnxModel(export_onnx(model, example_input, onnx_path, dynamic_batch))
+
+    if parity_atol is not None:
+        parity = check_parity(model, optimized, [example_input], atol=parity_atol)
+        if not parity["passed"]:
+            warnings.warn(
+                f"{backend} backend differs from PyTorch by {parity['max_abs_diff']:.4g} "
+                f"(tolerance {parity_atol}), falling back to PyTorch",
+                stacklevel=2,
+            )
+            return model
+    return optimized
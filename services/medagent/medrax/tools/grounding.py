@@ -14,6 +14,9 @@ from PIL import Image
 from pydantic import BaseModel, Field
 from transformers import AutoModelForCausalLM, AutoProcessor, BitsAndBytesConfig
 
+from .image_cache import load_rgb
+from .utils import PYPLOT_LOCK
+
 
 class XRayPhraseGroundingInput(BaseModel):
     """Input schema for the XRay Phrase Grounding Tool. Only supports JPG or PNG images."""
@@ -107,31 +110,32 @@ class XRayPhraseGroundingTool(BaseTool):
         phrase: str,
     ) -> str:
         """Create and save visualization of multiple bounding boxes on the image."""
-        plt.figure(figsize=(12, 12))
-        plt.imshow(image, cmap="gray")
-
-        for bbox in bboxes:
-            x1, y1, x2, y2 = bbox
-            width = x2 - x1
-            height = y2 - y1
-
-            plt.gca().add_patch(
-                plt.Rectangle(
-                    (x1 * image.width, y1 * image.height),
-                    width * image.width,
-                    height * image.height,
-                    fill=False,
-                    color="red",
-                    linewidth=2,
+        viz_path = self.temp_dir / f"grounding_{uuid.uuid4().hex[:8]}.png"
+        with PYPLOT_LOCK:
+            plt.figure(figsize=(12, 12))
+            plt.imshow(image, cmap="gray")
+
+            for bbox in bboxes:
+                x1, y1, x2, y2 = bbox
+                width = x2 - x1
+                height = y2 - y1
+
+                plt.gca().add_patch(
+                    plt.Rectangle(
+                        (x1 * image.width, y1 * image.height),
+                        width * image.width,
+                        height * image.height,
+                        fill=False,
+                        color="red",
+                        linewidth=2,
+                    )
                 )
-            )
 
-        plt.title(f"Located: {phrase}", pad=20)
-        plt.axis("off")
+            plt.title(f"Located: {phrase}", pad=20)
+            plt.axis("off")
 
-        viz_path = self.temp_dir / f"grounding_{uuid.uuid4().hex[:8]}.png"
-        plt.savefig(viz_path, bbox_inches="tight", dpi=150)
-        plt.close()
+            plt.savefig(viz_path, bbox_inches="tight", dpi=150)
+            plt.close()
 
         return str(viz_path)
 
@@ -154,9 +158,7 @@ class XRayPhraseGroundingTool(BaseTool):
             Tuple[Dict, Dict]: Output dictionary and metadata dictionary
         """
         try:
-            image = Image.open(image_path)
-            if image.mode != "RGB":
-                image = image.convert("RGB")
+            image = load_rgb(image_path)
 
             inputs = self.processor.format_and_preprocess_phrase_grounding_input(
                 frontal_image=image, phrase=phrase, return_tensors="pt"
@@ -0,0 +1,197 @@
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import skimage.io
+import torch
+from PIL import Image
+
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def _sizeof(value: Any) -> int:
+    """Approximate memory footprint of a cached artifact in bytes."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, torch.Tensor):
+        return value.element_size() * value.nelement()
+    if isinstance(value, Image.Image):
+        return value.width * value.height * len(value.getbands())
+    if isinstance(value, (tuple, list)):
+        return sum(_sizeof(item) for item in value)
+    if isinstance(value, dict):
+        return sum(_sizeof(item) for item in value.values())
+    return sys.getsizeof(value)
+
+
+def _freeze(value: Any) -> Any:
+    """Mark cached arrays read-only so a tool cannot corrupt another tool's input."""
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, (tuple, list)):
+        for item in value:
+            _freeze(item)
+    return value
+
+
+class ImageArtifactCache:
+    """Process-wide LRU cache of decoded images and model-ready tensors.
+
+    Entries are keyed by the SHA-256 of the file content plus a transform
+    signature describing how the artifact was derived, so the same X-ray is
+    decoded and preprocessed once no matter how many tools look at it, and a
+    file overwritten in place is never served stale.
+
+    The cache is bounded both by total approximate size in bytes and by entry
+    count. Concurrent requests for the same missing artifact are coalesced.
+    Cached values are shared and must be treated as read-only; tensors are
+    stored on CPU and callers move them to their device.
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024, max_entries: int = 256):
+        """
+        Args:
+            max_bytes (int): Maximum total size of cached artifacts.
+            max_entries (int): Maximum number of cached artifacts.
+        """
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+
+        self._entries: OrderedDict[tuple[str, str], tuple[Any, int]] = OrderedDict()
+        self._size = 0
+        self._digests: dict[str, tuple[int, int, str]] = {}
+        self._lock = threading.Lock()
+        self._inflight: dict[tuple[str, str], threading.Event] = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def file_digest(self, path: str | Path) -> str:
+        """Content hash of a file, memoized by path, size and modification time."""
+        path = str(path)
+        stat = os.stat(path)
+        with self._lock:
+            known = self._digests.get(path)
+        if known and known[:2] == (stat.st_size, stat.st_mtime_ns):
+            return known[2]
+
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(HASH_CHUNK_SIZE):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+
+        with self._lock:
+            self._digests[path] = (stat.st_size, stat.st_mtime_ns, digest)
+        return digest
+
+    def get_or_compute(
+        self, path: str | Path, signature: str, compute: Callable[[], Any]
+    ) -> Any:
+        """Return the artifact for (file content, signature), computing it on a miss.
+
+        Args:
+            path (str | Path): Image file the artifact is derived from.
+            signature (str): Stable description of the transform producing the artifact.
+            compute (Callable[[], Any]): Builds the artifact; only called on a miss.
+
+        Returns:
+            Any: The cached or newly computed artifact.
+        """
+        key = (self.file_digest(path), signature)
+
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+
+                waiter = self._inflight.get(key)
+                if waiter is None:
+                    # This thread computes the artifact; others wait for it
+                    event = threading.Event()
+                    self._inflight[key] = event
+                    self.misses += 1
+                    break
+            waiter.wait()
+
+        try:
+            value = _freeze(compute())
+            self._store(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def _store(self, key: tuple[str, str], value: Any) -> None:
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous[1]
+            self._entries[key] = (value, size)
+            self._size += size
+
+            while self._entries and (
+                self._size > self.max_bytes or len(self._entries) > self.max_entries
+            ):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+
+    def clear(self) -> None:
+        """Drop every cached artifact."""
+        with self._lock:
+            self._entries.clear()
+            self._digests.clear()
+            self._size = 0
+
+    def stats(self) -> dict[str, int]:
+        """Current cache occupancy and hit/miss counters."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# Shared by every tool in the process
+image_cache = ImageArtifactCache(
+    max_bytes=int(os.getenv("MEDRAX_IMAGE_CACHE_MB", "512")) * 1024 * 1024,
+    max_entries=int(os.getenv("MEDRAX_IMAGE_CACHE_ENTRIES", "256")),
+)
+
+
+def load_grayscale(image_path: str | Path) -> np.ndarray:
+    """Decode an image with scikit-image and keep only its first channel."""
+
+    def decode() -> np.ndarray:
+        img = skimage.io.imread(image_path)
+        if len(img.shape) > 2:
+            img = img[:, :, 0]
+        return img
+
+    return image_cache.get_or_compute(image_path, "skimage:gray", decode)
+
+
+def load_rgb(image_path: str | Path) -> Image.Image:
+    """Decode an image with PIL and convert it to RGB."""
+
+    def decode() -> Image.Image:
+        with Image.open(image_path) as image:
+            return image.convert("RGB")
+
+    return image_cache.get_or_compute(image_path, "pil:rgb", decode)
@@ -1,3 +1,4 @@
+import hashlib
 from typing import Any
 
 import torch
@@ -6,7 +7,6 @@ from langchain_core.callbacks import (
     CallbackManagerForToolRun,
 )
 from langchain_core.tools import BaseTool
-from PIL import Image
 from pydantic import BaseModel, Field
 
 from medrax.llava.constants import (
@@ -19,6 +19,8 @@ from medrax.llava.conversation import conv_templates
 from medrax.llava.mm_utils import process_images, tokenizer_image_token
 from medrax.llava.model.builder import load_pretrained_model
 
+from .image_cache import image_cache, load_rgb
+
 
 class LlavaMedInput(BaseModel):
     """Input for the LLaVA-Med Visual QA tool. Only supports JPG or PNG images."""
@@ -82,7 +84,7 @@ class LlavaMedTool(BaseTool):
 
     def _process_input(
         self, question: str, image_path: str | None = None
-    ) -> tuple[torch.Tensor, torch.Tensor | None]:
+    ) -> tuple[torch.Tensor, torch.Tensor | None, list[str] | None]:
         if self.model.config.mm_use_im_start_end:
             question = (
                 DEFAULT_IM_START_TOKEN
@@ -108,14 +110,26 @@ class LlavaMedTool(BaseTool):
         )
 
         image_tensor = None
+        image_keys = None
         if image_path:
-            image = Image.open(image_path)
-            image_tensor = process_images(
-                [image], self.image_processor, self.model.config
-            )[0]
+
+            def preprocess() -> torch.Tensor:
+                return process_images(
+                    [load_rgb(image_path)], self.image_processor, self.model.config
+                )[0]
+
+            processor_config = hashlib.sha1(
+                self.image_processor.to_json_string().encode(), usedforsecurity=False
+            ).hexdigest()[:12]
+            aspect_ratio = getattr(self.model.config, "image_aspect_ratio", None)
+            image_tensor = image_cache.get_or_compute(
+                image_path, f"llava:{processor_config}:{aspect_ratio}", preprocess
+            )
             image_tensor = image_tensor.unsqueeze(0).half().cuda()
+            # Lets the model reuse the projected features of an image it has seen
+            image_keys = [image_cache.file_digest(image_path)]
 
-        return input_ids, image_tensor
+        return input_ids, image_tensor, image_keys
 
     def _run(
         self,
@@ -137,7 +151,9 @@ class LlavaMedTool(BaseTool):
             Exception: If there's an error processing the input or generating the answer.
         """
         try:
-            input_ids, image_tensor = self._process_input(question, image_path)
+            input_ids, image_tensor, image_keys = self._process_input(
+                question, image_path
+            )
             input_ids = input_ids.to(device=self.model.device)
             image_tensor = image_tensor.to(
                 device=self.model.device, dtype=self.model.dtype
@@ -147,6 +163,7 @@ class LlavaMedTool(BaseTool):
                 output_ids = self.model.generate(
                     input_ids,
                     images=image_tensor,
+                    image_keys=image_keys,
                     do_sample=False,
                     temperature=0.2,
                     max_new_tokens=500,
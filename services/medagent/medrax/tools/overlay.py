@@ -0,0 +1,170 @@
+import os
+from collections.abc import Sequence
+from pathlib import Path
+
+import cv2
+import numpy as np
+from matplotlib import colormaps
+
+LEGEND_SWATCH = 24
+LEGEND_PADDING = 12
+
+
+def build_overlay_lut(
+    colors: np.ndarray, alpha: float = 0.3
+) -> tuple[np.ndarray, np.ndarray]:
+    """Precompute the blended color of every combination of overlapping masks.
+
+    A pixel covered by masks k1 < k2 < ... is blended like stacked transparent
+    layers drawn in label order. With the labels encoded as a bitmask, the result
+    for every pixel is `background * transmission[code] + premultiplied[code]`.
+
+    Args:
+        colors (np.ndarray): (K, 3) float RGB colors in [0, 1], one per label.
+        alpha (float): Opacity of each mask layer.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Premultiplied colors (2**K, 3) and
+            remaining background transmission (2**K,), both float32.
+    """
+    num_labels = len(colors)
+    codes = np.arange(2**num_labels)
+    premultiplied = np.zeros((len(codes), 3), dtype=np.float32)
+    transmission = np.ones(len(codes), dtype=np.float32)
+    for k in range(num_labels):
+        covered = (codes >> k) & 1 == 1
+        premultiplied[covered] = premultiplied[covered] * (1 - alpha) + colors[k] * alpha
+        transmission[covered] *= 1 - alpha
+    return premultiplied, transmission
+
+
+class SegmentationOverlayRenderer:
+    """Thread-safe renderer of segmentation masks over a grayscale image.
+
+    Masks are packed into one bitmask label image at model resolution, scaled to
+    the original image with nearest-neighbour interpolation and colored with a
+    precomputed lookup table, so the cost is a few array operations regardless of
+    the number of organs. The PNG is written at the native image resolution.
+    Renderers hold no mutable state and can be shared between threads.
+    """
+
+    def __init__(self, labels: Sequence[str], alpha: float = 0.3, colormap: str = "rainbow"):
+        """
+        Args:
+            labels (Sequence[str]): Label names, in model channel order.
+            alpha (float): Opacity of each mask.
+            colormap (str): Matplotlib colormap used to assign one color per label.
+        """
+        self.labels = list(labels)
+        self.colors = colormaps[colormap](np.linspace(0, 1, len(self.labels)))[:, :3]
+        self.premultiplied, self.transmission = build_overlay_lut(self.colors, alpha)
+
+    def render(
+        self,
+        image: np.ndarray,
+        masks: np.ndarray,
+        label_indices: Sequence[int],
+        legend: bool = True,
+    ) -> np.ndarray:
+        """Composite masks over an image.
+
+        The masks cover the center square crop of the image, as produced by
+        `xrv.datasets.XRayCenterCrop` followed by a resize.
+
+        Args:
+            image (np.ndarray): (H, W) grayscale image, any numeric dtype.
+            masks (np.ndarray): (K, h, w) boolean masks at model resolution.
+            label_indices (Sequence[int]): Labels to draw.
+            legend (bool): Append a legend of the drawn labels that are present.
+
+        Returns:
+            np.ndarray: (H, W', 3) uint8 RGB image.
+        """
+        gray = image.astype(np.float32)
+        low, high = float(gray.min()), float(gray.max())
+        gray = (gray - low) / (high - low) if high > low else np.zeros_like(gray)
+
+        selected = np.zeros(len(self.labels), dtype=bool)
+        selected[list(label_indices)] = True
+        present = selected & masks.reshape(len(masks), -1).any(axis=1)
+        weights = (1 << np.arange(len(self.labels), dtype=np.uint16)) * present
+        codes = np.tensordot(weights, masks.astype(np.uint16), axes=1).astype(np.uint16)
+
+        # Scale the label image to the center crop of the original image
+        height, width = gray.shape
+        crop = min(height, width)
+        top, left = (height - crop) // 2, (width - crop) // 2
+        full_codes = np.zeros((height, width), dtype=np.uint16)
+        full_codes[top : top + crop, left : left + crop] = cv2.resize(
+            codes, (crop, crop), interpolation=cv2.INTER_NEAREST
+        )
+
+        rgb = (
+            gray[..., None] * self.transmission[full_codes][..., None]
+            + self.premultiplied[full_codes]
+        )
+        rgb = (np.clip(rgb, 0, 1) * 255).astype(np.uint8)
+
+        if legend and present.any():
+            panel = self._legend(np.flatnonzero(present), height)
+            if len(panel) > height:
+                # Extend the image with white rows rather than cropping the legend
+                rgb = np.pad(rgb, ((0, len(panel) - height), (0, 0), (0, 0)), constant_values=255)
+            rgb = np.concatenate([rgb, panel], axis=1)
+        return rgb
+
+    def _legend(self, label_indices: np.ndarray, height: int) -> np.ndarray:
+        """Legend panel with one color swatch and name per label, sized for the image height."""
+        scale = max(1.0, height / 1024)
+        swatch = round(LEGEND_SWATCH * scale)
+        padding = round(LEGEND_PADDING * scale)
+        font_scale, thickness = 0.6 * scale, max(1, round(scale))
+
+        text_width = max(
+            cv2.getTextSize(self.labels[i], cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)[0][0]
+            for i in label_indices
+        )
+        row = swatch + padding
+        panel = np.full(
+            (
+                max(height, padding + row * len(label_indices)),
+                swatch + text_width + 3 * padding,
+                3,
+            ),
+            255,
+            dtype=np.uint8,
+        )
+        for n, i in enumerate(label_indices):
+            y = padding + n * row
+            color = tuple(int(c) for c in (self.colors[i] * 255).astype(np.uint8))
+            cv2.rectangle(
+                panel, (padding, y), (padding + swatch, y + swatch), color, thickness=-1
+            )
+            cv2.putText(
+                panel,
+                self.labels[i],
+                (2 * padding + swatch, y + swatch - round(6 * scale)),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                font_scale,
+                (0, 0, 0),
+                thickness,
+                cv2.LINE_AA,
+            )
+        return panel
+
+    def save(self, rgb: np.ndarray, path: str | Path) -> str:
+        """Encode an RGB image as PNG, writing it atomically.
+
+        Returns:
+            str: Path of the written file.
+        """
+        path = Path(path)
+        ok, encoded = cv2.imencode(
+            ".png", cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_PNG_COMPRESSION, 1]
+        )
+        if not ok:
+            raise ValueError(f"Could not encode overlay image {path}")
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        tmp_path.write_bytes(encoded.tobytes())
+        os.replace(tmp_path, path)
+        return str(path)
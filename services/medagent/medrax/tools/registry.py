@@ -0,0 +1,235 @@
+import gc
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from typing import Any
+
+import torch
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForToolRun,
+    CallbackManagerForToolRun,
+)
+from langchain_core.tools import BaseTool
+
+from .batching import DynamicBatcher
+
+
+def estimate_tool_memory(tool: BaseTool) -> int:
+    """Approximate bytes held by the torch modules of a tool (parameters and buffers)."""
+    seen: set[int] = set()
+    total = 0
+
+    def visit(value: Any) -> None:
+        nonlocal total
+        if id(value) in seen:
+            return
+        seen.add(id(value))
+        if isinstance(value, torch.nn.Module):
+            for tensor in (*value.parameters(), *value.buffers()):
+                total += tensor.numel() * tensor.element_size()
+        elif isinstance(getattr(value, "components", None), dict):
+            # diffusers pipelines expose their modules through `components`
+            for component in value.components.values():
+                visit(component)
+
+    for value in vars(tool).values():
+        visit(value)
+    return total
+
+
+def release_tool(tool: BaseTool) -> None:
+    """Stop background workers owned by a tool so it can be garbage collected."""
+    for value in vars(tool).values():
+        if isinstance(value, DynamicBatcher):
+            value.close()
+        elif isinstance(value, Executor):
+            value.shutdown(wait=False)
+
+
+class ModelRegistry:
+    """LRU registry of tool instances with a memory budget.
+
+    Tools are built on first use from registered factories. When the estimated
+    memory of loaded tools exceeds the budget, the least recently used tools that
+    are not currently running are unloaded. Tools can also be preloaded with
+    `warm_up` and unloaded after a period of inactivity with `unload_idle`.
+    """
+
+    def __init__(self, memory_budget_bytes: int | None = None):
+        """
+        Args:
+            memory_budget_bytes (Optional[int]): Maximum estimated memory of loaded tools.
+                None means unlimited.
+        """
+        self.memory_budget_bytes = memory_budget_bytes
+
+        self._factories: dict[str, Callable[[], BaseTool]] = {}
+        self._loaded: OrderedDict[str, BaseTool] = OrderedDict()
+        self._sizes: dict[str, int] = {}
+        self._last_used: dict[str, float] = {}
+        self._in_use: dict[str, int] = {}
+        self._lock = threading.RLock()
+        self._load_locks: dict[str, threading.Lock] = {}
+
+    def register(self, key: str, factory: Callable[[], BaseTool]) -> None:
+        """Register a factory building the tool for `key`."""
+        with self._lock:
+            self._factories[key] = factory
+            self._load_locks[key] = threading.Lock()
+
+    @property
+    def loaded(self) -> list[str]:
+        """Keys of currently loaded tools, least recently used first."""
+        with self._lock:
+            return list(self._loaded)
+
+    @property
+    def memory_used(self) -> int:
+        """Estimated bytes held by loaded tools."""
+        with self._lock:
+            return sum(self._sizes.get(key, 0) for key in self._loaded)
+
+    def _load(self, key: str) -> BaseTool:
+        # Loading can take minutes, so only concurrent loads of the same tool wait for each other
+        with self._load_locks[key]:
+            with self._lock:
+                if key in self._loaded:
+                    return self._loaded[key]
+
+            # Make room using the size seen at a previous load, if any
+            self._evict(incoming=self._sizes.get(key, 0))
+
+            print(f"Loading tool: {key}")
+            start = time.perf_counter()
+            tool = self._factories[key]()
+            size = estimate_tool_memory(tool)
+            print(f"Loaded tool: {key} ({size / 2**20:.0f} MB in {time.perf_counter() - start:.1f}s)")
+
+            with self._lock:
+                self._loaded[key] = tool
+                self._sizes[key] = size
+            self._evict()
+            return tool
+
+    @contextmanager
+    def use(self, key: str) -> Iterator[BaseTool]:
+        """Borrow a tool, loading it if needed. It cannot be unloaded while borrowed."""
+        with self._lock:
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+        try:
+            with self._lock:
+                tool = self._loaded.get(key)
+            if tool is None:
+                tool = self._load(key)
+            with self._lock:
+                self._loaded.move_to_end(key)
+                self._last_used[key] = time.monotonic()
+            yield tool
+        finally:
+            with self._lock:
+                self._in_use[key] -= 1
+                self._last_used[key] = time.monotonic()
+
+    def get(self, key: str) -> BaseTool:
+        """Get a tool, loading it if needed."""
+        with self.use(key) as tool:
+            return tool
+
+    def warm_up(self, keys: Iterable[str] | None = None) -> None:
+        """Preload tools so the first request does not pay the load time.
+
+        Args:
+            keys (Optional[Iterable[str]]): Tools to load, all registered tools if None.
+                Tools loaded later take precedence if they do not all fit in the budget.
+        """
+        for key in keys if keys is not None else list(self._factories):
+            if key in self._factories:
+                self.get(key)
+
+    def unload(self, key: str) -> bool:
+        """Unload a tool if it is loaded and not in use. Returns True if it was unloaded."""
+        with self._lock:
+            if key not in self._loaded or self._in_use.get(key, 0) > 0:
+                return False
+            tool = self._loaded.pop(key)
+
+        release_tool(tool)
+        del tool
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        print(f"Unloaded tool: {key}")
+        return True
+
+    def unload_idle(self, max_idle_seconds: float) -> list[str]:
+        """Unload tools not used for at least `max_idle_seconds`. Returns the unloaded keys."""
+        now = time.monotonic()
+        with self._lock:
+            idle = [
+                key
+                for key in self._loaded
+                if now - self._last_used.get(key, now) >= max_idle_seconds
+            ]
+        return [key for key in idle if self.unload(key)]
+
+    def _evict(self, incoming: int = 0) -> None:
+        """Unload least recently used idle tools until loaded tools plus `incoming` fit the budget."""
+        if self.memory_budget_bytes is None:
+            return
+
+        while True:
+            with self._lock:
+                if self.memory_used + incoming <= self.memory_budget_bytes:
+                    return
+                candidates = [key for key in self._loaded if self._in_use.get(key, 0) == 0]
+            if not candidates or not self.unload(candidates[0]):
+                return
+
+
+class LazyTool(BaseTool):
+    """Proxy tool that exposes a tool's schema without loading its models.
+
+    The wrapped tool is built by the registry on first invocation and may be
+    unloaded again when the registry needs memory.
+    """
+
+    registry: Any = None
+    tool_key: str = ""
+
+    def __init__(self, registry: ModelRegistry, tool_key: str, tool_class: type[BaseTool]):
+        """
+        Args:
+            registry (ModelRegistry): Registry owning the real tool instance.
+            tool_key (str): Key the tool factory is registered under.
+            tool_class (Type[BaseTool]): Class of the real tool, used for its name and schema.
+        """
+        fields = tool_class.model_fields
+        super().__init__(
+            name=fields["name"].default,
+            description=fields["description"].default,
+            args_schema=fields["args_schema"].default,
+            return_direct=fields["return_direct"].default,
+            registry=registry,
+            tool_key=tool_key,
+        )
+
+    def _run(
+        self,
+        *args: Any,
+        run_manager: CallbackManagerForToolRun | None = None,
+        **kwargs: Any,
+    ) -> Any:
+        with self.registry.use(self.tool_key) as tool:
+            return tool._run(*args, **kwargs)
+
+    async def _arun(
+        self,
+        *args: Any,
+        run_manager: AsyncCallbackManagerForToolRun | None = None,
+        **kwargs: Any,
+    ) -> Any:
+        with self.registry.use(self.tool_key) as tool:
+            return await tool._arun(*args, **kwargs)
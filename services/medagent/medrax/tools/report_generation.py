@@ -1,3 +1,7 @@
+import asyncio
+import hashlib
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Any
 
 import torch
@@ -6,7 +10,6 @@ from langchain_core.callbacks import (
     CallbackManagerForToolRun,
 )
 from langchain_core.tools import BaseTool
-from PIL import Image
 from pydantic import BaseModel, Field
 from transformers import (
     BertTokenizer,
@@ -14,6 +17,10 @@ from transformers import (
     VisionEncoderDecoderModel,
     ViTImageProcessor,
 )
+from transformers.modeling_outputs import BaseModelOutput
+
+from .cpu_backends import optimize_for_cpu
+from .image_cache import image_cache, load_rgb
 
 
 class ChestXRayInput(BaseModel):
@@ -25,6 +32,17 @@ class ChestXRayInput(BaseModel):
     )
 
 
+class _EncoderHiddenStates(torch.nn.Module):
+    """Image encoder of a Vision-Encoder-Decoder model returning only its last hidden state."""
+
+    def __init__(self, encoder: torch.nn.Module):
+        super().__init__()
+        self.encoder = encoder
+
+    def forward(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        return self.encoder(pixel_values=pixel_values).last_hidden_state
+
+
 class ChestXRayReportGeneratorTool(BaseTool):
     """Tool that generates comprehensive chest X-ray reports with both findings and impressions.
 
@@ -53,10 +71,35 @@ class ChestXRayReportGeneratorTool(BaseTool):
     impression_tokenizer: BertTokenizer = None
     findings_processor: ViTImageProcessor = None
     impression_processor: ViTImageProcessor = None
+    findings_encoder: Any = None
+    impression_encoder: Any = None
     generation_args: dict[str, Any] = None
+    concurrent_sections: bool = True
+    executor: ThreadPoolExecutor | None = None
+
+    def __init__(
+        self,
+        cache_dir: str = "./model-weights",
+        device: str | None = "cuda",
+        generation_args: dict[str, Any] | None = None,
+        concurrent_sections: bool = True,
+        backend: str = "torch",
+        parity_atol: float | None = 0.1,
+    ):
+        """Initialize the ChestXRayReportGeneratorTool with both findings and impression models.
 
-    def __init__(self, cache_dir: str = "./model-weights", device: str | None = "cuda"):
-        """Initialize the ChestXRayReportGeneratorTool with both findings and impression models."""
+        Args:
+            cache_dir (str): Directory where model weights are cached.
+            device (Optional[str]): Device to run the models on.
+            generation_args (Optional[Dict[str, Any]]): Overrides for the default generation
+                settings, e.g. num_beams, max_new_tokens, early_stopping or max_time.
+            concurrent_sections (bool): Generate findings and impression at the same time
+                instead of one after the other.
+            backend (str): CPU backend for the image encoders, "torch", "int8" or "onnx".
+                Decoders always run in PyTorch. Ignored on GPU.
+            parity_atol (Optional[float]): Maximum difference of encoder hidden states tolerated
+                before falling back to PyTorch, None to skip the check.
+        """
         super().__init__()
         self.device = (
             torch.device(device) if device and torch.cuda.is_available() else "cpu"
@@ -88,14 +131,49 @@ class ChestXRayReportGeneratorTool(BaseTool):
         self.findings_model = self.findings_model.to(self.device)
         self.impression_model = self.impression_model.to(self.device)
 
-        # Default generation arguments
+        if self.device == "cpu" and backend != "torch":
+            self.findings_encoder = self._optimize_encoder(
+                self.findings_model, "findings", backend, cache_dir, parity_atol
+            )
+            self.impression_encoder = self._optimize_encoder(
+                self.impression_model, "impression", backend, cache_dir, parity_atol
+            )
+
+        # Default generation arguments. Greedy decoding with the KV cache stops as soon
+        # as EOS is produced; early_stopping also ends beam search once enough beams finish.
         self.generation_args = {
             "num_return_sequences": 1,
             "max_length": 128,
             "use_cache": True,
-            "beam_width": 2,
+            "num_beams": 1,
+            "early_stopping": True,
+            **(generation_args or {}),
         }
 
+        # One worker per report section
+        self.concurrent_sections = concurrent_sections
+        self.executor = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="report_section"
+        )
+
+    @staticmethod
+    def _optimize_encoder(
+        model: VisionEncoderDecoderModel,
+        section: str,
+        backend: str,
+        cache_dir: str,
+        parity_atol: float | None,
+    ):
+        """Build an accelerated CPU version of a model's image encoder."""
+        image_size = model.config.encoder.image_size
+        return optimize_for_cpu(
+            _EncoderHiddenStates(model.encoder).eval(),
+            backend,
+            example_input=torch.randn(1, 3, image_size, image_size),
+            onnx_path=f"{cache_dir}/onnx/chexpert-mimic-cxr-{section}-encoder.onnx",
+            parity_atol=parity_atol,
+        )
+
     def _process_image(
         self,
         image_path: str,
@@ -104,6 +182,9 @@ class ChestXRayReportGeneratorTool(BaseTool):
     ) -> torch.Tensor:
         """Process the input image for a specific model.
 
+        The image is decoded once and the processed tensor is cached by processor
+        configuration, so models sharing a preprocessing setup reuse the same tensor.
+
         Args:
             image_path (str): Path to the input image.
             processor: Image processor for the specific model.
@@ -112,29 +193,36 @@ class ChestXRayReportGeneratorTool(BaseTool):
         Returns:
             torch.Tensor: Processed image tensor ready for model input.
         """
-        image = Image.open(image_path).convert("RGB")
-        pixel_values = processor(image, return_tensors="pt").pixel_values
-
         expected_size = model.config.encoder.image_size
-        actual_size = pixel_values.shape[-1]
 
-        if expected_size != actual_size:
-            pixel_values = torch.nn.functional.interpolate(
-                pixel_values,
-                size=(expected_size, expected_size),
-                mode="bilinear",
-                align_corners=False,
-            )
+        def preprocess() -> torch.Tensor:
+            pixel_values = processor(load_rgb(image_path), return_tensors="pt").pixel_values
+            actual_size = pixel_values.shape[-1]
 
-        pixel_values = pixel_values.to(self.device)
+            if expected_size != actual_size:
+                pixel_values = torch.nn.functional.interpolate(
+                    pixel_values,
+                    size=(expected_size, expected_size),
+                    mode="bilinear",
+                    align_corners=False,
+                )
+            return pixel_values
+
+        processor_config = hashlib.sha1(
+            processor.to_json_string().encode(), usedforsecurity=False
+        ).hexdigest()[:12]
+        pixel_values = image_cache.get_or_compute(
+            image_path, f"vit:{processor_config}:{expected_size}", preprocess
+        )
 
-        return pixel_values
+        return pixel_values.to(self.device)
 
     def _generate_report_section(
         self,
         pixel_values: torch.Tensor,
         model: VisionEncoderDecoderModel,
         tokenizer: BertTokenizer,
+        encoder=None,
     ) -> str:
         """Generate a report section using the specified model.
 
@@ -142,6 +230,7 @@ class ChestXRayReportGeneratorTool(BaseTool):
             pixel_values: Processed image tensor.
             model: The model to use for generation.
             tokenizer: The tokenizer for the model.
+            encoder: Optional accelerated encoder replacing the model's own.
 
         Returns:
             str: Generated text for the report section.
@@ -156,12 +245,93 @@ class ChestXRayReportGeneratorTool(BaseTool):
             }
         )
 
-        generated_ids = model.generate(
-            pixel_values, generation_config=generation_config
-        )
+        if encoder is not None:
+            encoder_outputs = BaseModelOutput(last_hidden_state=encoder(pixel_values))
+            generated_ids = model.generate(
+                encoder_outputs=encoder_outputs, generation_config=generation_config
+            )
+        else:
+            generated_ids = model.generate(
+                pixel_values, generation_config=generation_config
+            )
 
         return tokenizer.batch_decode(generated_ids, skip_special_tokens=True)[0]
 
+    def _generate_section(self, image_path: str, section: str) -> str:
+        """Preprocess the image and generate one report section ("findings" or "impression")."""
+        model = getattr(self, f"{section}_model")
+        pixel_values = self._process_image(
+            image_path, getattr(self, f"{section}_processor"), model
+        )
+        # inference_mode is thread-local, so it is entered in the worker thread
+        with torch.inference_mode():
+            return self._generate_report_section(
+                pixel_values,
+                model,
+                getattr(self, f"{section}_tokenizer"),
+                getattr(self, f"{section}_encoder"),
+            )
+
+    def _submit_sections(self, image_path: str) -> dict[str, Future]:
+        """Start generating both sections, concurrently when enabled."""
+        if self.concurrent_sections:
+            return {
+                section: self.executor.submit(
+                    self._generate_section, image_path, section
+                )
+                for section in ("findings", "impression")
+            }
+
+        # Sequential mode: one worker generates findings, then impression
+        futures = {"findings": Future(), "impression": Future()}
+
+        def generate_in_order() -> None:
+            for section, future in futures.items():
+                if not future.set_running_or_notify_cancel():
+                    return
+                try:
+                    future.set_result(self._generate_section(image_path, section))
+                except Exception as e:
+                    future.set_exception(e)
+
+        self.executor.submit(generate_in_order)
+        return futures
+
+    @staticmethod
+    def _format_report(findings_text: str, impression_text: str) -> str:
+        return (
+            "CHEST X-RAY REPORT\n\n"
+            f"FINDINGS:\n{findings_text}\n\n"
+            f"IMPRESSION:\n{impression_text}"
+        )
+
+    def _completed_metadata(self, image_path: str) -> dict:
+        return {
+            "image_path": image_path,
+            "analysis_status": "completed",
+            "sections_generated": ["findings", "impression"],
+        }
+
+    def stream_report(self, image_path: str) -> Iterator[tuple[str, str]]:
+        """Yield report sections as they become available.
+
+        Both sections start generating immediately; findings are yielded as soon as
+        they are ready, without waiting for the impression.
+
+        Args:
+            image_path (str): The path to the chest X-ray image file.
+
+        Yields:
+            Tuple[str, str]: ("findings", text) followed by ("impression", text).
+        """
+        futures = self._submit_sections(image_path)
+        try:
+            for section in ("findings", "impression"):
+                yield section, futures[section].result()
+        finally:
+            for future in futures.values():
+                future.cancel()
+
     def _run(
         self,
         image_path: str,
@@ -177,37 +347,9 @@ class ChestXRayReportGeneratorTool(BaseTool):
             Tuple[str, Dict]: A tuple containing the complete report and metadata.
         """
         try:
-            # Process image for both models
-            findings_pixels = self._process_image(
-                image_path, self.findings_processor, self.findings_model
-            )
-            impression_pixels = self._process_image(
-                image_path, self.impression_processor, self.impression_model
-            )
-
-            # Generate both sections
-            with torch.inference_mode():
-                findings_text = self._generate_report_section(
-                    findings_pixels, self.findings_model, self.findings_tokenizer
-                )
-                impression_text = self._generate_report_section(
-                    impression_pixels, self.impression_model, self.impression_tokenizer
-                )
-
-            # Combine into formatted report
-            report = (
-                "CHEST X-RAY REPORT\n\n"
-                f"FINDINGS:\n{findings_text}\n\n"
-                f"IMPRESSION:\n{impression_text}"
-            )
-
-            metadata = {
-                "image_path": image_path,
-                "analysis_status": "completed",
-                "sections_generated": ["findings", "impression"],
-            }
-
-            return report, metadata
+            sections = dict(self.stream_report(image_path))
+            report = self._format_report(sections["findings"], sections["impression"])
+            return report, self._completed_metadata(image_path)
 
         except Exception as e:
             return f"Error generating report: {e!s}", {
@@ -221,5 +363,19 @@ class ChestXRayReportGeneratorTool(BaseTool):
         image_path: str,
         run_manager: AsyncCallbackManagerForToolRun | None = None,
     ) -> tuple[str, dict]:
-        """Asynchronously generate a comprehensive chest X-ray report."""
-        return self._run(image_path)
+        """Asynchronously generate a comprehensive chest X-ray report without blocking the event loop."""
+        try:
+            futures = self._submit_sections(image_path)
+            findings_text, impression_text = await asyncio.gather(
+                asyncio.wrap_future(futures["findings"]),
+                asyncio.wrap_future(futures["impression"]),
+            )
+            report = self._format_report(findings_text, impression_text)
+            return report, self._completed_metadata(image_path)
+
+        except Exception as e:
+            return f"Error generating report: {e!s}", {
+                "image_path": image_path,
+                "analysis_status": "failed",
+                "error": str(e),
+            }
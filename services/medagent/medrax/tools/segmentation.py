@@ -1,13 +1,10 @@
 import traceback
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any
 
-import matplotlib.pyplot as plt
 import numpy as np
-import skimage.io
-import skimage.measure
-import skimage.transform
 import torch
 import torchvision
 import torchxrayvision as xrv
@@ -18,6 +15,10 @@ from langchain_core.callbacks import (
 from langchain_core.tools import BaseTool
 from pydantic import BaseModel, Field
 
+from .cpu_backends import optimize_for_cpu
+from .image_cache import image_cache, load_grayscale
+from .overlay import SegmentationOverlayRenderer
+
 
 class ChestXRaySegmentationInput(BaseModel):
     """Input schema for the Chest X-ray Segmentation Tool."""
@@ -69,6 +70,92 @@ class OrganMetrics(BaseModel):
     )
 
 
+def _nearest_blocks(src_size: int, dst_size: int) -> tuple[np.ndarray, np.ndarray]:
+    """Destination ranges covered by each source index under nearest-neighbour resizing.
+
+    Uses the pixel-center mapping of `skimage.transform.resize(order=0)` and
+    `interpolate(mode="nearest-exact")`, under which every source pixel maps to a
+    contiguous, possibly empty, block of destination pixels.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Start (inclusive) and end (exclusive) per source index.
+    """
+    src = np.minimum(
+        ((np.arange(dst_size) + 0.5) * src_size / dst_size).astype(np.int64), src_size - 1
+    )
+    indices = np.arange(src_size)
+    return np.searchsorted(src, indices, "left"), np.searchsorted(src, indices, "right")
+
+
+def region_statistics(masks: np.ndarray, image: np.ndarray) -> dict[str, np.ndarray]:
+    """Area, centroid, bounding box and intensity statistics of masks, all at once.
+
+    The masks are defined on the center square crop of `image`, resized to the model
+    resolution. Statistics are those of the masks scaled back to the image with
+    nearest-neighbour interpolation. Because each mask pixel covers a rectangular
+    block of image pixels, they are computed exactly from per-block weights and
+    intensity sums, without materializing full-resolution masks.
+
+    Args:
+        masks (np.ndarray): (K, h, h) boolean masks.
+        image (np.ndarray): (H, W) grayscale image.
+
+    Returns:
+        Dict[str, np.ndarray]: "area" (K,), "centroid" (K, 2) as (y, x), "bbox" (K, 4) as
+            (min_y, min_x, max_y, max_x) with exclusive maxima, "mean_intensity" (K,)
+            and "std_intensity" (K,). Entries of empty masks are zero.
+    """
+    height, width = image.shape
+    crop = min(height, width)
+    top, left = (height - crop) // 2, (width - crop) // 2
+
+    starts, ends = _nearest_blocks(masks.shape[-1], crop)
+    # Source pixels dropped when downsampling do not appear in the resized mask
+    used = np.flatnonzero(ends > starts)
+    starts, ends = starts[used], ends[used]
+    counts = (ends - starts).astype(np.float64)
+    coord_sums = (starts + ends - 1) * counts / 2
+
+    weights = masks[:, used][:, :, used].astype(np.float64)
+
+    pixels = image[top : top + crop, left : left + crop].astype(np.float64)
+    block_sums = np.add.reduceat(np.add.reduceat(pixels, starts, axis=0), starts, axis=1)
+    block_squares = np.add.reduceat(
+        np.add.reduceat(pixels**2, starts, axis=0), starts, axis=1
+    )
+
+    area = np.einsum("kij,i,j->k", weights, counts, counts)
+    safe_area = np.maximum(area, 1)
+    centroid_y = np.einsum("kij,i,j->k", weights, coord_sums, counts) / safe_area + top
+    centroid_x = np.einsum("kij,i,j->k", weights, counts, coord_sums) / safe_area + left
+    mean = np.einsum("kij,ij->k", weights, block_sums) / safe_area
+    mean_square = np.einsum("kij,ij->k", weights, block_squares) / safe_area
+    std = np.sqrt(np.maximum(mean_square - mean**2, 0))
+
+    rows = weights.any(axis=2)
+    cols = weights.any(axis=1)
+    last = len(used) - 1
+    bbox = np.stack(
+        [
+            starts[rows.argmax(axis=1)] + top,
+            starts[cols.argmax(axis=1)] + left,
+            ends[last - rows[:, ::-1].argmax(axis=1)] + top,
+            ends[last - cols[:, ::-1].argmax(axis=1)] + left,
+        ],
+        axis=1,
+    )
+    empty = area == 0
+    bbox[empty] = 0
+
+    return {
+        "area": area.round().astype(np.int64),
+        "centroid": np.where(empty[:, None], 0, np.stack([centroid_y, centroid_x], axis=1)),
+        "bbox": bbox,
+        "mean_intensity": np.where(empty, 0, mean),
+        "std_intensity": np.where(empty, 0, std),
+    }
+
+
 class ChestXRaySegmentationTool(BaseTool):
     """Tool for performing detailed segmentation analysis of chest X-ray images."""
 
@@ -84,16 +171,34 @@ class ChestXRaySegmentationTool(BaseTool):
     args_schema: type[BaseModel] = ChestXRaySegmentationInput
 
     model: Any = None
+    inference_model: Any = None
     device: str | None = "cuda" if torch.cuda.is_available() else "cpu"
     transform: Any = None
     pixel_spacing_mm: float = 0.2
     temp_dir: Path = Path("temp")
     organ_map: dict[str, int] = None
+    renderer: SegmentationOverlayRenderer | None = None
+    async_render: bool = False
+    render_executor: ThreadPoolExecutor | None = None
 
     def __init__(
-        self, device: str | None = "cuda", temp_dir: Path | None = Path("temp")
+        self,
+        device: str | None = "cuda",
+        temp_dir: Path | None = Path("temp"),
+        backend: str = "torch",
+        cache_dir: str = "./model-weights",
+        async_render: bool = False,
     ):
-        """Initialize the segmentation tool with model and temporary directory."""
+        """Initialize the segmentation tool with model and temporary directory.
+
+        Args:
+            device (Optional[str]): Device to run the model on.
+            temp_dir (Optional[Path]): Directory for visualizations.
+            backend (str): CPU inference backend, "torch", "int8" or "onnx". Ignored on GPU.
+            cache_dir (str): Directory where the ONNX export is stored.
+            async_render (bool): Write the visualization in the background instead of
+                before returning the results.
+        """
         super().__init__()
         self.model = xrv.baseline_models.chestx_det.PSPNet()
         self.device = (
@@ -101,6 +206,16 @@ class ChestXRaySegmentationTool(BaseTool):
         )
         self.model = self.model.to(self.device)
         self.model.eval()
+        self.inference_model = self.model
+        if self.device == "cpu":
+            # Exported for the single-image input the tool uses
+            self.inference_model = optimize_for_cpu(
+                self.model,
+                backend,
+                example_input=torch.rand(1, 512, 512) * 2048 - 1024,
+                onnx_path=f"{cache_dir}/onnx/xrv-pspnet-chestx_det.onnx",
+                dynamic_batch=False,
+            )
 
         self.transform = torchvision.transforms.Compose(
             [xrv.datasets.XRayCenterCrop(), xrv.datasets.XRayResizer(512)]
@@ -127,126 +242,87 @@ class ChestXRaySegmentationTool(BaseTool):
             "Spine": 13,
         }
 
-    def _align_mask_to_original(
-        self, mask: np.ndarray, original_shape: tuple[int, int]
-    ) -> np.ndarray:
-        """
-        Align a mask from the transformed (cropped/resized) space back to the full original image.
-        Assumes that the transform does a center crop to a square of side = min(original height, width)
-        and then resizes to (512,512).
-        """
-        orig_h, orig_w = original_shape
-        crop_size = min(orig_h, orig_w)
-        crop_top = (orig_h - crop_size) // 2
-        crop_left = (orig_w - crop_size) // 2
-
-        # Resize mask (from 512x512) to the cropped region size
-        resized_mask = skimage.transform.resize(
-            mask,
-            (crop_size, crop_size),
-            order=0,
-            preserve_range=True,
-            anti_aliasing=False,
+        # Colors are fixed per organ, so the same organ looks the same in every overlay
+        self.renderer = SegmentationOverlayRenderer(
+            sorted(self.organ_map, key=self.organ_map.get)
+        )
+        self.async_render = async_render
+        self.render_executor = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="segmentation_render"
         )
-        full_mask = np.zeros(original_shape)
-        full_mask[
-            crop_top : crop_top + crop_size, crop_left : crop_left + crop_size
-        ] = resized_mask
-        return full_mask
 
     def _compute_organ_metrics(
-        self, mask: np.ndarray, original_img: np.ndarray, confidence: float
-    ) -> OrganMetrics | None:
-        """Compute comprehensive metrics for a single organ mask."""
-        # Align mask to the original image coordinates if needed
-        if mask.shape != original_img.shape:
-            mask = self._align_mask_to_original(mask, original_img.shape)
-
-        props = skimage.measure.regionprops(mask.astype(int))
-        if not props:
-            return None
-
-        props = props[0]
-        area_cm2 = mask.sum() * (self.pixel_spacing_mm / 10) ** 2
-
-        img_height, img_width = mask.shape
-        cy, cx = props.centroid
-        relative_pos = {
-            "top": cy / img_height,
-            "left": cx / img_width,
-            "center_dist": np.sqrt(
-                (cy / img_height - 0.5) ** 2 + (cx / img_width - 0.5) ** 2
-            ),
-        }
+        self,
+        masks: np.ndarray,
+        original_img: np.ndarray,
+        confidences: np.ndarray,
+        organ_indices: list[int],
+    ) -> dict[int, OrganMetrics]:
+        """Compute comprehensive metrics for the selected organ masks in one pass.
 
-        organ_pixels = original_img[mask > 0]
-        mean_intensity = organ_pixels.mean() if len(organ_pixels) > 0 else 0
-        std_intensity = organ_pixels.std() if len(organ_pixels) > 0 else 0
-
-        return OrganMetrics(
-            area_pixels=int(mask.sum()),
-            area_cm2=float(area_cm2),
-            centroid=(float(cy), float(cx)),
-            bbox=tuple(map(int, props.bbox)),
-            width=int(props.bbox[3] - props.bbox[1]),
-            height=int(props.bbox[2] - props.bbox[0]),
-            aspect_ratio=float(
-                (props.bbox[2] - props.bbox[0]) / max(1, props.bbox[3] - props.bbox[1])
-            ),
-            relative_position=relative_pos,
-            mean_intensity=float(mean_intensity),
-            std_intensity=float(std_intensity),
-            confidence_score=float(confidence),
-        )
+        Args:
+            masks (np.ndarray): (K, 512, 512) boolean masks for every organ.
+            original_img (np.ndarray): Original grayscale image.
+            confidences (np.ndarray): (K,) model confidence score per organ.
+            organ_indices (List[int]): Organs to compute metrics for.
+
+        Returns:
+            Dict[int, OrganMetrics]: Metrics per organ index, for organs present in the image.
+        """
+        stats = region_statistics(masks[organ_indices], original_img)
+        img_height, img_width = original_img.shape
+        pixel_area_cm2 = (self.pixel_spacing_mm / 10) ** 2
+
+        results = {}
+        for n, organ_idx in enumerate(organ_indices):
+            area = int(stats["area"][n])
+            if area == 0:
+                continue
+
+            cy, cx = stats["centroid"][n]
+            min_y, min_x, max_y, max_x = map(int, stats["bbox"][n])
+            results[organ_idx] = OrganMetrics(
+                area_pixels=area,
+                area_cm2=float(area * pixel_area_cm2),
+                centroid=(float(cy), float(cx)),
+                bbox=(min_y, min_x, max_y, max_x),
+                width=max_x - min_x,
+                height=max_y - min_y,
+                aspect_ratio=float((max_y - min_y) / max(1, max_x - min_x)),
+                relative_position={
+                    "top": cy / img_height,
+                    "left": cx / img_width,
+                    "center_dist": float(
+                        np.sqrt((cy / img_height - 0.5) ** 2 + (cx / img_width - 0.5) ** 2)
+                    ),
+                },
+                mean_intensity=float(stats["mean_intensity"][n]),
+                std_intensity=float(stats["std_intensity"][n]),
+                confidence_score=float(confidences[organ_idx]),
+            )
+        return results
 
     def _save_visualization(
         self,
         original_img: np.ndarray,
-        pred_masks: torch.Tensor,
+        masks: np.ndarray,
         organ_indices: list[int],
     ) -> str:
-        """Save visualization of original image with segmentation masks overlaid."""
-        plt.figure(figsize=(10, 10))
-        plt.imshow(
-            original_img,
-            cmap="gray",
-            extent=[0, original_img.shape[1], original_img.shape[0], 0],
-        )
-
-        # Generate color palette for organs
-        colors = plt.cm.rainbow(np.linspace(0, 1, len(organ_indices)))
-
-        # Process and overlay each organ mask
-        for idx, (organ_idx, color) in enumerate(zip(organ_indices, colors)):
-            mask = pred_masks[0, organ_idx].cpu().numpy()
-            if mask.sum() > 0:
-                # Align the mask to the original image coordinates
-                if mask.shape != original_img.shape:
-                    mask = self._align_mask_to_original(mask, original_img.shape)
-
-                # Create a colored overlay with transparency
-                colored_mask = np.zeros((*original_img.shape, 4))
-                colored_mask[mask > 0] = (*color[:3], 0.3)
-                plt.imshow(
-                    colored_mask,
-                    extent=[0, original_img.shape[1], original_img.shape[0], 0],
-                )
-
-                # Add legend entry for the organ
-                organ_name = list(self.organ_map.keys())[
-                    list(self.organ_map.values()).index(organ_idx)
-                ]
-                plt.plot([], [], color=color, label=organ_name, linewidth=3)
-
-        plt.title("Segmentation Overlay")
-        plt.legend(bbox_to_anchor=(1.05, 1), loc="upper left")
-        plt.axis("off")
+        """Save visualization of original image with segmentation masks overlaid.
 
+        With `async_render`, the path is returned immediately and the PNG is written
+        in the background; it is created atomically once rendering completes.
+        """
         save_path = self.temp_dir / f"segmentation_{uuid.uuid4().hex[:8]}.png"
-        plt.savefig(save_path, bbox_inches="tight", dpi=300)
-        plt.close()
 
-        return str(save_path)
+        def render() -> str:
+            overlay = self.renderer.render(original_img, masks, organ_indices)
+            return self.renderer.save(overlay, save_path)
+
+        if self.async_render:
+            self.render_executor.submit(render)
+            return str(save_path)
+        return render()
 
     def _run(
         self,
@@ -267,36 +343,40 @@ class ChestXRaySegmentationTool(BaseTool):
                 organ_indices = list(self.organ_map.values())
                 organs = list(self.organ_map.keys())
 
-            # Load and process image
-            original_img = skimage.io.imread(image_path)
-            if len(original_img.shape) > 2:
-                original_img = original_img[:, :, 0]
+            # Load and process image, sharing decoded artifacts with other tools
+            original_img = load_grayscale(image_path)
+
+            def preprocess() -> torch.Tensor:
+                img = xrv.datasets.normalize(original_img, 255)
+                img = img[None, ...]
+                img = self.transform(img)
+                return torch.from_numpy(img)
 
-            img = xrv.datasets.normalize(original_img, 255)
-            img = img[None, ...]
-            img = self.transform(img)
-            img = torch.from_numpy(img)
+            img = image_cache.get_or_compute(
+                image_path, "xrv:normalize255:center_crop:resize512", preprocess
+            )
             img = img.to(self.device)
 
             # Generate predictions
             with torch.no_grad():
-                pred = self.model(img)
-            pred_probs = torch.sigmoid(pred)
-            pred_masks = (pred_probs > 0.5).float()
+                pred = self.inference_model(img)
+            pred_probs = torch.sigmoid(pred)[0]
+            # Move all masks and confidences to CPU once
+            masks = (pred_probs > 0.5).cpu().numpy()
+            confidences = pred_probs.mean(dim=(-2, -1)).cpu().numpy()
 
             # Save visualization
-            viz_path = self._save_visualization(original_img, pred_masks, organ_indices)
+            viz_path = self._save_visualization(original_img, masks, organ_indices)
 
             # Compute metrics for selected organs
-            results = {}
-            for idx, organ_name in zip(organ_indices, organs):
-                mask = pred_masks[0, idx].cpu().numpy()
-                if mask.sum() > 0:
-                    metrics = self._compute_organ_metrics(
-                        mask, original_img, float(pred_probs[0, idx].mean().cpu())
-                    )
-                    if metrics:
-                        results[organ_name] = metrics
+            organ_metrics = self._compute_organ_metrics(
+                masks, original_img, confidences, organ_indices
+            )
+            results = {
+                organ_name: organ_metrics[idx]
+                for idx, organ_name in zip(organ_indices, organs)
+                if idx in organ_metrics
+            }
 
             output = {
                 "segmentation_image_path": viz_path,
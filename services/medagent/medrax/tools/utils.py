@@ -1,3 +1,4 @@
+import threading
 from pathlib import Path
 
 import matplotlib.pyplot as plt
@@ -9,6 +10,9 @@ from langchain_core.callbacks import (
 from langchain_core.tools import BaseTool
 from pydantic import BaseModel, Field
 
+# pyplot keeps global figure state, so tools running concurrently must not draw at the same time
+PYPLOT_LOCK = threading.Lock()
+
 
 class ImageVisualizerInput(BaseModel):
     """Input schema for the Image Visualizer Tool. Only supports JPG or PNG images."""
@@ -51,32 +55,32 @@ class ImageVisualizerTool(BaseTool):
         cmap: str = "rgb",
     ) -> None:
         """Display an image with optional annotations."""
-        plt.figure(figsize=figsize)
-
         img = skimage.io.imread(image_path)
         if len(img.shape) > 2 and cmap != "rgb":
             img = img[..., 0]
 
-        plt.imshow(img, cmap=None if cmap == "rgb" else cmap)
-        plt.axis("off")
-
-        if title:
-            plt.title(title, pad=15, fontsize=12)
-
-        # Add description if provided
-        if description:
-            plt.figtext(
-                0.5,
-                0.01,
-                description,
-                wrap=True,
-                horizontalalignment="center",
-                fontsize=10,
-            )
-
-        # Adjust margins to minimize whitespace while preventing overlap
-        plt.subplots_adjust(top=0.95, bottom=0.05, left=0.05, right=0.95)
-        plt.show()
+        with PYPLOT_LOCK:
+            plt.figure(figsize=figsize)
+            plt.imshow(img, cmap=None if cmap == "rgb" else cmap)
+            plt.axis("off")
+
+            if title:
+                plt.title(title, pad=15, fontsize=12)
+
+            # Add description if provided
+            if description:
+                plt.figtext(
+                    0.5,
+                    0.01,
+                    description,
+                    wrap=True,
+                    horizontalalignment="center",
+                    fontsize=10,
+                )
+
+            # Adjust margins to minimize whitespace while preventing overlap
+            plt.subplots_adjust(top=0.95, bottom=0.05, left=0.05, right=0.95)
+            plt.show()
 
     def _run(
         self,
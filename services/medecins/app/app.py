@@ -10,6 +10,9 @@ from config import Config
 from decorator.health_check import health_check_middleware
 from routes.doctor_routes import router as doctor_router
 from routes.integration_routes import router as integration_router
+from services.doctor_directory import doctor_directory
+from services.logger_service import logger_service
+from services.ocr_service import ocr_service
 from services.rabbitmq_client import RabbitMQClient
 from services.redis_client import RedisClient
 from services.tracing_service import TracingService
@@ -48,6 +51,24 @@ rabbitmq_client = RabbitMQClient(Config)
 app.include_router(integration_router)
 app.include_router(doctor_router)
 
+
+@app.on_event("startup")
+async def startup_event():
+    """Start background services on application startup"""
+    # Warm the doctor directory so the first listing request does not pay for the load
+    doctor_directory.start()
+    logger_service.info("Doctor directory refresh scheduled")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Clean up resources on application shutdown"""
+    await doctor_directory.stop()
+    ocr_service.close()
+    await redis_client.close()
+    logger_service.info("Doctor directory, OCR workers and Redis connections closed")
+
+
 # Import the consumer module and threading
 from consumer import main as consumer_main
 
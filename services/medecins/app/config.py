@@ -34,6 +34,7 @@ class Config:
     REDIS_DB = int(os.getenv("REDIS_DB"))
     REDIS_PASSWORD = os.getenv("REDIS_PASSWORD")
     REDIS_URL = f"redis://:{REDIS_PASSWORD}@{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}"
+    REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
 
     # Authentication settings
     AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://auth-service:8086")
@@ -41,6 +42,10 @@ class Config:
     AUTH_SERVICE_CLIENT_SECRET = os.getenv("AUTH_SERVICE_CLIENT_SECRET", "pulmocare-secret")
     AUTH_SERVICE_REALM = os.getenv("AUTH_SERVICE_REALM", "pulmocare")
 
+    # Profile asset storage settings
+    MEDFILES_SERVICE_URL = os.getenv("MEDFILES_SERVICE_URL", "http://medfiles-service:8088")
+    PROFILE_ASSET_CACHE_MAX_AGE = int(os.getenv("PROFILE_ASSET_CACHE_MAX_AGE", "86400"))
+
     # RabbitMQ settings
     RABBITMQ_HOST = os.getenv("RABBITMQ_HOST")
     RABBITMQ_PORT = int(os.getenv("RABBITMQ_PORT"))
@@ -81,6 +86,20 @@ class Config:
     # Cache settings
     CACHE_TTL = int(os.getenv("CACHE_TTL"))
     CACHE_MAX_SIZE = int(os.getenv("CACHE_MAX_SIZE"))
+    CACHE_NEGATIVE_TTL = int(os.getenv("CACHE_NEGATIVE_TTL", "30"))
+
+    # OCR settings
+    OCR_WORKERS = int(os.getenv("OCR_WORKERS", "2"))
+    OCR_MAX_PENDING = int(os.getenv("OCR_MAX_PENDING", "8"))
+    OCR_TIMEOUT = int(os.getenv("OCR_TIMEOUT", "20"))
+    OCR_TARGET_DPI = int(os.getenv("OCR_TARGET_DPI", "300"))
+    OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "2000"))
+    OCR_CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", "256"))
+    OCR_CACHE_TTL = int(os.getenv("OCR_CACHE_TTL", "3600"))
+
+    # Doctor directory settings
+    DOCTOR_DIRECTORY_REFRESH_INTERVAL = int(os.getenv("DOCTOR_DIRECTORY_REFRESH_INTERVAL", "300"))
+    DOCTOR_DIRECTORY_MAX_STALENESS = int(os.getenv("DOCTOR_DIRECTORY_MAX_STALENESS", "900"))
     CACHE_TYPE = "redis"
     CACHE_REDIS_URL = REDIS_URL
     CACHE_DEFAULT_TIMEOUT = CACHE_TTL
@@ -4,7 +4,10 @@ from datetime import datetime
 from config import Config
 from services.logger_service import logger_service
 from services.rabbitmq_client import RabbitMQClient
-from services.redis_client import RedisClient
+from services.redis_client import get_sync_client
+
+# Shared client; consumer callbacks run on a blocking pika thread
+redis_client = get_sync_client(Config)
 
 
 def handle_appointment_request(ch, method, properties, body):
@@ -14,8 +17,6 @@ def handle_appointment_request(ch, method, properties, body):
         message = json.loads(body)
         logger_service.info(f"Received appointment request: {message}")
 
-        # Store in Redis
-        redis_client = RedisClient(Config)
         appointment_id = message.get("appointment_id", str(datetime.utcnow().timestamp()))
 
         # Structure the data
@@ -30,18 +31,22 @@ def handle_appointment_request(ch, method, properties, body):
             "raw_request": json.dumps(message),
         }
 
-        # Store in Redis with expiration of 30 days (2592000 seconds)
-        redis_client.client.setex(f"appointment:{appointment_id}", 2592000, json.dumps(appointment_data))
+        # Store the record and its index entries in one transaction
+        with redis_client.pipeline() as pipe:
+            # Store in Redis with expiration of 30 days (2592000 seconds)
+            pipe.setex(f"appointment:{appointment_id}", 2592000, json.dumps(appointment_data))
+
+            # Add to doctor's appointment list
+            doctor_id = message.get("doctor_id")
+            if doctor_id:
+                pipe.sadd(f"doctor:{doctor_id}:appointments", appointment_id)
 
-        # Add to doctor's appointment list
-        doctor_id = message.get("doctor_id")
-        if doctor_id:
-            redis_client.client.sadd(f"doctor:{doctor_id}:appointments", appointment_id)
+            # Add to patient's appointment list
+            patient_id = message.get("patient_id")
+            if patient_id:
+                pipe.sadd(f"patient:{patient_id}:appointments", appointment_id)
 
-        # Add to patient's appointment list
-        patient_id = message.get("patient_id")
-        if patient_id:
-            redis_client.client.sadd(f"patient:{patient_id}:appointments", appointment_id)
+            pipe.execute()
 
         # Acknowledge message
         ch.basic_ack(delivery_tag=method.delivery_tag)
@@ -59,8 +64,6 @@ def handle_report_notification(ch, method, properties, body):
         message = json.loads(body)
         logger_service.info(f"Received report notification: {message}")
 
-        # Store in Redis
-        redis_client = RedisClient(Config)
         report_id = message.get("report_id", str(datetime.utcnow().timestamp()))
 
         # Structure the data
@@ -73,13 +76,16 @@ def handle_report_notification(ch, method, properties, body):
             "raw_notification": json.dumps(message),
         }
 
-        # Store in Redis with expiration of 30 days
-        redis_client.client.setex(f"report_notification:{report_id}", 2592000, json.dumps(report_data))
+        with redis_client.pipeline() as pipe:
+            # Store in Redis with expiration of 30 days
+            pipe.setex(f"report_notification:{report_id}", 2592000, json.dumps(report_data))
+
+            # Add to doctor's report list
+            doctor_id = message.get("doctor_id")
+            if doctor_id:
+                pipe.sadd(f"doctor:{doctor_id}:reports", report_id)
 
-        # Add to doctor's report list
-        doctor_id = message.get("doctor_id")
-        if doctor_id:
-            redis_client.client.sadd(f"doctor:{doctor_id}:reports", report_id)
+            pipe.execute()
 
         # Acknowledge message
         ch.basic_ack(delivery_tag=method.delivery_tag)
@@ -97,8 +103,6 @@ def handle_radiology_report_completed(ch, method, properties, body):
         message = json.loads(body)
         logger_service.info(f"Received radiology report completed notification: {message}")
 
-        # Store in Redis
-        redis_client = RedisClient(Config)
         report_id = message.get("report_id", str(datetime.utcnow().timestamp()))
 
         # Structure the data
@@ -113,13 +117,16 @@ def handle_radiology_report_completed(ch, method, properties, body):
             "raw_notification": json.dumps(message),
         }
 
-        # Store in Redis with expiration of 30 days
-        redis_client.client.set(f"radiology_report:{report_id}", json.dumps(radiology_data), ex=2592000)
+        with redis_client.pipeline() as pipe:
+            # Store in Redis with expiration of 30 days
+            pipe.set(f"radiology_report:{report_id}", json.dumps(radiology_data), ex=2592000)
 
-        # Add to doctor's radiology reports list
-        doctor_id = message.get("doctor_id")
-        if doctor_id:
-            redis_client.client.sadd(f"doctor:{doctor_id}:radiology_reports", report_id)
+            # Add to doctor's radiology reports list
+            doctor_id = message.get("doctor_id")
+            if doctor_id:
+                pipe.sadd(f"doctor:{doctor_id}:radiology_reports", report_id)
+
+            pipe.execute()
 
         # Acknowledge message
         ch.basic_ack(delivery_tag=method.delivery_tag)
@@ -137,8 +144,6 @@ def handle_prescription_notification(ch, method, properties, body):
         message = json.loads(body)
         logger_service.info(f"Received prescription notification: {message}")
 
-        # Store in Redis
-        redis_client = RedisClient(Config)
         prescription_id = message.get("prescription_id", str(datetime.utcnow().timestamp()))
 
         # Structure the data
@@ -151,17 +156,20 @@ def handle_prescription_notification(ch, method, properties, body):
             "raw_notification": json.dumps(message),
         }
 
-        # Store in Redis with expiration of 30 days
-        redis_client.client.set(
-            f"prescription_notification:{prescription_id}",
-            json.dumps(prescription_data),
-            ex=2592000,
-        )
-
-        # Add to doctor's prescription notifications list
-        doctor_id = message.get("doctor_id")
-        if doctor_id and doctor_id != "unknown":
-            redis_client.client.sadd(f"doctor:{doctor_id}:prescriptions", prescription_id)
+        with redis_client.pipeline() as pipe:
+            # Store in Redis with expiration of 30 days
+            pipe.set(
+                f"prescription_notification:{prescription_id}",
+                json.dumps(prescription_data),
+                ex=2592000,
+            )
+
+            # Add to doctor's prescription notifications list
+            doctor_id = message.get("doctor_id")
+            if doctor_id and doctor_id != "unknown":
+                pipe.sadd(f"doctor:{doctor_id}:prescriptions", prescription_id)
+
+            pipe.execute()
 
         # Acknowledge message
         ch.basic_ack(delivery_tag=method.delivery_tag)
@@ -1,25 +1,21 @@
 import base64
-import io
-import re
 
 import httpx
-import pytesseract
 from fastapi import (
     APIRouter,
     Depends,
     File,
     HTTPException,
     Query,
+    Request,
     Response,
     UploadFile,
     status,
 )
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from PIL import Image
 
 from config import Config
 from models.api_models import (
-    DoctorListItem,
     DoctorListResponse,
     DoctorVerificationInfoResponse,
     ErrorResponse,
@@ -31,7 +27,10 @@ from models.api_models import (
     VerifyDoctorResponse,
 )
 from models.doctor import Doctor, DoctorUpdate
+from services.doctor_directory import doctor_directory
 from services.logger_service import logger_service
+from services.ocr_service import OCRBusyError, OCRTimeoutError, extract_fields, ocr_service
+from services.profile_assets import fetch_profile_asset, upload_profile_asset
 
 config = Config()
 router = APIRouter(prefix="/api/doctors", tags=["Doctors"])
@@ -233,54 +232,9 @@ async def scan_visit_card(
         if len(contents) > 5 * 1024 * 1024:  # 5MB limit
             raise HTTPException(status_code=400, detail="File size too large. Maximum size is 5MB.")
 
-        # Use PyTesseract to extract text from image
-        image = Image.open(io.BytesIO(contents))
-        extracted_text = pytesseract.image_to_string(image)
-
-        # Simple parsing of the extracted text (this is a basic implementation)
-        lines = extracted_text.strip().split("\n")
-        doctor_info = {}
-
-        # Try to extract information
-        if len(lines) > 0:
-            doctor_info["name"] = lines[0].strip()  # Assuming first line is the name
-
-        # Look for email
-        for line in lines:
-            if "@" in line and "." in line:
-                doctor_info["email"] = line.strip()
-                break
-
-        # Look for phone number (simple regex pattern)
-        phone_pattern = re.compile(r"\+?[\d\s\(\)-]{10,}")
-        for line in lines:
-            match = phone_pattern.search(line)
-            if match:
-                doctor_info["phone"] = match.group().strip()
-                break
-
-        # Look for address (assuming it's multiple lines with postal code)
-        address_lines = []
-        for line in lines:
-            if re.search(r"\d{5}", line):  # Check for postal code
-                address_lines.append(line.strip())
-
-        if address_lines:
-            doctor_info["address"] = " ".join(address_lines)
-
-        # Look for specialty
-        specialties = [
-            "Cardiology",
-            "Neurology",
-            "Dermatology",
-            "Pediatrics",
-            "Oncology",
-        ]
-        for line in lines:
-            for specialty in specialties:
-                if specialty.lower() in line.lower():
-                    doctor_info["specialty"] = specialty
-                    break
+        # Run OCR in the worker pool and extract structured fields
+        extracted_text = await ocr_service.image_to_text(contents)
+        doctor_info = extract_fields(extracted_text)
 
         return {
             "extracted_info": doctor_info,
@@ -289,6 +243,12 @@ async def scan_visit_card(
 
     except HTTPException:
         raise
+    except OCRBusyError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    except OCRTimeoutError as e:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger_service.error(f"Error scanning business card: {e}")
         raise HTTPException(status_code=500, detail=f"Error scanning business card: {e!s}")
@@ -426,8 +386,33 @@ async def get_verification_status(
         raise HTTPException(status_code=500, detail=f"Error retrieving verification status: {e!s}")
 
 
+def _first_attribute(attributes: dict, name: str) -> str:
+    """Read a single-valued Keycloak attribute, which may be stored as a list"""
+    value = attributes.get(name, "")
+    if isinstance(value, list):
+        return value[0] if value else ""
+    return value
+
+
+async def _update_profile_attributes(token: str, doctor_id: str, attributes: dict, error_detail: str) -> None:
+    """Patch user attributes through the auth service"""
+    auth_url = f"{config.AUTH_SERVICE_URL}/api/auth/users/{doctor_id}/attributes"
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        response = await client.patch(auth_url, json=attributes, headers=headers)
+
+        if response.status_code != 200:
+            logger_service.error(f"{error_detail}: {response.status_code} - {response.text}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=error_detail,
+            )
+
+
 @router.get("/signature")
 async def get_doctor_signature(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
 ):
     """Get the doctor's digital signature"""
@@ -455,16 +440,27 @@ async def get_doctor_signature(
 
             doctor_info = response.json()
 
-        # Get signature from attributes
+        # Get signature reference from attributes
         attributes = doctor_info.get("attributes", {})
-        signature = attributes.get("signature", [""])[0] if isinstance(attributes.get("signature", []), list) else attributes.get("signature", "")
+        signature = _first_attribute(attributes, "signature")
+        version = _first_attribute(attributes, "signature_version")
 
         if not signature:
             return Response(content="No signature found", status_code=404)
 
-        # Return the signature as an image
-        signature_data = base64.b64decode(signature.split(",")[1] if "," in signature else signature)
-        return Response(content=signature_data, media_type="image/png")
+        if not version:
+            # Legacy signature stored inline as a base64 data URL
+            signature_data = base64.b64decode(signature.split(",")[1] if "," in signature else signature)
+            return Response(content=signature_data, media_type="image/png")
+
+        # Signatures are immutable per version, so the version is a strong validator
+        etag = f'"{version}"'
+        headers = {"ETag": etag, "Cache-Control": f"private, max-age={config.PROFILE_ASSET_CACHE_MAX_AGE}"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        signature_data, content_type = await fetch_profile_asset(token, doctor_id, "signature", version)
+        return Response(content=signature_data, media_type=content_type, headers=headers)
 
     except HTTPException:
         raise
@@ -491,22 +487,26 @@ async def update_doctor_signature(
         user_info = await get_doctor_from_auth_service(token)
         doctor_id = user_info.get("user_id")
 
-        # Call auth service to update signature attribute
-        auth_url = f"{config.AUTH_SERVICE_URL}/api/auth/users/{doctor_id}/attributes"
-        headers = {"Authorization": f"Bearer {token}"}
-
-        # Update attribute
-        signature_attributes = {"signature": request.signature_data}
-
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.patch(auth_url, json=signature_attributes, headers=headers)
-
-            if response.status_code != 200:
-                logger_service.error(f"Failed to update signature: {response.status_code} - {response.text}")
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Failed to update signature",
-                )
+        # Decode the data URL and store the image in object storage
+        try:
+            header, _, encoded = request.signature_data.rpartition(",")
+            content_type = header[5:].split(";")[0] if header.startswith("data:") else "image/png"
+            signature_bytes = base64.b64decode(encoded, validate=True)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid signature data")
+
+        try:
+            asset = await upload_profile_asset(token, "signature", "signature.png", signature_bytes, content_type)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        # Only keep a small reference in the user profile
+        await _update_profile_attributes(
+            token,
+            doctor_id,
+            {"signature": asset["urls"]["original"], "signature_version": asset["version"]},
+            "Failed to update signature",
+        )
 
         return {"message": "Signature updated successfully"}
 
@@ -547,25 +547,23 @@ async def upload_profile_picture(
         if len(contents) > 5 * 1024 * 1024:  # 5MB limit
             raise HTTPException(status_code=400, detail="File size too large. Maximum size is 5MB.")
 
-        # Convert to base64 for storage in Keycloak
-        base64_image = f"data:{file.content_type};base64,{base64.b64encode(contents).decode('utf-8')}"
-
-        # Update profile picture in auth service
-        auth_url = f"{config.AUTH_SERVICE_URL}/api/auth/users/{doctor_id}/attributes"
-        headers = {"Authorization": f"Bearer {token}"}
-
-        # Update attribute
-        profile_attributes = {"profile_picture": base64_image}
-
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.patch(auth_url, json=profile_attributes, headers=headers)
-
-            if response.status_code != 200:
-                logger_service.error(f"Failed to update profile picture: {response.status_code} - {response.text}")
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Failed to upload profile picture",
-                )
+        # Store resized variants in object storage
+        try:
+            asset = await upload_profile_asset(token, "picture", file.filename, contents, file.content_type)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        # Only keep small references in the user profile
+        await _update_profile_attributes(
+            token,
+            doctor_id,
+            {
+                "profile_picture": asset["urls"]["medium"],
+                "profile_picture_thumbnail": asset["urls"]["thumbnail"],
+                "profile_picture_version": asset["version"],
+            },
+            "Failed to upload profile picture",
+        )
 
         return {"message": "Profile picture uploaded successfully"}
 
@@ -703,6 +701,7 @@ async def update_doctor_profile(
 
             updated_doctor_info = response.json()
             doctor = Doctor.from_keycloak_data(updated_doctor_info)
+            doctor_directory.upsert(updated_doctor_info)
 
         return {"message": "Profile updated successfully", "profile": doctor.to_dict()}
 
@@ -732,81 +731,15 @@ async def get_all_doctors(
     Supports pagination and optional filtering for verified doctors only.
     """
     try:
-        # Calculate pagination parameters
-        skip = (page - 1) * limit
-
-        # Extract the token from the request for passing to the Auth service
-        token = credentials.credentials
-
-        # Set up query parameters for the auth service
-        query_params = {"role": "doctor", "first": skip, "max": limit}
-
-        if specialty:
-            query_params["specialty"] = specialty
-
-        if name:
-            query_params["search"] = name
-
-        # Call auth service directly to get doctors list
-        auth_url = f"{config.AUTH_SERVICE_URL}/api/auth/users"
-        headers = {"Authorization": f"Bearer {token}"}
-
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(auth_url, headers=headers, params=query_params)
-
-            if response.status_code != 200:
-                logger_service.error(f"Failed to get doctors list: {response.status_code} - {response.text}")
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Failed to retrieve doctors list",
-                )
-
-            # Get doctors data from response
-            doctors_data = response.json()
-
-        # Process the results
-        doctors_list = []
-        for user_data in doctors_data:
-            # Convert to Doctor model
-            doctor = Doctor.from_keycloak_data(user_data)
-
-            # Check if we need to filter by verification status
-            attributes = user_data.get("attributes", {})
-            is_verified = attributes.get("is_verified", ["false"])[0] == "true" if isinstance(attributes.get("is_verified", []), list) else attributes.get("is_verified", "false") == "true"
-
-            # Skip if we only want verified doctors and this one isn't
-            if verified_only and not is_verified:
-                continue
-
-            # Add to results
-            doctors_list.append(
-                DoctorListItem(
-                    id=doctor._id,
-                    name=doctor.name,
-                    email=doctor.email,
-                    specialty=doctor.specialty,
-                    phone=doctor.phone,
-                    address=doctor.address,
-                    profile_picture=getattr(doctor, "profile_picture", None),
-                    is_verified=is_verified,
-                    bio=getattr(doctor, "bio", None),
-                    license_number=getattr(doctor, "license_number", None),
-                    hospital=getattr(doctor, "hospital", None),
-                    education=getattr(doctor, "education", None),
-                    experience=getattr(doctor, "experience", None),
-                )
-            )
-
-        # Get total for pagination calculation
-        total_doctors = len(doctors_list)
-        total_pages = (total_doctors + limit - 1) // limit
-
-        return {
-            "items": doctors_list[skip : skip + limit],  # Apply pagination
-            "total": total_doctors,
-            "page": page,
-            "pages": total_pages,
-        }
+        # Serve from the in-memory directory; filters are applied before pagination
+        await doctor_directory.ensure_fresh(credentials.credentials)
+        return doctor_directory.search(
+            specialty=specialty,
+            name=name,
+            verified_only=verified_only,
+            page=page,
+            limit=limit,
+        )
 
     except Exception as e:
         logger_service.error(f"Error retrieving doctors list: {e}")
@@ -16,12 +16,17 @@ from services.logger_service import logger_service
 from services.prescription_service import PrescriptionService
 from services.rabbitmq_client import RabbitMQClient
 from services.radiology_service import RadiologyService
+from services.redis_client import RedisClient
 
 router = APIRouter(prefix="/api/integration", tags=["Integration"])
 security = HTTPBearer()
 
 # Initialize services
 rabbitmq_client = RabbitMQClient(Config)
+redis_client = RedisClient(Config)
+
+# Fields of a stored appointment record required by AppointmentResponse
+APPOINTMENT_REQUIRED_FIELDS = ("appointment_id", "patient_id", "requested_time", "status", "created_at")
 
 
 @router.post(
@@ -1014,13 +1019,39 @@ async def get_doctor_appointments_direct(
         if not doctor_info:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Doctor not found")
 
-        # Create appointment service
-        appointment_service = AppointmentService()
-
-        # Get appointments from the appointment service
-        appointments = await appointment_service.get_doctor_appointments(doctor_id=doctor_id, status=status, page=page, limit=limit)
-
-        return appointments
+        # Appointment requests are stored in Redis by the consumer; load them with one SMEMBERS + MGET
+        records = await redis_client.get_doctor_appointments(doctor_id)
+        # The consumer stores messages as received; skip records the response model cannot represent
+        complete_records = []
+        for record in records:
+            missing = [field for field in APPOINTMENT_REQUIRED_FIELDS if not record.get(field)]
+            if missing:
+                logger_service.warning(
+                    f"Skipping appointment record of doctor {doctor_id} missing {missing}: {record}"
+                )
+                continue
+            complete_records.append(record)
+        records = complete_records
+        if status:
+            records = [record for record in records if record.get("status") == status]
+        records.sort(key=lambda record: record.get("requested_time") or "", reverse=True)
+
+        total = len(records)
+        start = (page - 1) * limit
+        items = [
+            {
+                "id": record["appointment_id"],
+                "doctor_id": record.get("doctor_id") or doctor_id,
+                "patient_id": record.get("patient_id"),
+                "requested_time": record.get("requested_time"),
+                "status": record.get("status"),
+                "reason": record.get("reason"),
+                "created_at": record.get("created_at"),
+            }
+            for record in records[start : start + limit]
+        ]
+
+        return {"items": items, "total": total, "page": page, "pages": (total + limit - 1) // limit}
     except HTTPException:
         raise
     except Exception as e:
@@ -1029,6 +1060,3 @@ async def get_doctor_appointments_direct(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error retrieving appointments: {e!s}",
         )
-    finally:
-        if appointment_service:
-            appointment_service.close()
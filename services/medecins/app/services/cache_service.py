@@ -1,94 +1,329 @@
-import fnmatch
+import asyncio
+import json
+import threading
 import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterable
 from typing import Any
 
+import redis.asyncio as aioredis
+
 from services.logger_service import logger_service
+from services.metrics import track_cache_eviction, track_cache_metrics
+from services.redis_client import get_connection_pool
+
+# Sentinel stored for negative (not found) results
+_MISSING = object()
+_NEGATIVE_MARKER = "__cache_negative__"
 
 
 class CacheService:
     """
-    A simple in-memory cache service with TTL support
+    Two-tier cache: a bounded in-process LRU with TTL (L1) backed by an
+    optional Redis instance (L2).
+
+    Concurrent misses on the same key are coalesced so only one loader runs,
+    entries can be grouped under tags for targeted invalidation, and "not found"
+    results can be cached for a short negative TTL.
     """
 
-    def __init__(self):
-        self._cache: dict[str, dict[str, Any]] = {}
-        logger_service.info("Cache service initialized")
+    def __init__(
+        self,
+        name: str = "default",
+        max_size: int = 1000,
+        default_ttl: int = 300,
+        negative_ttl: int = 30,
+        redis_client=None,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            name: Cache name, used as Redis key prefix and metrics label
+            max_size: Maximum number of entries kept in the in-process LRU
+            default_ttl: TTL in seconds used when none is given
+            negative_ttl: TTL in seconds for cached "not found" results
+            redis_client: Optional redis.asyncio client (decode_responses=True) used as L2
+        """
+        self.name = name
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self.redis = redis_client
+
+        self._cache: OrderedDict[str, tuple[Any, float | None]] = OrderedDict()
+        self._tags: dict[str, set[str]] = {}
+        self._key_tags: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+        self._inflight: dict[str, asyncio.Future] = {}
+
+        logger_service.info(f"Cache service '{name}' initialized (max_size={max_size}, ttl={default_ttl}s, l2={'redis' if redis_client else 'none'})")
+
+    @classmethod
+    def from_config(cls, name: str, config) -> "CacheService":
+        """Build a cache from service configuration, enabling the Redis tier when CACHE_TYPE is "redis"."""
+        redis_client = None
+        if config.CACHE_TYPE == "redis":
+            redis_client = aioredis.Redis(connection_pool=get_connection_pool(config))
+        return cls(
+            name=name,
+            max_size=config.CACHE_MAX_SIZE,
+            default_ttl=config.CACHE_TTL,
+            negative_ttl=config.CACHE_NEGATIVE_TTL,
+            redis_client=redis_client,
+        )
+
+    def _redis_key(self, key: str) -> str:
+        return f"cache:{self.name}:{key}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"cache:{self.name}:tag:{tag}"
+
+    # ------------------------------------------------------------------
+    # L1 (in-process LRU)
+    # ------------------------------------------------------------------
+
+    def _l1_get(self, key: str) -> Any:
+        with self._lock:
+            item = self._cache.get(key)
+            if item is None:
+                return _MISSING
+
+            value, expiry = item
+            if expiry is not None and expiry < time.monotonic():
+                self._l1_remove(key)
+                track_cache_eviction(self.name, "expired")
+                return _MISSING
+
+            self._cache.move_to_end(key)
+            return value
+
+    def _l1_set(self, key: str, value: Any, ttl: int | None, tags: Iterable[str] = ()) -> None:
+        expiry = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._cache[key] = (value, expiry)
+            self._cache.move_to_end(key)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+                self._key_tags.setdefault(key, set()).add(tag)
+
+            if len(self._cache) > self.max_size:
+                self._evict()
+
+    def _l1_remove(self, key: str) -> bool:
+        """Remove a key from L1. Caller must hold the lock."""
+        if self._cache.pop(key, None) is None:
+            return False
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+        return True
+
+    def _evict(self) -> None:
+        """Drop expired entries, then least recently used ones, until within bounds. Caller must hold the lock."""
+        now = time.monotonic()
+        expired = [k for k, (_, expiry) in self._cache.items() if expiry is not None and expiry < now]
+        for key in expired:
+            self._l1_remove(key)
+            track_cache_eviction(self.name, "expired")
 
-    def get(self, key: str) -> str | None:
+        while len(self._cache) > self.max_size:
+            key = next(iter(self._cache))
+            self._l1_remove(key)
+            track_cache_eviction(self.name, "size")
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    async def get(self, key: str, default: Any = None) -> Any:
         """
-        Get a value from the cache. Returns None if not found or expired.
+        Get a value from the cache, checking L1 then L2.
+        Returns `default` if not found, expired or negatively cached.
         """
-        if key not in self._cache:
-            return None
+        value = await self._lookup(key)
+        if value is _MISSING:
+            track_cache_metrics(hit=False, cache_name=self.name)
+            return default
+
+        track_cache_metrics(hit=True, cache_name=self.name)
+        return default if value is None else value
+
+    async def _lookup(self, key: str) -> Any:
+        """Return the cached value, None for a negative entry, or _MISSING."""
+        value = self._l1_get(key)
+        if value is not _MISSING:
+            return value
+
+        if self.redis is None:
+            return _MISSING
 
-        cache_item = self._cache[key]
+        try:
+            raw = await self.redis.get(self._redis_key(key))
+        except Exception as e:
+            logger_service.error(f"Cache '{self.name}' L2 get error: {e!s}")
+            return _MISSING
 
-        # Check if item has expired
-        if cache_item["expiry"] and cache_item["expiry"] < time.time():
-            # Remove expired item
-            self.delete(key)
-            return None
+        if raw is None:
+            return _MISSING
 
-        logger_service.debug(f"Cache hit for key: {key}")
-        return cache_item["value"]
+        value = None if raw == _NEGATIVE_MARKER else json.loads(raw)
+        try:
+            ttl = await self.redis.ttl(self._redis_key(key))
+        except Exception:
+            ttl = -1
+        self._l1_set(key, value, ttl if ttl and ttl > 0 else self.default_ttl)
+        return value
 
-    def set(self, key: str, value: str, ttl: int | None = None) -> None:
+    async def set(self, key: str, value: Any, ttl: int | None = None, tags: Iterable[str] = ()) -> None:
         """
-        Set a value in the cache with an optional TTL in seconds.
+        Set a value in both tiers. Values must be JSON-serializable when L2 is enabled.
+        A value of None is stored as a negative entry using the negative TTL.
         """
-        expiry = None
-        if ttl is not None:
-            expiry = time.time() + ttl
+        tags = tuple(tags)
+        if value is None:
+            ttl = self.negative_ttl
+        elif ttl is None:
+            ttl = self.default_ttl
+
+        self._l1_set(key, value, ttl, tags)
+
+        if self.redis is not None:
+            payload = _NEGATIVE_MARKER if value is None else json.dumps(value)
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.setex(self._redis_key(key), ttl, payload)
+                    for tag in tags:
+                        pipe.sadd(self._tag_key(tag), key)
+                        pipe.expire(self._tag_key(tag), max(ttl, self.default_ttl))
+                    await pipe.execute()
+            except Exception as e:
+                logger_service.error(f"Cache '{self.name}' L2 set error: {e!s}")
 
-        self._cache[key] = {"value": value, "expiry": expiry}
         logger_service.debug(f"Cached value for key: {key}, TTL: {ttl}s")
 
-    def delete(self, key: str) -> bool:
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int | None = None,
+        tags: Iterable[str] = (),
+    ) -> Any:
         """
-        Delete a key from the cache. Returns True if deleted, False if not found.
+        Return the cached value for `key`, calling `loader` on a miss.
+
+        Concurrent callers missing on the same key share a single loader call.
+        A loader result of None is cached negatively; exceptions raised by the
+        loader are propagated to every waiting caller and nothing is cached.
         """
-        if key in self._cache:
-            del self._cache[key]
-            logger_service.debug(f"Deleted cache key: {key}")
-            return True
-        return False
+        value = await self._lookup(key)
+        if value is not _MISSING:
+            track_cache_metrics(hit=True, cache_name=self.name)
+            return value
+
+        track_cache_metrics(hit=False, cache_name=self.name)
 
-    def delete_pattern(self, pattern: str) -> int:
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+            await self.set(key, value, ttl=ttl, tags=tags)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def delete(self, key: str) -> bool:
         """
-        Delete all keys matching the given pattern.
-        Returns the number of keys deleted.
+        Delete a key from both tiers. Returns True if it was present in L1.
         """
-        keys_to_delete = [k for k in self._cache.keys() if fnmatch.fnmatch(k, pattern)]
-        count = 0
+        with self._lock:
+            deleted = self._l1_remove(key)
 
-        for key in keys_to_delete:
-            self.delete(key)
-            count += 1
+        if self.redis is not None:
+            try:
+                await self.redis.delete(self._redis_key(key))
+            except Exception as e:
+                logger_service.error(f"Cache '{self.name}' L2 delete error: {e!s}")
 
-        if count > 0:
-            logger_service.debug(f"Deleted {count} cache keys matching pattern: {pattern}")
+        if deleted:
+            logger_service.debug(f"Deleted cache key: {key}")
+        return deleted
 
-        return count
+    async def invalidate_tags(self, *tags: str) -> int:
+        """
+        Delete every entry associated with any of the given tags.
+        Returns the number of keys invalidated.
+        """
+        keys: set[str] = set()
+        with self._lock:
+            for tag in tags:
+                keys.update(self._tags.get(tag, ()))
+            for key in keys:
+                self._l1_remove(key)
+
+        if self.redis is not None:
+            try:
+                tag_keys = [self._tag_key(tag) for tag in tags]
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for tag_key in tag_keys:
+                        pipe.smembers(tag_key)
+                    members = await pipe.execute()
+                for member_set in members:
+                    keys.update(member_set or ())
+                # Entries promoted from L2 are not tagged locally
+                with self._lock:
+                    for key in keys:
+                        self._l1_remove(key)
+                await self.redis.delete(*[self._redis_key(k) for k in keys], *tag_keys)
+            except Exception as e:
+                logger_service.error(f"Cache '{self.name}' L2 tag invalidation error: {e!s}")
+
+        if keys:
+            logger_service.debug(f"Invalidated {len(keys)} cache keys for tags: {', '.join(tags)}")
+        return len(keys)
 
     def clear(self) -> None:
         """
-        Clear all cache entries.
+        Clear all in-process cache entries.
         """
-        self._cache.clear()
-        logger_service.info("Cache cleared")
+        with self._lock:
+            self._cache.clear()
+            self._tags.clear()
+            self._key_tags.clear()
+        logger_service.info(f"Cache '{self.name}' cleared")
 
     def cleanup_expired(self) -> int:
         """
-        Remove all expired items from the cache.
+        Remove all expired items from the in-process cache.
         Returns the number of items removed.
         """
-        current_time = time.time()
-        expired_keys = [key for key, item in self._cache.items() if item["expiry"] and item["expiry"] < current_time]
-
-        for key in expired_keys:
-            self.delete(key)
+        now = time.monotonic()
+        with self._lock:
+            expired_keys = [key for key, (_, expiry) in self._cache.items() if expiry is not None and expiry < now]
+            for key in expired_keys:
+                self._l1_remove(key)
+                track_cache_eviction(self.name, "expired")
 
         if expired_keys:
             logger_service.debug(f"Cleaned up {len(expired_keys)} expired cache entries")
 
         return len(expired_keys)
+
+    def __len__(self) -> int:
+        return len(self._cache)
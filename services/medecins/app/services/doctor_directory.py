@@ -0,0 +1,268 @@
+import asyncio
+import bisect
+import time
+
+import httpx
+
+from config import Config
+from models.doctor import Doctor
+from services.logger_service import logger_service
+
+
+class DoctorDirectory:
+    """
+    In-memory snapshot of doctor profiles, refreshed periodically from the auth service.
+
+    Listing queries are answered from the snapshot using secondary indexes on
+    specialty, verification status and name-token prefix, so they do not hit
+    auth/Keycloak and pagination is applied after filtering.
+    """
+
+    AUTH_PAGE_SIZE = 100  # Maximum page size accepted by /api/auth/users
+
+    def __init__(self, config):
+        self.config = config
+        self.refresh_interval = config.DOCTOR_DIRECTORY_REFRESH_INTERVAL
+        self.max_staleness = config.DOCTOR_DIRECTORY_MAX_STALENESS
+
+        self._doctors: list[dict] = []
+        self._by_specialty: dict[str, list[int]] = {}
+        self._verified: list[int] = []
+        self._name_tokens: list[tuple[str, int]] = []
+        self._loaded_at: float | None = None
+
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: asyncio.Task | None = None
+        self._pending_refresh: asyncio.Task | None = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    @property
+    def age(self) -> float | None:
+        """Seconds since the snapshot was last refreshed"""
+        return None if self._loaded_at is None else time.monotonic() - self._loaded_at
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    async def _get_service_token(self) -> str | None:
+        """Get a service token for service-to-service communication"""
+        try:
+            auth_url = f"{self.config.AUTH_SERVICE_URL}/api/auth/token"
+            payload = {
+                "client_id": self.config.AUTH_SERVICE_CLIENT_ID,
+                "client_secret": self.config.AUTH_SERVICE_CLIENT_SECRET,
+                "grant_type": "client_credentials",
+            }
+
+            async with httpx.AsyncClient(timeout=10.0) as client:
+                response = await client.post(auth_url, json=payload)
+
+                if response.status_code != 200:
+                    logger_service.error(f"Failed to get service token: {response.status_code} - {response.text}")
+                    return None
+
+                return response.json().get("access_token")
+        except Exception as e:
+            logger_service.error(f"Failed to get service token: {e!s}")
+            return None
+
+    async def _fetch_all(self, token: str) -> list[dict]:
+        """Page through every doctor known to the auth service"""
+        auth_url = f"{self.config.AUTH_SERVICE_URL}/api/auth/users"
+        headers = {"Authorization": f"Bearer {token}"}
+        users: list[dict] = []
+
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            first = 0
+            while True:
+                params = {"role": "doctor", "first": first, "max": self.AUTH_PAGE_SIZE}
+                response = await client.get(auth_url, headers=headers, params=params)
+                if response.status_code != 200:
+                    raise RuntimeError(f"Failed to get doctors list: {response.status_code} - {response.text}")
+
+                page = response.json()
+                users.extend(page)
+                if len(page) < self.AUTH_PAGE_SIZE:
+                    return users
+                first += self.AUTH_PAGE_SIZE
+
+    @staticmethod
+    def _to_item(user_data: dict) -> dict:
+        """Convert a Keycloak user record into a directory entry"""
+        doctor = Doctor.from_keycloak_data(user_data)
+        return {
+            "id": doctor._id,
+            "name": doctor.name,
+            "email": doctor.email,
+            "specialty": doctor.specialty,
+            "phone": doctor.phone,
+            "address": doctor.address,
+            "profile_picture": getattr(doctor, "profile_picture", None),
+            "is_verified": doctor.is_verified,
+            "bio": getattr(doctor, "bio", None),
+            "license_number": getattr(doctor, "license_number", None),
+            "hospital": getattr(doctor, "hospital", None),
+            "education": getattr(doctor, "education", None),
+            "experience": getattr(doctor, "experience", None),
+        }
+
+    def _build(self, doctors: list[dict]) -> None:
+        """Swap in a new snapshot and rebuild the secondary indexes"""
+        doctors = sorted(doctors, key=lambda d: (d["name"].lower(), d["id"] or ""))
+
+        by_specialty: dict[str, list[int]] = {}
+        verified: list[int] = []
+        name_tokens: list[tuple[str, int]] = []
+
+        for position, doctor in enumerate(doctors):
+            if doctor["specialty"]:
+                by_specialty.setdefault(doctor["specialty"].lower(), []).append(position)
+            if doctor["is_verified"]:
+                verified.append(position)
+            for token in set(doctor["name"].lower().split()):
+                name_tokens.append((token, position))
+
+        name_tokens.sort()
+
+        # Assign all at once so concurrent readers never see a half-built index
+        self._doctors, self._by_specialty, self._verified, self._name_tokens = (
+            doctors,
+            by_specialty,
+            verified,
+            name_tokens,
+        )
+        self._loaded_at = time.monotonic()
+
+    async def refresh(self, token: str | None = None, only_if_missing: bool = False) -> bool:
+        """
+        Reload the snapshot from the auth service. Uses a service token, falling
+        back to the given caller token. Returns False if the refresh failed.
+        With only_if_missing, callers queued behind a cold-start load reuse its result.
+        """
+        async with self._refresh_lock:
+            if only_if_missing and self.is_loaded:
+                return True
+            try:
+                token = await self._get_service_token() or token
+                if not token:
+                    logger_service.warning("Doctor directory refresh skipped: no token available")
+                    return False
+
+                start = time.monotonic()
+                users = await self._fetch_all(token)
+                self._build([self._to_item(user) for user in users])
+                logger_service.info(f"Doctor directory refreshed with {len(self._doctors)} doctors in {time.monotonic() - start:.2f}s")
+                return True
+            except Exception as e:
+                logger_service.error(f"Error refreshing doctor directory: {e!s}")
+                return False
+
+    async def ensure_fresh(self, token: str) -> None:
+        """
+        Make sure a snapshot is available. Blocks only on a cold start; a stale
+        snapshot keeps being served while a refresh runs in the background.
+        """
+        if not self.is_loaded:
+            await self.refresh(token, only_if_missing=True)
+            if not self.is_loaded:
+                raise RuntimeError("Doctor directory is not available")
+        elif self.age > self.max_staleness and not self._refresh_lock.locked():
+            self._pending_refresh = asyncio.create_task(self.refresh(token))
+
+    def upsert(self, user_data: dict) -> None:
+        """Apply a single updated profile to the snapshot without waiting for the next refresh"""
+        if not self.is_loaded:
+            return
+        item = self._to_item(user_data)
+        doctors = [d for d in self._doctors if d["id"] != item["id"]]
+        doctors.append(item)
+        loaded_at = self._loaded_at
+        self._build(doctors)
+        # A single upsert does not make the rest of the snapshot any fresher
+        self._loaded_at = loaded_at
+
+    # ------------------------------------------------------------------
+    # Background refresh
+    # ------------------------------------------------------------------
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self) -> None:
+        """Start periodic background refreshes"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+            logger_service.info(f"Doctor directory background refresh started (interval={self.refresh_interval}s)")
+
+    async def stop(self) -> None:
+        """Stop periodic background refreshes"""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _name_prefix_matches(self, prefix: str) -> set[int]:
+        """Positions of doctors having a name token starting with prefix"""
+        start = bisect.bisect_left(self._name_tokens, (prefix,))
+        matches = set()
+        for token, position in self._name_tokens[start:]:
+            if not token.startswith(prefix):
+                break
+            matches.add(position)
+        return matches
+
+    def search(
+        self,
+        specialty: str | None = None,
+        name: str | None = None,
+        verified_only: bool = False,
+        page: int = 1,
+        limit: int = 10,
+    ) -> dict:
+        """
+        Filter the snapshot and return one page of results sorted by name.
+        All filters are applied before pagination.
+        """
+        candidates: set[int] | None = None
+
+        def narrow(positions):
+            nonlocal candidates
+            positions = set(positions)
+            candidates = positions if candidates is None else candidates & positions
+
+        if specialty:
+            narrow(self._by_specialty.get(specialty.strip().lower(), ()))
+        if verified_only:
+            narrow(self._verified)
+        if name:
+            # Every word of the query must prefix-match one of the name's words
+            for term in name.lower().split():
+                narrow(self._name_prefix_matches(term))
+
+        positions = range(len(self._doctors)) if candidates is None else sorted(candidates)
+        total = len(positions)
+        skip = (page - 1) * limit
+
+        return {
+            "items": [self._doctors[position] for position in positions[skip : skip + limit]],
+            "total": total,
+            "page": page,
+            "pages": (total + limit - 1) // limit,
+        }
+
+
+# Shared by all requests in the process
+doctor_directory = DoctorDirectory(Config)
@@ -81,6 +81,22 @@ CACHE_MISS = meter.create_counter(
     description="Total number of cache misses for medecins service",
 )
 
+CACHE_EVICTIONS = meter.create_counter(
+    name="medecins_service_cache_evictions_total",
+    description="Number of cache entries evicted (by size or expiry) for medecins service",
+)
+
+# OCR metrics
+OCR_REQUESTS = meter.create_counter(
+    name="medecins_service_ocr_requests_total",
+    description="Number of OCR requests by outcome for medecins service",
+)
+
+OCR_DURATION = meter.create_histogram(
+    name="medecins_service_ocr_duration_seconds",
+    description="OCR processing time in seconds for medecins service",
+)
+
 # Service dependency metrics
 SERVICE_DEPENDENCY_UP = meter.create_up_down_counter(
     name="medecins_service_dependency_up",
@@ -192,6 +208,24 @@ def track_cache_metrics(hit: bool, cache_name: str):
         logger_service.warning(f"Error tracking cache metrics: {e!s}")
 
 
+def track_cache_eviction(cache_name: str, reason: str):
+    """Track cache evictions by reason (size or expired)"""
+    try:
+        CACHE_EVICTIONS.add(1, {"cache_name": cache_name, "reason": reason})
+    except Exception as e:
+        logger_service.warning(f"Error tracking cache eviction: {e!s}")
+
+
+def track_ocr_request(outcome: str, duration: float | None = None):
+    """Track an OCR request outcome (hit, success, timeout, busy, error) and its processing time"""
+    try:
+        OCR_REQUESTS.add(1, {"outcome": outcome})
+        if duration is not None:
+            OCR_DURATION.record(duration, {"outcome": outcome})
+    except Exception as e:
+        logger_service.warning(f"Error tracking OCR metrics: {e!s}")
+
+
 def track_dependency_status(service: str, is_available: bool):
     """Track service dependency availability"""
     try:
@@ -0,0 +1,51 @@
+import httpx
+
+from config import Config
+from services.logger_service import logger_service
+
+
+class ProfileAssetError(Exception):
+    """Raised when the medfiles service cannot store or serve a profile asset"""
+
+
+async def upload_profile_asset(token: str, kind: str, filename: str, content: bytes, content_type: str) -> dict:
+    """
+    Store a profile picture or signature in the medfiles service.
+
+    Returns:
+        Dict with the asset version and the URL of each resized variant
+    """
+    url = f"{Config.MEDFILES_SERVICE_URL}/api/profile-assets/{kind}"
+    headers = {"Authorization": f"Bearer {token}"}
+    files = {"file": (filename, content, content_type)}
+
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        response = await client.post(url, headers=headers, files=files)
+
+    if response.status_code == 400:
+        raise ValueError(response.json().get("detail", "Invalid image"))
+    if response.status_code != 200:
+        logger_service.error(f"Failed to store {kind} in medfiles: {response.status_code} - {response.text}")
+        raise ProfileAssetError(f"Failed to store {kind}")
+
+    return response.json()
+
+
+async def fetch_profile_asset(token: str, doctor_id: str, kind: str, version: str, variant: str = "original") -> tuple[bytes, str]:
+    """
+    Read a stored profile asset from the medfiles service.
+
+    Returns:
+        Tuple of (data, content_type)
+    """
+    url = f"{Config.MEDFILES_SERVICE_URL}/api/profile-assets/{doctor_id}/{kind}/{version}/{variant}"
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        response = await client.get(url, headers=headers)
+
+    if response.status_code != 200:
+        logger_service.error(f"Failed to read {kind} from medfiles: {response.status_code} - {response.text}")
+        raise ProfileAssetError(f"Failed to read {kind}")
+
+    return response.content, response.headers.get("content-type", "image/png")
@@ -1,4 +1,3 @@
-import json
 import uuid
 from datetime import datetime
 from typing import Any
@@ -18,7 +17,7 @@ class RadiologyService:
     def __init__(self):
         self.config = Config
         self.rabbitmq_client = RabbitMQClient(self.config)
-        self.cache_service = CacheService()
+        self.cache_service = CacheService.from_config("radiology", self.config)
         self.circuit_breaker = CircuitBreaker(
             name="radiology_service",
             failure_threshold=self.config.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
@@ -48,35 +47,29 @@ class RadiologyService:
         """
         Get radiology reports for a specific doctor
         """
-        # Check cache first
-        cache_key = f"radiology:reports:doctor:{doctor_id}:{status}:{page}:{limit}"
-        cached_data = self.cache_service.get(cache_key)
-        if cached_data:
-            return json.loads(cached_data)
-
         # Build query params
         params = {"doctor_id": doctor_id, "page": page, "limit": limit}
         if status:
             params["status"] = status
 
-        # Make request to radiology service
-        try:
+        async def fetch_reports() -> dict[str, Any]:
             async with aiohttp.ClientSession() as session:
                 url = f"{self.api_base_url}/api/reports"
                 async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        reports = await response.json()
-                        # Cache results
-                        self.cache_service.set(
-                            cache_key,
-                            json.dumps(reports),
-                            expiry=60,  # Cache for 1 minute
-                        )
-                        return reports
-                    else:
+                    if response.status != 200:
                         error_body = await response.text()
                         logger_service.error(f"Error retrieving radiology reports: {response.status} - {error_body}")
-                        return {"items": [], "total": 0, "page": page, "pages": 0}
+                        response.raise_for_status()
+                    return await response.json()
+
+        # Make request to radiology service, cached for 1 minute
+        try:
+            return await self.cache_service.get_or_load(
+                f"radiology:reports:doctor:{doctor_id}:{status}:{page}:{limit}",
+                fetch_reports,
+                ttl=60,
+                tags=[f"radiology:reports:doctor:{doctor_id}"],
+            )
         except Exception as e:
             logger_service.error(f"Error retrieving radiology reports: {e!s}")
             return {"items": [], "total": 0, "page": page, "pages": 0}
@@ -85,30 +78,21 @@ class RadiologyService:
         """
         Get details for a specific radiology report
         """
-        # Check cache first
-        cache_key = f"radiology:report:{report_id}"
-        cached_data = self.cache_service.get(cache_key)
-        if cached_data:
-            return json.loads(cached_data)
-
-        # Make request to radiology service
-        try:
+        async def fetch_report() -> dict[str, Any] | None:
             async with aiohttp.ClientSession() as session:
                 url = f"{self.api_base_url}/api/reports/{report_id}"
                 async with session.get(url) as response:
-                    if response.status == 200:
-                        report = await response.json()
-                        # Cache results
-                        self.cache_service.set(
-                            cache_key,
-                            json.dumps(report),
-                            expiry=300,  # Cache for 5 minutes
-                        )
-                        return report
-                    else:
+                    if response.status == 404:
+                        return None
+                    if response.status != 200:
                         error_body = await response.text()
                         logger_service.error(f"Error retrieving radiology report: {response.status} - {error_body}")
-                        return None
+                        response.raise_for_status()
+                    return await response.json()
+
+        # Make request to radiology service, cached for 5 minutes
+        try:
+            return await self.cache_service.get_or_load(f"radiology:report:{report_id}", fetch_report, ttl=300)
         except Exception as e:
             logger_service.error(f"Error retrieving radiology report: {e!s}")
             return None
@@ -1,94 +1,145 @@
 import json
 
 import redis
+import redis.asyncio as aioredis
 
 from services.logger_service import logger_service
 from services.metrics import track_cache_metrics
 
+# Connection pools shared by every client in the process, keyed by URL
+_async_pools: dict[str, aioredis.ConnectionPool] = {}
+_sync_pools: dict[str, redis.ConnectionPool] = {}
+
+
+def get_connection_pool(config) -> aioredis.ConnectionPool:
+    """Get the process-wide async connection pool for the configured Redis"""
+    pool = _async_pools.get(config.REDIS_URL)
+    if pool is None:
+        pool = aioredis.ConnectionPool.from_url(
+            config.REDIS_URL,
+            max_connections=config.REDIS_MAX_CONNECTIONS,
+            decode_responses=True,
+        )
+        _async_pools[config.REDIS_URL] = pool
+    return pool
+
+
+def get_sync_client(config) -> redis.Redis:
+    """Get a blocking Redis client on a shared pool, for use from RabbitMQ consumer threads"""
+    pool = _sync_pools.get(config.REDIS_URL)
+    if pool is None:
+        pool = redis.ConnectionPool.from_url(
+            config.REDIS_URL,
+            max_connections=config.REDIS_MAX_CONNECTIONS,
+            decode_responses=True,
+        )
+        _sync_pools[config.REDIS_URL] = pool
+    return redis.Redis(connection_pool=pool)
+
 
 class RedisClient:
-    """Redis client service for caching"""
+    """Async Redis client service for caching"""
 
     def __init__(self, config):
         self.config = config
 
-        # Initialize Redis client
-        self.client = redis.Redis(
-            host=config.REDIS_HOST,
-            port=config.REDIS_PORT,
-            password=config.REDIS_PASSWORD,
-            decode_responses=True,
-        )
+        # Initialize Redis client on the shared connection pool
+        self.client = aioredis.Redis(connection_pool=get_connection_pool(config))
         self.ttl = config.CACHE_TTL
 
-    def get(self, key):
+    def pipeline(self, transaction=True):
+        """
+        Create a pipeline to batch several commands into one round trip.
+        With transaction=True the commands are wrapped in MULTI/EXEC.
+        """
+        return self.client.pipeline(transaction=transaction)
+
+    async def get(self, key):
         """Get value from cache"""
         try:
-            value = self.client.get(key)
+            value = await self.client.get(key)
             if value:
-                track_cache_metrics(hit=True, cache_name="reports")
+                track_cache_metrics(hit=True, cache_name="medecins")
                 return value
-            track_cache_metrics(hit=False, cache_name="reports")
+            track_cache_metrics(hit=False, cache_name="medecins")
             return None
         except Exception as e:
             logger_service.error(f"Redis get error: {e!s}")
             return None
 
-    def set(self, key, value, ttl=None):
+    async def set(self, key, value, ttl=None):
         """Set value in cache"""
         try:
             ttl = ttl or self.ttl
-            self.client.setex(key, ttl, value)
+            await self.client.setex(key, ttl, value)
             return True
         except Exception as e:
             logger_service.error(f"Redis set error: {e!s}")
             return False
 
-    def delete(self, key):
+    async def delete(self, key):
         """Delete key from cache"""
         try:
-            self.client.delete(key)
+            await self.client.delete(key)
             return True
         except Exception as e:
             logger_service.error(f"Redis delete error: {e!s}")
             return False
 
-    def get_report(self, report_id):
-        """Get report from cache"""
+    async def set_many(self, mapping, ttl=None):
+        """Set several JSON values with the same TTL in a single transaction"""
         try:
-            cached_report = self.get(f"report:{report_id}")
-            if cached_report:
-                return json.loads(cached_report)
-            return None
+            ttl = ttl or self.ttl
+            async with self.pipeline() as pipe:
+                for key, value in mapping.items():
+                    pipe.setex(key, ttl, json.dumps(value))
+                await pipe.execute()
+            return True
         except Exception as e:
-            logger_service.error(f"Redis get_report error: {e!s}")
-            return None
+            logger_service.error(f"Redis set_many error: {e!s}")
+            return False
 
-    def cache_report(self, report_id, report_data):
-        """Cache report data"""
+    async def mget_json(self, keys):
+        """Get several JSON values in one round trip. Missing keys are returned as None"""
+        if not keys:
+            return []
         try:
-            self.set(f"report:{report_id}", json.dumps(report_data))
-            return True
+            values = await self.client.mget(keys)
+            return [json.loads(value) if value else None for value in values]
         except Exception as e:
-            logger_service.error(f"Redis cache_report error: {e!s}")
-            return False
+            logger_service.error(f"Redis mget error: {e!s}")
+            return [None] * len(keys)
+
+    async def get_set_records(self, index_key, record_prefix):
+        """
+        Load every record referenced by an index set (e.g. doctor:{id}:appointments)
+        with one SMEMBERS and one MGET. Ids whose record has expired are skipped.
+        """
+        try:
+            ids = sorted(await self.client.smembers(index_key))
+        except Exception as e:
+            logger_service.error(f"Redis smembers error: {e!s}")
+            return []
+
+        records = await self.mget_json([f"{record_prefix}:{record_id}" for record_id in ids])
+        return [record for record in records if record is not None]
 
-    def invalidate_report(self, report_id):
-        """Invalidate cached report"""
-        return self.delete(f"report:{report_id}")
+    async def get_doctor_appointments(self, doctor_id):
+        """Get all appointment records stored for a doctor"""
+        return await self.get_set_records(f"doctor:{doctor_id}:appointments", "appointment")
 
-    def close(self):
+    async def close(self):
         """Close Redis connection"""
         try:
-            self.client.close()
+            await self.client.aclose()
             logger_service.info("Closed Redis connection")
         except Exception as e:
             logger_service.error(f"Error closing Redis connection: {e!s}")
 
-    def check_health(self):
+    async def check_health(self):
         """Check Redis health"""
         try:
-            self.client.ping()
+            await self.client.ping()
             return "UP"
         except Exception as e:
             return f"DOWN: {e!s}"
@@ -4,12 +4,15 @@ import base64
 import os
 
 import uvicorn
-from fastapi import Depends, FastAPI, File, Form, HTTPException, Query, UploadFile
+from fastapi import Depends, FastAPI, File, Form, HTTPException, Query, Request, Response, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import RedirectResponse, StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
-from models.file_models import FileListResponse, FileMetadata, FileResponse
-from services.auth_service import get_current_user
+from config import Config
+from models.file_models import FileListResponse, FileMetadata, FileResponse, ProfileAssetResponse
+from services.auth_service import get_authenticated_user_from_auth_service, get_current_user
+from services.image_variants import ALLOWED_CONTENT_TYPES, VARIANT_SIZES, build_variants, content_version
 from services.logger_service import LoggerService
 from services.minio_service import MinioService
 
@@ -31,6 +34,7 @@ app.add_middleware(
 )
 
 minio_service = MinioService()
+optional_security = HTTPBearer(auto_error=False)
 
 
 @app.on_event("startup")
@@ -39,6 +43,7 @@ async def startup_event():
     await minio_service.create_bucket("medicalimages")
     await minio_service.create_bucket("radiologyimages")
     await minio_service.create_bucket("patientdocuments")
+    await minio_service.create_bucket(Config.PROFILE_ASSETS_BUCKET)
     logger.info("MedFiles service started")
 
 
@@ -319,6 +324,114 @@ async def stream_shared_object(
         raise HTTPException(status_code=500, detail=f"Error processing shared stream: {e!s}")
 
 
+def _profile_asset_url(user_id: str, kind: str, version: str, variant: str) -> str:
+    """Public URL of a profile asset, built the same way as streaming URLs"""
+    host = os.getenv("SERVICE_HOST", "localhost")
+    port = os.getenv("PORT", "8088")
+    return f"http://{host}:{port}/api/profile-assets/{user_id}/{kind}/{version}/{variant}"
+
+
+@app.post("/api/profile-assets/{kind}", response_model=ProfileAssetResponse)
+async def upload_profile_asset(
+    kind: str,
+    file: UploadFile = File(...),
+    user_info: dict = Depends(get_current_user),
+):
+    """
+    Store a profile picture or signature for the authenticated user.
+
+    The image is decoded once and stored as resized variants under a content-hash
+    version, so the returned URLs are immutable and can be cached indefinitely.
+    Previous versions are removed.
+    """
+    if kind not in VARIANT_SIZES:
+        raise HTTPException(status_code=404, detail=f"Unknown profile asset kind: {kind}")
+    if file.content_type not in ALLOWED_CONTENT_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid file format. Please upload a JPEG or PNG image.")
+
+    content = await file.read()
+    if len(content) > Config.PROFILE_ASSET_MAX_SIZE:
+        raise HTTPException(status_code=400, detail="File size too large. Maximum size is 5MB.")
+
+    user_id = user_info.get("user_id")
+    try:
+        # Image decoding and resizing is CPU bound, keep it off the event loop
+        variants = await asyncio.get_event_loop().run_in_executor(minio_service.executor, build_variants, content, kind)
+    except Exception as e:
+        logger.error(f"Error decoding {kind} image for {user_id}: {e!s}")
+        raise HTTPException(status_code=400, detail="Invalid image file")
+
+    version = content_version(content)
+    prefix = f"{user_id}/{kind}/"
+    version_prefix = f"{prefix}{version}/"
+
+    try:
+        await asyncio.gather(
+            *(
+                minio_service.put_bytes(
+                    Config.PROFILE_ASSETS_BUCKET,
+                    f"{version_prefix}{variant}",
+                    data,
+                    content_type,
+                    metadata={"uploaded_by": user_id, "kind": kind, "variant": variant},
+                )
+                for variant, (data, content_type, _) in variants.items()
+            )
+        )
+        await minio_service.delete_prefix(Config.PROFILE_ASSETS_BUCKET, prefix, keep_prefix=version_prefix)
+    except Exception as e:
+        logger.error(f"Error storing {kind} for {user_id}: {e!s}")
+        raise HTTPException(status_code=500, detail=f"Error storing {kind}: {e!s}")
+
+    logger.info(f"Stored {kind} version {version} for user {user_id}")
+    return ProfileAssetResponse(
+        user_id=user_id,
+        kind=kind,
+        version=version,
+        content_type=variants["original"][1],
+        urls={variant: _profile_asset_url(user_id, kind, version, variant) for variant in variants},
+    )
+
+
+@app.get("/api/profile-assets/{user_id}/{kind}/{version}/{variant}")
+async def get_profile_asset(
+    user_id: str,
+    kind: str,
+    version: str,
+    variant: str,
+    request: Request,
+    credentials: HTTPAuthorizationCredentials | None = Depends(optional_security),
+):
+    """
+    Serve a stored profile asset with long-lived caching headers.
+
+    Profile pictures are public; signatures require an authenticated caller.
+    """
+    if variant not in VARIANT_SIZES.get(kind, {}):
+        raise HTTPException(status_code=404, detail="Profile asset not found")
+
+    if kind == "signature":
+        if credentials is None:
+            raise HTTPException(status_code=401, detail="Authentication required")
+        await get_authenticated_user_from_auth_service(credentials.credentials)
+
+    # The version is a content hash, so it doubles as a strong ETag
+    etag = f'"{version}-{variant}"'
+    cache_control = f"{'private' if kind == 'signature' else 'public'}, max-age={Config.PROFILE_ASSET_CACHE_MAX_AGE}, immutable"
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    try:
+        data, content_type, _ = await minio_service.get_bytes(Config.PROFILE_ASSETS_BUCKET, f"{user_id}/{kind}/{version}/{variant}")
+    except Exception as e:
+        logger.error(f"Error reading profile asset {user_id}/{kind}/{version}/{variant}: {e!s}")
+        raise HTTPException(status_code=404, detail="Profile asset not found")
+
+    return Response(content=data, media_type=content_type, headers=headers)
+
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8088))
     uvicorn.run("app:app", host="0.0.0.0", port=port, reload=False)
@@ -50,5 +50,10 @@ class Config:
     OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
     OTEL_SERVICE_NAME = SERVICE_NAME
 
+    # Profile assets (profile pictures and signatures)
+    PROFILE_ASSETS_BUCKET = os.getenv("PROFILE_ASSETS_BUCKET", "profileassets")
+    PROFILE_ASSET_MAX_SIZE = int(os.getenv("PROFILE_ASSET_MAX_SIZE", 5242880))  # 5MB
+    PROFILE_ASSET_CACHE_MAX_AGE = int(os.getenv("PROFILE_ASSET_CACHE_MAX_AGE", 31536000))  # 1 year, URLs are versioned
+
     # Maximum file size for uploads (100MB)
     MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", 104857600))
@@ -60,3 +60,13 @@ class FileRequest(BaseModel):
     bucket: str = ("",)
     folder: str | None = (None,)
     metadata: dict | None = (None,)
+
+
+class ProfileAssetResponse(BaseModel):
+    """Response model for profile picture and signature uploads"""
+
+    user_id: str
+    kind: str
+    version: str
+    content_type: str
+    urls: dict[str, str]
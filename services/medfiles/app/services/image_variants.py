@@ -0,0 +1,56 @@
+import hashlib
+import io
+
+from PIL import Image, ImageOps
+
+# Longest side in pixels for each stored variant, per asset kind
+VARIANT_SIZES = {
+    "picture": {"original": 1024, "medium": 256, "thumbnail": 64},
+    "signature": {"original": 1024, "small": 320},
+}
+
+ALLOWED_CONTENT_TYPES = {"image/jpeg", "image/jpg", "image/png"}
+
+
+def content_version(content: bytes) -> str:
+    """Short content hash used as the immutable version of an asset"""
+    return hashlib.sha256(content).hexdigest()[:16]
+
+
+def _encode(image: Image.Image, keep_alpha: bool) -> tuple[bytes, str, str]:
+    """Encode an image as PNG when transparency matters, JPEG otherwise"""
+    buffer = io.BytesIO()
+    if keep_alpha:
+        image.save(buffer, format="PNG", optimize=True)
+        return buffer.getvalue(), "image/png", "png"
+
+    image.convert("RGB").save(buffer, format="JPEG", quality=85, optimize=True, progressive=True)
+    return buffer.getvalue(), "image/jpeg", "jpg"
+
+
+def build_variants(content: bytes, kind: str) -> dict[str, tuple[bytes, str, str]]:
+    """
+    Decode an uploaded image once and produce every resized variant for its kind.
+
+    Signatures always keep an alpha channel so they can be overlaid on documents.
+
+    Returns:
+        Mapping of variant name to (data, content_type, extension)
+    """
+    sizes = VARIANT_SIZES[kind]
+
+    with Image.open(io.BytesIO(content)) as source:
+        # Apply EXIF orientation so thumbnails are not rotated
+        image = ImageOps.exif_transpose(source)
+        keep_alpha = kind == "signature" or image.mode in ("RGBA", "LA", "P")
+        image = image.convert("RGBA" if keep_alpha else "RGB")
+
+    variants = {}
+    # Resize from largest to smallest, reusing the previous result as the source
+    for name, max_side in sorted(sizes.items(), key=lambda item: -item[1]):
+        if max(image.size) > max_side:
+            image = image.copy()
+            image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        variants[name] = _encode(image, keep_alpha)
+
+    return variants
@@ -1,4 +1,5 @@
 import asyncio
+import io
 import os
 import tempfile
 import uuid
@@ -333,6 +334,82 @@ class MinioService:
             logger.error(f"Error deleting file: {e!s}")
             raise
 
+    async def put_bytes(
+        self,
+        bucket_name: str,
+        object_name: str,
+        data: bytes,
+        content_type: str,
+        metadata: dict | None = None,
+    ) -> str:
+        """
+        Upload an in-memory object without going through a temporary file
+
+        Returns:
+            The ETag assigned by MinIO
+        """
+        try:
+            result = await asyncio.get_event_loop().run_in_executor(
+                self.executor,
+                lambda: self.client.put_object(
+                    bucket_name,
+                    object_name,
+                    io.BytesIO(data),
+                    length=len(data),
+                    content_type=content_type,
+                    metadata=metadata,
+                ),
+            )
+            logger.info(f"Object stored: {object_name} in bucket {bucket_name} ({len(data)} bytes)")
+            return result.etag
+        except S3Error as e:
+            logger.error(f"S3 error storing object: {e!s}")
+            raise
+
+    async def get_bytes(self, bucket_name: str, object_name: str) -> tuple[bytes, str, str]:
+        """
+        Read a small object fully into memory
+
+        Returns:
+            Tuple of (data, content_type, etag)
+        """
+
+        def _read():
+            response = self.client.get_object(bucket_name, object_name)
+            try:
+                return response.read(), response.headers.get("Content-Type"), response.headers.get("ETag", "").strip('"')
+            finally:
+                response.close()
+                response.release_conn()
+
+        return await asyncio.get_event_loop().run_in_executor(self.executor, _read)
+
+    async def delete_prefix(self, bucket_name: str, prefix: str, keep_prefix: str | None = None) -> int:
+        """
+        Delete every object under a prefix, except those under keep_prefix
+
+        Returns:
+            Number of objects deleted
+        """
+
+        def _delete():
+            deleted = 0
+            for obj in self.client.list_objects(bucket_name, prefix=prefix, recursive=True):
+                if keep_prefix and obj.object_name.startswith(keep_prefix):
+                    continue
+                self.client.remove_object(bucket_name, obj.object_name)
+                deleted += 1
+            return deleted
+
+        try:
+            deleted = await asyncio.get_event_loop().run_in_executor(self.executor, _delete)
+            if deleted:
+                logger.info(f"Deleted {deleted} objects under {prefix} in bucket {bucket_name}")
+            return deleted
+        except S3Error as e:
+            logger.error(f"S3 error deleting prefix {prefix}: {e!s}")
+            raise
+
     async def update_metadata(self, bucket_name: str, object_name: str, metadata: dict) -> bool:
         """
         Update metadata for a specific file
@@ -44,12 +44,19 @@ tracing_service = TracingService(Config)
 # Create routes (import here to avoid circular imports)
 from routes.integration_routes import router as integration_router
 from routes.radiologist_routes import router as radiologist_router
+from services.ocr_service import ocr_service
 
 # Include routers
 app.include_router(integration_router)
 app.include_router(radiologist_router)
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Clean up resources on application shutdown"""
+    ocr_service.close()
+
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -89,6 +89,15 @@ class Config:
     CACHE_REDIS_URL = REDIS_URL
     CACHE_DEFAULT_TIMEOUT = CACHE_TTL
 
+    # OCR settings
+    OCR_WORKERS = int(os.getenv("OCR_WORKERS", "2"))
+    OCR_MAX_PENDING = int(os.getenv("OCR_MAX_PENDING", "8"))
+    OCR_TIMEOUT = int(os.getenv("OCR_TIMEOUT", "20"))
+    OCR_TARGET_DPI = int(os.getenv("OCR_TARGET_DPI", "300"))
+    OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "2000"))
+    OCR_CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", "256"))
+    OCR_CACHE_TTL = int(os.getenv("OCR_CACHE_TTL", "3600"))
+
     # Rate limiting
     RATE_LIMIT_STORAGE_URL = os.getenv(
         "RATE_LIMIT_STORAGE_URL",
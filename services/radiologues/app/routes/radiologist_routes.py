@@ -1,6 +1,4 @@
 import base64
-import io
-import re
 from datetime import datetime
 
 import httpx
@@ -13,9 +11,7 @@ from fpdf import FPDF
 # Create HTTPBearer instance
 security = HTTPBearer()
 
-import pytesseract
 from bs4 import BeautifulSoup
-from PIL import Image
 
 from config import Config
 from models.api_models import (
@@ -33,6 +29,15 @@ from models.radiologue import (
     RadiologueInDB,
 )
 from services.logger_service import logger_service
+from services.ocr_service import (
+    OCRBusyError,
+    OCRTimeoutError,
+    extract_email,
+    extract_name,
+    extract_phone,
+    extract_specialty,
+    ocr_service,
+)
 from services.rabbitmq_client import RabbitMQClient
 
 http_client = httpx.AsyncClient(timeout=30.0)
@@ -670,15 +675,8 @@ async def verify_radiologue(request: VerifyRadiologueRequest, user_info: dict =
 
         logger_service.debug(f"Checking for Name='{radiologue_name}'")
 
-        # Process the image
-        image = Image.open(io.BytesIO(base64.b64decode(image_data)))
-
-        # Enhance image quality for better OCR
-        image = image.convert("L")  # Convert to grayscale
-        image = image.point(lambda x: 0 if x < 128 else 255, "1")  # Enhance contrast
-
-        # Extract text from image
-        extracted_text = pytesseract.image_to_string(image)
+        # Extract text from the image in the OCR worker pool, binarized for better contrast
+        extracted_text = await ocr_service.image_to_text(base64.b64decode(image_data), binarize=True)
         extracted_text = extracted_text.lower().strip()
 
         logger_service.debug(f"Extracted text: {extracted_text}")
@@ -720,6 +718,12 @@ async def verify_radiologue(request: VerifyRadiologueRequest, user_info: dict =
 
     except HTTPException:
         raise
+    except OCRBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except OCRTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger_service.error(f"Verification error: {e!s}")
         raise HTTPException(status_code=500, detail=f"Verification failed: {e!s}")
@@ -735,11 +739,8 @@ async def scan_visit_card(request: ScanVisitCardRequest):
         raise HTTPException(status_code=400, detail="No image provided")
 
     try:
-        # Decode base64 image
-        image = Image.open(io.BytesIO(base64.b64decode(request.image)))
-
-        # Perform OCR using pytesseract
-        text = pytesseract.image_to_string(image)
+        # Perform OCR in the worker pool
+        text = await ocr_service.image_to_text(base64.b64decode(request.image))
 
         # Extract relevant information
         name = extract_name(text)
@@ -753,6 +754,12 @@ async def scan_visit_card(request: ScanVisitCardRequest):
             specialty=specialty,
             phone=phone,
         )
+    except OCRBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except OCRTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1009,74 +1016,6 @@ async def create_radiology_report(
         raise HTTPException(status_code=500, detail=f"Failed to create radiology report: {e!s}")
 
 
-# Extraction helper functions
-def extract_name(text):
-    # Look for patterns that might indicate a name
-    # Usually names appear at the beginning or after "Dr." or similar titles
-    lines = text.split("\n")
-    for line in lines:
-        # Look for "Dr." or similar titles
-        name_match = re.search(
-            r"(?:Dr\.?|Radiologue)\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)",
-            line,
-            re.IGNORECASE,
-        )
-        if name_match:
-            return name_match.group(1)
-
-        # Look for capitalized words that might be names
-        name_match = re.search(r"([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)", line)
-        if name_match:
-            return name_match.group(1)
-    return ""
-
-
-def extract_email(text):
-    # Implement logic to extract email from text
-    email_match = re.search(r"[\w\.-]+@[\w\.-]+", text)
-    if email_match:
-        return email_match.group(0)
-    return ""
-
-
-def extract_specialty(text):
-    # Common medical specialties
-    specialties = [
-        "Cardiology",
-        "Dermatology",
-        "Neurology",
-        "Pediatrics",
-        "Oncology",
-        "Orthopedics",
-        "Gynecology",
-        "Psychiatry",
-        "Surgery",
-        "Internal Medicine",
-        "Radiology",
-    ]
-
-    lines = text.split("\n")
-    for line in lines:
-        # Check for known specialties
-        for specialty in specialties:
-            if specialty.lower() in line.lower():
-                return line.strip()
-
-        # Look for patterns that might indicate a specialty
-        specialty_match = re.search(r"(?:Specialist|Consultant)\s+in\s+([A-Za-z\s]+)", line)
-        if specialty_match:
-            return specialty_match.group(1).strip()
-    return ""
-
-
-def extract_phone(text):
-    # Basic pattern to match phone formats, can be refined
-    phone_match = re.search(r"(\+?\d[\d\s\-]{7,}\d)", text)
-    if phone_match:
-        return phone_match.group(0).strip()
-    return ""
-
-
 def scrape_medtn_radiologues():
     """Scrapes radiologists data from med.tn"""
     try:
@@ -71,6 +71,17 @@ CACHE_MISSES = meter.create_counter(
     description="Number of cache misses for radiologues service",
 )
 
+# OCR metrics
+OCR_REQUESTS = meter.create_counter(
+    name="radiologues_service_ocr_requests_total",
+    description="Number of OCR requests by outcome for radiologues service",
+)
+
+OCR_DURATION = meter.create_histogram(
+    name="radiologues_service_ocr_duration_seconds",
+    description="OCR processing time in seconds for radiologues service",
+)
+
 # Service dependency metrics
 SERVICE_DEPENDENCY_UP = meter.create_up_down_counter(
     name="radiologues_service_dependency_up",
@@ -180,6 +191,16 @@ def track_cache_metrics(hit: bool, cache_name: str):
         logger_service.warning(f"Error tracking cache metrics: {e!s}")
 
 
+def track_ocr_request(outcome: str, duration: float | None = None):
+    """Track an OCR request outcome (hit, success, timeout, busy, error) and its processing time"""
+    try:
+        OCR_REQUESTS.add(1, {"outcome": outcome})
+        if duration is not None:
+            OCR_DURATION.record(duration, {"outcome": outcome})
+    except Exception as e:
+        logger_service.warning(f"Error tracking OCR metrics: {e!s}")
+
+
 def track_dependency_status(service: str, is_available: bool):
     """Track service dependency availability"""
     try:
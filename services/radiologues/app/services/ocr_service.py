@@ -0,0 +1,309 @@
+import asyncio
+import hashlib
+import io
+import re
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytesseract
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from config import Config
+from services.logger_service import logger_service
+from services.metrics import track_ocr_request
+
+# Candidate skew angles in degrees, tried on a downscaled copy of the image
+DESKEW_ANGLES = [step / 2 for step in range(-10, 11)]
+DESKEW_SAMPLE_SIZE = 800
+
+SPECIALTIES = [
+    "Cardiology",
+    "Dermatology",
+    "Neurology",
+    "Pediatrics",
+    "Oncology",
+    "Orthopedics",
+    "Gynecology",
+    "Psychiatry",
+    "Surgery",
+    "Internal Medicine",
+    "Radiology",
+]
+
+
+class OCRBusyError(Exception):
+    """Raised when too many OCR requests are already waiting for a worker"""
+
+
+class OCRTimeoutError(Exception):
+    """Raised when an OCR request does not complete within the configured timeout"""
+
+
+# ----------------------------------------------------------------------
+# Pre-processing and OCR (run inside worker processes)
+# ----------------------------------------------------------------------
+
+
+def _downscale(image: Image.Image, target_dpi: int, max_side: int) -> Image.Image:
+    """Downscale to the target DPI when the source DPI is known, and never above max_side pixels"""
+    scale = 1.0
+    source_dpi = image.info.get("dpi", (0, 0))[0]
+    if source_dpi and source_dpi > target_dpi:
+        scale = target_dpi / source_dpi
+
+    longest = max(image.size)
+    if longest * scale > max_side:
+        scale = max_side / longest
+
+    if scale >= 1.0:
+        return image
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image.resize(size, Image.Resampling.LANCZOS)
+
+
+def _estimate_skew(gray: Image.Image) -> float:
+    """
+    Estimate the text skew angle with a projection profile search.
+
+    Text lines produce the sharpest row profile (highest variance of ink per
+    row) when they are level, so the best rotation maximizes that variance.
+    """
+    sample = gray.copy()
+    sample.thumbnail((DESKEW_SAMPLE_SIZE, DESKEW_SAMPLE_SIZE))
+    ink = sample.point(lambda x: 255 if x < 128 else 0)
+
+    best_angle, best_score = 0.0, -1.0
+    for angle in DESKEW_ANGLES:
+        rotated = ink.rotate(angle, resample=Image.Resampling.BILINEAR, expand=True, fillcolor=0)
+        # Collapsing to a single column averages each row into its ink density
+        profile = list(rotated.resize((1, rotated.height), Image.Resampling.BOX).getdata())
+        mean = sum(profile) / len(profile)
+        score = sum((value - mean) ** 2 for value in profile) / len(profile)
+        if score > best_score:
+            best_angle, best_score = angle, score
+    return best_angle
+
+
+def preprocess_image(image: Image.Image, target_dpi: int, max_side: int, binarize: bool = False) -> Image.Image:
+    """Grayscale, downscale, deskew and optionally binarize an image before OCR"""
+    image = ImageOps.exif_transpose(image)
+    image = ImageOps.autocontrast(image.convert("L"))
+    image = _downscale(image, target_dpi, max_side)
+
+    angle = _estimate_skew(image)
+    if angle:
+        image = image.rotate(angle, resample=Image.Resampling.BICUBIC, expand=True, fillcolor=255)
+
+    if binarize:
+        image = image.point(lambda x: 0 if x < 128 else 255, "1")
+    return image
+
+
+def _ocr_worker(content: bytes, target_dpi: int, max_side: int, binarize: bool, timeout: int) -> str:
+    """Decode, pre-process and OCR an image. Runs in a worker process."""
+    with Image.open(io.BytesIO(content)) as image:
+        image.load()
+        prepared = preprocess_image(image, target_dpi, max_side, binarize)
+    # pytesseract kills the tesseract process once the timeout expires
+    return pytesseract.image_to_string(prepared, timeout=timeout)
+
+
+# ----------------------------------------------------------------------
+# Structured field extraction
+# ----------------------------------------------------------------------
+
+
+def extract_name(text):
+    # Look for patterns that might indicate a name
+    # Usually names appear at the beginning or after "Dr." or similar titles
+    lines = text.split("\n")
+    for line in lines:
+        # Look for "Dr." or similar titles
+        name_match = re.search(
+            r"(?:Dr\.?|Radiologue)\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)",
+            line,
+            re.IGNORECASE,
+        )
+        if name_match:
+            return name_match.group(1)
+
+        # Look for capitalized words that might be names
+        name_match = re.search(r"([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)", line)
+        if name_match:
+            return name_match.group(1)
+    return ""
+
+
+def extract_email(text):
+    # Implement logic to extract email from text
+    email_match = re.search(r"[\w\.-]+@[\w\.-]+", text)
+    if email_match:
+        return email_match.group(0)
+    return ""
+
+
+def extract_specialty(text):
+    lines = text.split("\n")
+    for line in lines:
+        # Check for known specialties
+        for specialty in SPECIALTIES:
+            if specialty.lower() in line.lower():
+                return line.strip()
+
+        # Look for patterns that might indicate a specialty
+        specialty_match = re.search(r"(?:Specialist|Consultant)\s+in\s+([A-Za-z\s]+)", line)
+        if specialty_match:
+            return specialty_match.group(1).strip()
+    return ""
+
+
+def extract_phone(text):
+    # Basic pattern to match phone formats, can be refined
+    phone_match = re.search(r"(\+?\d[\d\s\-]{7,}\d)", text)
+    if phone_match:
+        return phone_match.group(0).strip()
+    return ""
+
+
+def extract_address(text):
+    # Address lines usually carry a postal code
+    address_lines = [line.strip() for line in text.split("\n") if re.search(r"\d{5}", line)]
+    return " ".join(address_lines)
+
+
+def extract_fields(text: str) -> dict:
+    """Extract visit card fields from OCR text, omitting those that were not found"""
+    fields = {
+        "name": extract_name(text),
+        "email": extract_email(text),
+        "phone": extract_phone(text),
+        "specialty": extract_specialty(text),
+        "address": extract_address(text),
+    }
+    return {key: value for key, value in fields.items() if value}
+
+
+# ----------------------------------------------------------------------
+# Service
+# ----------------------------------------------------------------------
+
+
+class OCRService:
+    """
+    Runs OCR in a pool of worker processes so that tesseract never blocks the event loop.
+
+    At most OCR_WORKERS images are processed at once and at most OCR_MAX_PENDING
+    more may wait for a worker; further requests are rejected immediately.
+    Results are cached by image content hash.
+    """
+
+    def __init__(self, config):
+        self.workers = config.OCR_WORKERS
+        self.max_pending = config.OCR_MAX_PENDING
+        self.timeout = config.OCR_TIMEOUT
+        self.target_dpi = config.OCR_TARGET_DPI
+        self.max_side = config.OCR_MAX_SIDE
+        self.cache_size = config.OCR_CACHE_SIZE
+        self.cache_ttl = config.OCR_CACHE_TTL
+
+        self._executor: ProcessPoolExecutor | None = None
+        self._slots = asyncio.Semaphore(self.workers)
+        self._pending = 0
+        self._cache: OrderedDict[str, tuple[str, float]] = OrderedDict()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Created lazily so worker processes are only started when OCR is used
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            logger_service.info(f"OCR worker pool started with {self.workers} workers")
+        return self._executor
+
+    def _cache_get(self, key: str) -> str | None:
+        item = self._cache.get(key)
+        if item is None:
+            return None
+        text, expiry = item
+        if expiry < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return text
+
+    def _cache_set(self, key: str, text: str) -> None:
+        self._cache[key] = (text, time.monotonic() + self.cache_ttl)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def image_to_text(self, content: bytes, binarize: bool = False) -> str:
+        """
+        Extract text from encoded image bytes.
+
+        Raises:
+            ValueError: If the content is not a readable image
+            OCRBusyError: If the pending queue is full
+            OCRTimeoutError: If OCR does not complete within the timeout
+        """
+        key = f"{hashlib.sha256(content).hexdigest()}:{int(binarize)}"
+        cached = self._cache_get(key)
+        if cached is not None:
+            track_ocr_request("hit")
+            return cached
+
+        if self._pending >= self.workers + self.max_pending:
+            track_ocr_request("busy")
+            raise OCRBusyError("OCR service is busy, please retry later")
+
+        self._pending += 1
+        start = time.monotonic()
+        try:
+            # The timeout covers both waiting for a worker and processing
+            async with asyncio.timeout(self.timeout):
+                async with self._slots:
+                    loop = asyncio.get_running_loop()
+                    text = await loop.run_in_executor(
+                        self._get_executor(),
+                        _ocr_worker,
+                        content,
+                        self.target_dpi,
+                        self.max_side,
+                        binarize,
+                        self.timeout,
+                    )
+        except TimeoutError:
+            track_ocr_request("timeout", time.monotonic() - start)
+            raise OCRTimeoutError(f"OCR did not complete within {self.timeout}s")
+        except UnidentifiedImageError:
+            track_ocr_request("error", time.monotonic() - start)
+            raise ValueError("Invalid image file")
+        except BrokenProcessPool:
+            track_ocr_request("error", time.monotonic() - start)
+            logger_service.error("OCR worker pool crashed, restarting it on next request")
+            self._executor = None
+            raise
+        except RuntimeError as e:
+            # pytesseract reports its own timeout as a RuntimeError
+            if "timeout" not in str(e).lower():
+                track_ocr_request("error", time.monotonic() - start)
+                raise
+            track_ocr_request("timeout", time.monotonic() - start)
+            raise OCRTimeoutError(str(e))
+        finally:
+            self._pending -= 1
+
+        track_ocr_request("success", time.monotonic() - start)
+        self._cache_set(key, text)
+        return text
+
+    def close(self) -> None:
+        """Shut down the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logger_service.info("OCR worker pool stopped")
+
+
+# Shared by all requests in the process
+ocr_service = OCRService(Config)
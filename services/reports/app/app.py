@@ -45,7 +45,7 @@ async def get_reports(
     request: Request = None,
 ):
     """Get all reports with optional filtering"""
-    reports = report_service.get_all_reports(search)
+    reports = await report_service.get_all_reports(search)
     return reports
 
 
@@ -55,7 +55,7 @@ async def get_report(
     request: Request = None,
 ):
     """Get a specific report by ID"""
-    report = report_service.get_report_by_id(report_id)
+    report = await report_service.get_report_by_id(report_id)
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
     return report
@@ -70,7 +70,7 @@ async def create_report(
     if not data:
         raise HTTPException(status_code=400, detail="No data provided")
 
-    report = report_service.create_report(data)
+    report = await report_service.create_report(data)
     return report
 
 
@@ -84,7 +84,7 @@ async def update_report(
     if not data:
         raise HTTPException(status_code=400, detail="No data provided")
 
-    report = report_service.update_report(report_id, data)
+    report = await report_service.update_report(report_id, data)
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
     return report
@@ -96,7 +96,7 @@ async def delete_report(
     request: Request = None,
 ):
     """Delete a report"""
-    success = report_service.delete_report(report_id)
+    success = await report_service.delete_report(report_id)
     if not success:
         raise HTTPException(status_code=404, detail="Report not found")
     return Response(status_code=204)
@@ -47,6 +47,7 @@ class Config:
     REDIS_DB = int(os.getenv("REDIS_DB"))
     REDIS_PASSWORD = os.getenv("REDIS_PASSWORD")
     REDIS_URL = f"redis://:{REDIS_PASSWORD}@{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}"
+    REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
 
     # RabbitMQ settings
     RABBITMQ_HOST = os.getenv("RABBITMQ_HOST")
@@ -90,6 +91,7 @@ class Config:
     # Cache settings
     CACHE_TTL = int(os.getenv("CACHE_TTL"))
     CACHE_MAX_SIZE = int(os.getenv("CACHE_MAX_SIZE"))
+    QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", "30"))
     CACHE_TYPE = "redis"
     CACHE_REDIS_URL = REDIS_URL
     CACHE_DEFAULT_TIMEOUT = CACHE_TTL
@@ -5,7 +5,8 @@ from config import Config
 from services.logger_service import logger_service
 from services.mongodb_client import MongoDBClient
 from services.rabbitmq_client import RabbitMQClient
-from services.report_service import ReportService
+from services.redis_client import bump_generation_sync
+from services.report_service import REPORTS_QUERY_NAMESPACE, ReportService
 
 
 def handle_report_analysis_result(ch, method, properties, body):
@@ -43,6 +44,7 @@ def handle_report_analysis_result(ch, method, properties, body):
                 }
             },
         )
+        bump_generation_sync(Config, REPORTS_QUERY_NAMESPACE)
 
         # Acknowledge message
         ch.basic_ack(delivery_tag=method.delivery_tag)
@@ -117,11 +119,12 @@ def handle_new_report(ch, method, properties, body):
                     "raw_data": message,
                 }
             )
-
             # Automatically queue for analysis if configured to do so
             if Config.AUTO_ANALYZE_REPORTS:
                 report_service.queue_report_for_analysis(report_id)
 
+            bump_generation_sync(Config, REPORTS_QUERY_NAMESPACE)
+
         # Acknowledge message
         ch.basic_ack(delivery_tag=method.delivery_tag)
 
@@ -9,6 +9,7 @@ from config import Config
 from services.logger_service import logger_service
 from services.mongodb_client import MongoDBClient
 from services.rabbitmq_client import RabbitMQClient
+from services.redis_client import RedisClient
 from services.report_service import ReportService
 
 router = APIRouter(prefix="/api/integration", tags=["Integration"])
@@ -16,7 +17,8 @@ router = APIRouter(prefix="/api/integration", tags=["Integration"])
 # Initialize services
 mongodb_client = MongoDBClient(Config)
 rabbitmq_client = RabbitMQClient(Config)
-report_service = ReportService(mongodb_client, None, rabbitmq_client)
+redis_client = RedisClient(Config)
+report_service = ReportService(mongodb_client, redis_client, rabbitmq_client)
 
 
 class AnalysisSummaryRequest(BaseModel):
@@ -25,6 +27,29 @@ class AnalysisSummaryRequest(BaseModel):
     requester_id: str | None = None
 
 
+@router.get("/reports")
+async def list_reports(
+    doctor_id: str | None = Query(None, description="Filter by doctor ID"),
+    patient_id: str | None = Query(None, description="Filter by patient ID"),
+    status: str | None = Query(None, description="Filter by report status"),
+    page: int = Query(1, ge=1, description="Page number"),
+    limit: int = Query(10, ge=1, le=100, description="Number of items per page"),
+    request: Request = None,
+):
+    """List reports for other services, paginated and served from the query cache"""
+    try:
+        return await report_service.list_reports(
+            doctor_id=doctor_id,
+            patient_id=patient_id,
+            status=status,
+            page=page,
+            limit=limit,
+        )
+    except Exception as e:
+        logger_service.error(f"Error listing reports: {e}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e!s}")
+
+
 @router.post(
     "/analyze-report",
     status_code=status.HTTP_202_ACCEPTED,
@@ -8,7 +8,8 @@ from services.message_broker import MessageBroker
 from config import Config
 from services.logger_service import logger_service
 from services.mongodb_client import MongoDBClient
-from services.redis_client import RedisClient
+from services.redis_client import RedisClient, bump_generation_sync
+from services.report_service import REPORTS_QUERY_NAMESPACE
 
 
 class MessageConsumer:
@@ -57,6 +58,9 @@ class MessageConsumer:
 
             # Perform report processing tasks
             self._process_report(report_id, message)
+
+            # Report status changed, drop cached listings
+            bump_generation_sync(self.config, REPORTS_QUERY_NAMESPACE)
         except Exception as e:
             logger_service.error(f"Error processing report: {e!s}")
             # Acknowledge the message even on error to prevent redelivery loops
@@ -75,6 +79,9 @@ class MessageConsumer:
 
             # Perform report analysis tasks
             self._analyze_report(report_id, message)
+
+            # Report status changed, drop cached listings
+            bump_generation_sync(self.config, REPORTS_QUERY_NAMESPACE)
         except Exception as e:
             logger_service.error(f"Error analyzing report: {e!s}")
             channel.basic_ack(delivery_tag=method.delivery_tag)
@@ -71,6 +71,16 @@ CACHE_MISSES = meter.create_counter(
     description="Number of cache misses for reports service",
 )
 
+QUERY_CACHE_HIT_AGE = meter.create_histogram(
+    name="reports_service_query_cache_hit_age_seconds",
+    description="Age of cached query results when served, used to tune query cache TTLs for reports service",
+)
+
+QUERY_CACHE_INVALIDATIONS = meter.create_counter(
+    name="reports_service_query_cache_invalidations_total",
+    description="Number of query cache generation bumps for reports service",
+)
+
 # Service dependency metrics
 SERVICE_DEPENDENCY_UP = meter.create_up_down_counter(
     name="reports_service_dependency_up",
@@ -180,6 +190,22 @@ def track_cache_metrics(hit: bool, cache_name: str):
         logger_service.warning(f"Error tracking cache metrics: {e!s}")
 
 
+def track_query_cache_hit_age(cache_name: str, age: float):
+    """Record how old a cached query result was when it was served"""
+    try:
+        QUERY_CACHE_HIT_AGE.record(age, {"cache": cache_name})
+    except Exception as e:
+        logger_service.warning(f"Error tracking query cache hit age: {e!s}")
+
+
+def track_query_cache_invalidation(cache_name: str):
+    """Increment query cache invalidation counter"""
+    try:
+        QUERY_CACHE_INVALIDATIONS.add(1, {"cache": cache_name})
+    except Exception as e:
+        logger_service.warning(f"Error tracking query cache invalidation: {e!s}")
+
+
 def track_dependency_status(service: str, is_available: bool):
     """Track service dependency availability"""
     try:
@@ -62,6 +62,20 @@ class MongoDBClient:
             logger_service.error(f"MongoDB find_reports error: {e!s}")
             raise
 
+    def find_reports_page(self, query=None, skip=0, limit=10):
+        """Find one page of reports by query, newest first. Returns (reports, total)"""
+        try:
+            query = query or {}
+            total = self.reports_collection.count_documents(query)
+            cursor = self.reports_collection.find(query).sort("created_at", -1).skip(skip).limit(limit)
+            reports = list(cursor)
+            for report in reports:
+                report["_id"] = str(report["_id"])
+            return reports, total
+        except Exception as e:
+            logger_service.error(f"MongoDB find_reports_page error: {e!s}")
+            raise
+
     def find_report_by_id(self, report_id):
         """Find a report by ID"""
         try:
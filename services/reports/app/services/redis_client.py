@@ -1,30 +1,88 @@
+import hashlib
 import json
+import time
 
 import redis
+import redis.asyncio as aioredis
 
 from services.logger_service import logger_service
-from services.metrics import track_cache_metrics
+from services.metrics import track_cache_metrics, track_query_cache_hit_age, track_query_cache_invalidation
+
+# Connection pools shared by every client in the process, keyed by URL
+_async_pools: dict[str, aioredis.ConnectionPool] = {}
+_sync_pools: dict[str, redis.ConnectionPool] = {}
+
+
+def _json_default(value):
+    """Serialize datetimes the same way FastAPI responses do"""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def _generation_key(namespace):
+    return f"{namespace}:generation"
+
+
+def get_connection_pool(config) -> aioredis.ConnectionPool:
+    """Get the process-wide async connection pool for the configured Redis"""
+    pool = _async_pools.get(config.REDIS_URL)
+    if pool is None:
+        pool = aioredis.ConnectionPool.from_url(
+            config.REDIS_URL,
+            max_connections=config.REDIS_MAX_CONNECTIONS,
+            decode_responses=True,
+        )
+        _async_pools[config.REDIS_URL] = pool
+    return pool
+
+
+def get_sync_client(config) -> redis.Redis:
+    """Get a blocking Redis client on a shared pool, for use from RabbitMQ consumer threads"""
+    pool = _sync_pools.get(config.REDIS_URL)
+    if pool is None:
+        pool = redis.ConnectionPool.from_url(
+            config.REDIS_URL,
+            max_connections=config.REDIS_MAX_CONNECTIONS,
+            decode_responses=True,
+        )
+        _sync_pools[config.REDIS_URL] = pool
+    return redis.Redis(connection_pool=pool)
+
+
+def bump_generation_sync(config, namespace):
+    """Blocking variant of RedisClient.bump_generation for RabbitMQ consumer threads"""
+    try:
+        get_sync_client(config).incr(_generation_key(namespace))
+        track_query_cache_invalidation(namespace)
+        return True
+    except Exception as e:
+        logger_service.error(f"Redis bump_generation error: {e!s}")
+        return False
 
 
 class RedisClient:
-    """Redis client service for caching"""
+    """Async Redis client service for caching"""
 
     def __init__(self, config):
         self.config = config
 
-        # Initialize Redis client
-        self.client = redis.Redis(
-            host=config.REDIS_HOST,
-            port=config.REDIS_PORT,
-            password=config.REDIS_PASSWORD,
-            decode_responses=True,
-        )
+        # Initialize Redis client on the shared connection pool
+        self.client = aioredis.Redis(connection_pool=get_connection_pool(config))
         self.ttl = config.CACHE_TTL
+        self.query_ttl = config.QUERY_CACHE_TTL
+
+    def pipeline(self, transaction=True):
+        """
+        Create a pipeline to batch several commands into one round trip.
+        With transaction=True the commands are wrapped in MULTI/EXEC.
+        """
+        return self.client.pipeline(transaction=transaction)
 
-    def get(self, key):
+    async def get(self, key):
         """Get value from cache"""
         try:
-            value = self.client.get(key)
+            value = await self.client.get(key)
             if value:
                 track_cache_metrics(hit=True, cache_name="reports")
                 return value
@@ -34,29 +92,40 @@ class RedisClient:
             logger_service.error(f"Redis get error: {e!s}")
             return None
 
-    def set(self, key, value, ttl=None):
+    async def set(self, key, value, ttl=None):
         """Set value in cache"""
         try:
             ttl = ttl or self.ttl
-            self.client.setex(key, ttl, value)
+            await self.client.setex(key, ttl, value)
             return True
         except Exception as e:
             logger_service.error(f"Redis set error: {e!s}")
             return False
 
-    def delete(self, key):
+    async def delete(self, key):
         """Delete key from cache"""
         try:
-            self.client.delete(key)
+            await self.client.delete(key)
             return True
         except Exception as e:
             logger_service.error(f"Redis delete error: {e!s}")
             return False
 
-    def get_report(self, report_id):
+    async def mget_json(self, keys):
+        """Get several JSON values in one round trip. Missing keys are returned as None"""
+        if not keys:
+            return []
+        try:
+            values = await self.client.mget(keys)
+            return [json.loads(value) if value else None for value in values]
+        except Exception as e:
+            logger_service.error(f"Redis mget error: {e!s}")
+            return [None] * len(keys)
+
+    async def get_report(self, report_id):
         """Get report from cache"""
         try:
-            cached_report = self.get(f"report:{report_id}")
+            cached_report = await self.get(f"report:{report_id}")
             if cached_report:
                 return json.loads(cached_report)
             return None
@@ -64,31 +133,105 @@ class RedisClient:
             logger_service.error(f"Redis get_report error: {e!s}")
             return None
 
-    def cache_report(self, report_id, report_data):
+    async def cache_report(self, report_id, report_data):
         """Cache report data"""
         try:
-            self.set(f"report:{report_id}", json.dumps(report_data))
+            await self.set(f"report:{report_id}", json.dumps(report_data, default=_json_default))
             return True
         except Exception as e:
             logger_service.error(f"Redis cache_report error: {e!s}")
             return False
 
-    def invalidate_report(self, report_id):
-        """Invalidate cached report"""
-        return self.delete(f"report:{report_id}")
+    async def invalidate_report(self, report_id, *namespaces):
+        """Invalidate a cached report and bump the given query namespaces in one transaction"""
+        try:
+            async with self.pipeline() as pipe:
+                pipe.delete(f"report:{report_id}")
+                for namespace in namespaces:
+                    pipe.incr(_generation_key(namespace))
+                await pipe.execute()
+            for namespace in namespaces:
+                track_query_cache_invalidation(namespace)
+            return True
+        except Exception as e:
+            logger_service.error(f"Redis invalidate_report error: {e!s}")
+            return False
+
+    async def get_generation(self, namespace):
+        """Get the current cache generation for a namespace (0 if never bumped)"""
+        try:
+            return int(await self.client.get(_generation_key(namespace)) or 0)
+        except Exception as e:
+            logger_service.error(f"Redis get_generation error: {e!s}")
+            return None
+
+    async def bump_generation(self, namespace):
+        """
+        Invalidate every cached query in a namespace by incrementing its generation.
+        Stale entries are never read again and expire with their TTL.
+        """
+        try:
+            await self.client.incr(_generation_key(namespace))
+            track_query_cache_invalidation(namespace)
+            return True
+        except Exception as e:
+            logger_service.error(f"Redis bump_generation error: {e!s}")
+            return False
+
+    @staticmethod
+    def query_key(namespace, generation, filters):
+        """Build a cache key from a namespace generation and normalized filters"""
+        normalized = {k: v for k, v in sorted(filters.items()) if v is not None and v != ""}
+        digest = hashlib.sha1(json.dumps(normalized, sort_keys=True, default=str).encode(), usedforsecurity=False).hexdigest()
+        return f"{namespace}:query:g{generation}:{digest}"
+
+    async def get_query(self, namespace, filters):
+        """
+        Get a cached query result for the given filters.
+        Returns (result, key); result is None on a miss and key is None when Redis is unavailable.
+        """
+        generation = await self.get_generation(namespace)
+        if generation is None:
+            return None, None
+
+        key = self.query_key(namespace, generation, filters)
+        try:
+            cached = await self.client.get(key)
+        except Exception as e:
+            logger_service.error(f"Redis get_query error: {e!s}")
+            return None, None
+
+        if cached is None:
+            track_cache_metrics(hit=False, cache_name=namespace)
+            return None, key
+
+        entry = json.loads(cached)
+        track_cache_metrics(hit=True, cache_name=namespace)
+        track_query_cache_hit_age(namespace, time.time() - entry["cached_at"])
+        return entry["data"], key
+
+    async def cache_query(self, key, data, ttl=None):
+        """Cache a query result under a key returned by get_query"""
+        try:
+            payload = json.dumps({"cached_at": time.time(), "data": data}, default=_json_default)
+            await self.client.setex(key, ttl or self.query_ttl, payload)
+            return True
+        except Exception as e:
+            logger_service.error(f"Redis cache_query error: {e!s}")
+            return False
 
-    def close(self):
+    async def close(self):
         """Close Redis connection"""
         try:
-            self.client.close()
+            await self.client.aclose()
             logger_service.info("Closed Redis connection")
         except Exception as e:
             logger_service.error(f"Error closing Redis connection: {e!s}")
 
-    def check_health(self):
+    async def check_health(self):
         """Check Redis health"""
         try:
-            self.client.ping()
+            await self.client.ping()
             return "UP"
         except Exception as e:
             return f"DOWN: {e!s}"
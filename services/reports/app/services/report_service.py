@@ -3,6 +3,8 @@ from datetime import datetime
 
 from services.logger_service import logger_service
 
+REPORTS_QUERY_NAMESPACE = "reports_list"
+
 
 class ReportService:
     """Service for report business logic"""
@@ -13,27 +15,75 @@ class ReportService:
         self.rabbitmq_client = rabbitmq_client
         self.db = mongodb_client.db
 
-    def get_all_reports(self, search=None):
+    async def _cached_query(self, filters, loader):
+        """Serve a query from the reports query cache, falling back to the loader on a miss"""
+        if self.redis_client is None:
+            return loader()
+
+        cached, key = await self.redis_client.get_query(REPORTS_QUERY_NAMESPACE, filters)
+        if cached is not None:
+            return cached
+
+        result = loader()
+        if key is not None:
+            await self.redis_client.cache_query(key, result)
+        return result
+
+    async def invalidate_report_queries(self):
+        """Invalidate all cached report listings and searches"""
+        if self.redis_client is not None:
+            await self.redis_client.bump_generation(REPORTS_QUERY_NAMESPACE)
+
+    async def get_all_reports(self, search=None):
         """Get all reports with optional filtering"""
         try:
             query = {}
             if search:
+                search = search.strip()
                 query = {
                     "$or": [
                         {"title": {"$regex": search, "$options": "i"}},
                         {"content": {"$regex": search, "$options": "i"}},
                     ]
                 }
-            return self.mongodb_client.find_reports(query)
+            return await self._cached_query(
+                {"op": "all", "search": search.lower() if search else None},
+                lambda: self.mongodb_client.find_reports(query),
+            )
         except Exception as e:
             logger_service.error(f"Error getting reports: {e!s}")
             raise
 
-    def get_report_by_id(self, report_id):
+    async def list_reports(self, doctor_id=None, patient_id=None, status=None, page=1, limit=10):
+        """Get a page of reports filtered by doctor, patient and status"""
+        try:
+            query = {}
+            if doctor_id:
+                query["doctor_id"] = doctor_id
+            if patient_id:
+                query["patient_id"] = patient_id
+            if status:
+                query["status"] = status
+
+            def load_page():
+                items, total = self.mongodb_client.find_reports_page(query, skip=(page - 1) * limit, limit=limit)
+                return {
+                    "items": items,
+                    "total": total,
+                    "page": page,
+                    "pages": (total + limit - 1) // limit,
+                }
+
+            return await self._cached_query({"op": "list", **query, "page": page, "limit": limit}, load_page)
+        except Exception as e:
+            logger_service.error(f"Error listing reports: {e!s}")
+            raise
+
+    async def get_report_by_id(self, report_id):
         """Get a specific report by ID with caching"""
         try:
             # Try cache first
-            cached_report = self.redis_client.get_report(report_id)
+            cached_report = await self.redis_client.get_report(report_id)
             if cached_report:
                 return cached_report
 
@@ -41,7 +91,7 @@ class ReportService:
             report = self.mongodb_client.find_report_by_id(report_id)
             if report:
                 # Cache for next time
-                self.redis_client.cache_report(report_id, report)
+                await self.redis_client.cache_report(report_id, report)
 
             return report
         except Exception as e:
@@ -56,11 +106,12 @@ class ReportService:
             logger_service.error(f"Error getting raw report {report_id}: {e!s}")
             raise
 
-    def create_report(self, report_data):
+    async def create_report(self, report_data):
         """Create a new report"""
         try:
             # Insert into database
             report = self.mongodb_client.insert_report(report_data)
+            await self.invalidate_report_queries()
 
             # Publish event for analysis
             self.rabbitmq_client.publish_report_created(report["_id"])
@@ -70,15 +121,16 @@ class ReportService:
             logger_service.error(f"Error creating report: {e!s}")
             raise
 
-    def update_report(self, report_id, report_data):
+    async def update_report(self, report_id, report_data):
         """Update an existing report"""
         try:
             # Update in database
             updated_report = self.mongodb_client.update_report(report_id, report_data)
 
             if updated_report:
-                # Invalidate cache
-                self.redis_client.invalidate_report(report_id)
+                # Invalidate the cached report and listings in one round trip
+                if self.redis_client is not None:
+                    await self.redis_client.invalidate_report(report_id, REPORTS_QUERY_NAMESPACE)
 
                 # Publish event
                 self.rabbitmq_client.publish_report_updated(report_id)
@@ -88,15 +140,16 @@ class ReportService:
             logger_service.error(f"Error updating report {report_id}: {e!s}")
             raise
 
-    def delete_report(self, report_id):
+    async def delete_report(self, report_id):
         """Delete a report"""
         try:
             # Delete from database
             success = self.mongodb_client.delete_report(report_id)
 
             if success:
-                # Invalidate cache
-                self.redis_client.invalidate_report(report_id)
+                # Invalidate the cached report and listings in one round trip
+                if self.redis_client is not None:
+                    await self.redis_client.invalidate_report(report_id, REPORTS_QUERY_NAMESPACE)
 
                 # Publish event
                 self.rabbitmq_client.publish_report_deleted(report_id)